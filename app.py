@@ -7,6 +7,10 @@ import yaml
 import json
 from pathlib import Path
 
+# Shared manifest reader, also used by the agents' run scripts
+sys.path.insert(0, str(Path(__file__).resolve().parent / 'src' / 'agents'))
+from agent_manifest import manifest_entry
+
 # Load environment variables
 load_dotenv()
 
@@ -45,8 +49,15 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+# Precompiled manifest built by `python src/backend/manifest.py`
+MANIFEST_PATH = Path(os.getenv("AGENTS_MANIFEST", "agents_manifest.json"))
+
 def load_agent_config(agent_name):
     """Load agent configuration and prompt."""
+    entry = manifest_entry(agent_name, MANIFEST_PATH)
+    if entry:
+        return entry['config'], entry['instructions']
+    
     config_path = Path(f"{agent_name}/agent_config.json")
     prompt_path = Path(f"{agent_name}/prompt.yaml")
     
@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import yaml
 import warnings
@@ -6,16 +7,26 @@ from dotenv import load_dotenv
 from praisonaiagents import Agent
 from pathlib import Path
 
+# The shared manifest reader lives next to the manifest, one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from agent_manifest import manifest_entry
+
 # Filter out specific warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='main')
 
 def load_config():
-    """Load agent configuration from JSON file."""
+    """Load agent configuration from the manifest or JSON file."""
+    entry = manifest_entry('BlogSmith')
+    if entry:
+        return entry['config']
     with open('agent_config.json', 'r') as f:
         return json.load(f)
 
 def load_prompt():
-    """Load agent instructions from YAML file."""
+    """Load agent instructions from the manifest or YAML file."""
+    entry = manifest_entry('BlogSmith')
+    if entry:
+        return entry['instructions']
     with open('prompt.yaml', 'r') as f:
         return yaml.safe_load(f)['instructions']
 
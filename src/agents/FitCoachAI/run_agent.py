@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import yaml
 import warnings
@@ -9,6 +10,10 @@ from dotenv import load_dotenv
 from praisonaiagents import Agent
 from pathlib import Path
 
+# The shared manifest reader lives next to the manifest, one directory up
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from agent_manifest import manifest_entry
+
 # Filter out specific warnings
 warnings.filterwarnings('ignore', category=UserWarning, module='main')
 
@@ -56,7 +61,10 @@ def validate_input(text: str) -> bool:
     return True
 
 def load_config() -> dict:
-    """Load agent configuration from JSON file."""
+    """Load agent configuration from the manifest or JSON file."""
+    entry = manifest_entry('FitCoachAI')
+    if entry:
+        return entry['config']
     try:
         with open('agent_config.json', 'r') as f:
             return json.load(f)
@@ -64,7 +72,10 @@ def load_config() -> dict:
         raise RuntimeError("Failed to load configuration") from e
 
 def load_prompt() -> str:
-    """Load agent instructions from YAML file."""
+    """Load agent instructions from the manifest or YAML file."""
+    entry = manifest_entry('FitCoachAI')
+    if entry:
+        return entry['instructions']
     try:
         with open('prompt.yaml', 'r') as f:
             return yaml.safe_load(f)['instructions']
@@ -0,0 +1,34 @@
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+
+# Precompiled manifest built by `python src/backend/manifest.py`, next to the agents it describes
+MANIFEST_PATH = Path(__file__).resolve().parent / 'agents_manifest.json'
+
+
+@lru_cache(maxsize=None)
+def load_manifest(path=MANIFEST_PATH):
+    """Load a precompiled agent manifest once per process, if it has been built."""
+    path = Path(path)
+    if path.exists():
+        with open(path, 'r') as f:
+            return json.load(f)['agents']
+    return {}
+
+
+def manifest_entry(agent_name, path=MANIFEST_PATH):
+    """Return an agent's manifest entry, unless its source files changed since the manifest was built."""
+    entry = load_manifest(path).get(agent_name)
+    if not entry:
+        return None
+    # The manifest records each file's (mtime, size); any difference means it was edited since
+    agents_dir = Path(path).parent
+    for relative_path, stamp in zip((entry['config_path'], entry['prompt_path']), entry['stamp']):
+        try:
+            stat = os.stat(agents_dir / relative_path)
+        except OSError:
+            return None
+        if [stat.st_mtime_ns, stat.st_size] != list(stamp):
+            return None
+    return entry
@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Hashable, Iterator, Tuple
+
+PoolKey = Tuple[str, str, Tuple[Tuple[str, Hashable], ...]]
+
+
+def hash_api_key(api_key: str) -> str:
+    """Return a non-reversible identifier for an API key."""
+    return hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:16]
+
+
+class AgentPool:
+    """LRU/TTL pool of idle agent instances keyed by agent, API key and model params.
+
+    An instance is only ever handed to one request at a time; it goes back to
+    the pool when the request's checkout block exits.
+    """
+
+    def __init__(self, max_size: int = 64, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> idle instances with the time they were returned, oldest first
+        self._idle: "OrderedDict[PoolKey, list[tuple[Any, float]]]" = OrderedDict()
+        self._idle_count = 0
+        self._in_use = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @staticmethod
+    def make_key(agent_name: str, api_key: str, **params: Hashable) -> PoolKey:
+        return agent_name, hash_api_key(api_key), tuple(sorted(params.items()))
+
+    def _acquire(self, key: PoolKey) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key)
+            while idle:
+                instance, returned_at = idle.pop()
+                self._idle_count -= 1
+                if now - returned_at <= self.ttl:
+                    if not idle:
+                        del self._idle[key]
+                    self._hits += 1
+                    self._in_use += 1
+                    return instance
+                self._expirations += 1
+            self._idle.pop(key, None)
+            self._misses += 1
+            self._in_use += 1
+            return None
+
+    def _release(self, key: PoolKey, instance: Any):
+        # Never let one request's conversation leak into the next
+        history = getattr(instance, 'chat_history', None)
+        if isinstance(history, list):
+            history.clear()
+
+        with self._lock:
+            self._in_use -= 1
+            self._idle.setdefault(key, []).append((instance, time.monotonic()))
+            self._idle.move_to_end(key)
+            self._idle_count += 1
+            while self._idle_count > self.max_size:
+                # Evict from the least recently returned key
+                oldest_key, oldest = next(iter(self._idle.items()))
+                oldest.pop(0)
+                self._idle_count -= 1
+                self._evictions += 1
+                if not oldest:
+                    del self._idle[oldest_key]
+
+    @contextmanager
+    def checkout(self, key: PoolKey, factory: Callable[[], Any]) -> Iterator[Any]:
+        """Borrow an instance for `key`, building one with `factory` if none is idle."""
+        instance = self._acquire(key)
+        if instance is None:
+            try:
+                instance = factory()
+            except Exception:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+        try:
+            yield instance
+        except BaseException:
+            # Don't reuse an instance whose state a failed call may have left dirty
+            with self._lock:
+                self._in_use -= 1
+            raise
+        self._release(key, instance)
+
+    def prune(self) -> int:
+        """Drop idle instances older than the TTL."""
+        now = time.monotonic()
+        removed = 0
+        with self._lock:
+            for key in list(self._idle):
+                fresh = [(i, t) for i, t in self._idle[key] if now - t <= self.ttl]
+                removed += len(self._idle[key]) - len(fresh)
+                if fresh:
+                    self._idle[key] = fresh
+                else:
+                    del self._idle[key]
+            self._idle_count -= removed
+            self._expirations += removed
+        return removed
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool occupancy and hit/miss counters."""
+        with self._lock:
+            return {
+                "idle": self._idle_count,
+                "in_use": self._in_use,
+                "keys": len(self._idle),
+                "max_size": self.max_size,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations
+            }
@@ -0,0 +1,128 @@
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from tokens import count_tokens
+
+# (text, token limit) -> shorter text; used by the "summarize" strategy
+Summarizer = Callable[[str, int], Awaitable[str]]
+
+TRIM_MARKER = "[... {omitted} tokens trimmed to fit the prompt budget]"
+
+
+def allocate(sizes: Dict[str, int], available: int) -> Dict[str, int]:
+    """Split `available` tokens between artifacts, shrinking the largest first.
+
+    Artifacts smaller than an even share keep their full size and the
+    remainder is shared out between the ones that don't fit.
+    """
+    available = max(0, available)
+    allocation: Dict[str, int] = {}
+    remaining = dict(sizes)
+    while remaining:
+        share = available // len(remaining)
+        small = {name: size for name, size in remaining.items() if size <= share}
+        if not small:
+            for name in remaining:
+                allocation[name] = share
+            break
+        for name, size in small.items():
+            allocation[name] = size
+            available -= size
+            del remaining[name]
+    return allocation
+
+
+def trim(text: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Keep leading paragraphs of `text` that fit in `max_tokens`."""
+    total = count_tokens(text, model)
+    if total <= max_tokens:
+        return text
+    marker_tokens = count_tokens(TRIM_MARKER.format(omitted=total), model)
+    limit = max(0, max_tokens - marker_tokens)
+
+    kept, used = [], 0
+    for paragraph in re.split(r'\n\s*\n', text.strip()):
+        size = count_tokens(paragraph, model)
+        if used + size > limit:
+            if not kept and limit > 0:
+                # Not even the first paragraph fits: cut it down instead
+                cut = paragraph[:limit * 4]
+                while cut and count_tokens(cut, model) > limit:
+                    cut = cut[:int(len(cut) * 0.9)]
+                kept.append(cut)
+            break
+        kept.append(paragraph)
+        used += size
+
+    kept_text = "\n\n".join(kept)
+    omitted = total - count_tokens(kept_text, model)
+    return f"{kept_text}\n\n{TRIM_MARKER.format(omitted=omitted)}".strip()
+
+
+class BudgetStats:
+    """Per-stage prompt sizes and how often artifacts had to be compressed."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, int]] = {}
+
+    def record(self, stage: str, before: int, after: int, summarized: int = 0):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {
+                "calls": 0, "over_budget": 0, "summaries": 0, "tokens_in": 0, "tokens_sent": 0
+            })
+            entry["calls"] += 1
+            entry["tokens_in"] += before
+            entry["tokens_sent"] += after
+            entry["summaries"] += summarized
+            if after < before:
+                entry["over_budget"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                stage: {
+                    **entry,
+                    "avg_prompt_tokens": round(entry["tokens_sent"] / entry["calls"]) if entry["calls"] else 0
+                }
+                for stage, entry in self._stages.items()
+            }
+
+
+budget_stats = BudgetStats()
+
+
+async def fit_artifacts(artifacts: Dict[str, str], fixed_tokens: int, budget: int, stage: str,
+                        model: Optional[str] = None, summarize: Optional[Summarizer] = None) -> Dict[str, str]:
+    """Compress upstream artifacts so the whole prompt fits in `budget` tokens.
+
+    `fixed_tokens` is everything else in the call (system prompt, template,
+    request context). Oversized artifacts are summarized when a summarizer
+    is given, and trimmed extractively otherwise or if summarizing fails.
+    """
+    sizes = {name: count_tokens(text, model) for name, text in artifacts.items()}
+    before = fixed_tokens + sum(sizes.values())
+    if before <= budget:
+        budget_stats.record(stage, before, before)
+        return artifacts
+
+    allocation = allocate(sizes, budget - fixed_tokens)
+    fitted, summarized = {}, 0
+    for name, text in artifacts.items():
+        limit = allocation[name]
+        if sizes[name] <= limit:
+            fitted[name] = text
+            continue
+        if summarize is not None and limit > 0:
+            try:
+                text = await summarize(text, limit)
+                summarized += 1
+            except Exception as e:
+                print(f"Summarizing {name} for {stage} failed, trimming instead: {str(e)}")
+        fitted[name] = trim(text, limit, model)
+
+    after = fixed_tokens + sum(count_tokens(text, model) for text in fitted.values())
+    budget_stats.record(stage, before, after, summarized)
+    print(f"{stage}: prompt {before} -> {after} tokens (budget {budget})")
+    return fitted
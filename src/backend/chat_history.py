@@ -0,0 +1,156 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from memory_store import MemoryStore
+from tokens import count_tokens
+
+# (current summary, turns to fold in) -> updated summary
+Summarizer = Callable[[str, List[Dict[str, Any]]], Awaitable[str]]
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+
+class ChatSessions:
+    """Server-side multi-turn history for /chat, one session per (agent, tenant, session id).
+
+    Each prompt carries the rolling summary plus the newest turns that fit
+    in `window_tokens`, so its size stays flat however long the session
+    runs. Once the unsummarized turns outgrow the window by `fold_tokens`,
+    the overflow is folded into the summary in the background, never on
+    the response path. State lives in a MemoryStore of its own, so it is
+    bounded per worker, persisted to MongoDB and never evicts agent memory. Clients choose session
+    ids, so sessions are always scoped to the caller's hashed API key.
+    """
+
+    def __init__(self, store: MemoryStore, window_tokens: int = 2000, fold_tokens: int = 1000,
+                 model: Optional[str] = None):
+        self.store = store
+        self.window_tokens = window_tokens
+        self.fold_tokens = fold_tokens
+        self.model = model
+        self._lock = threading.Lock()
+        self._folding = set()
+        self._tasks = set()
+        self._turns = 0
+        self._folds = 0
+        self._fold_errors = 0
+        self._turns_folded = 0
+        self._fold_ms: Deque[float] = deque(maxlen=200)
+        self._history_tokens: Deque[int] = deque(maxlen=500)
+
+    @staticmethod
+    def _namespace(agent: str) -> str:
+        return f"chat:{agent}"
+
+    @staticmethod
+    def _key(tenant: str, session_id: str) -> str:
+        return f"{tenant}:{session_id}"
+
+    async def load(self, agent: str, tenant: str, session_id: str) -> Dict[str, Any]:
+        """Return the session state, starting a new one if there is none."""
+        state = await self.store.get(self._namespace(agent), self._key(tenant, session_id))
+        return state if state is not None else {"summary": "", "turns": [], "next_turn": 0}
+
+    def window(self, state: Dict[str, Any]) -> List[Dict[str, str]]:
+        """Build history messages: the rolling summary, then the newest turns that fit the window."""
+        budget = self.window_tokens
+        recent = []
+        for turn in reversed(state["turns"]):
+            if turn["tokens"] > budget:
+                break
+            recent.append({"role": turn["role"], "content": turn["content"]})
+            budget -= turn["tokens"]
+        messages = []
+        if state["summary"]:
+            messages.append({"role": "system", "content": SUMMARY_PREFIX + state["summary"]})
+        messages.extend(reversed(recent))
+        with self._lock:
+            self._history_tokens.append(self.window_tokens - budget + count_tokens(state["summary"], self.model))
+        return messages
+
+    def append(self, agent: str, tenant: str, session_id: str, state: Dict[str, Any], message: str, response: str,
+               summarize: Summarizer):
+        """Record one exchange and fold older turns into the summary if the session outgrew its window."""
+        for role, content in (("user", message), ("assistant", response)):
+            state["turns"].append({
+                "n": state["next_turn"],
+                "role": role,
+                "content": content,
+                "tokens": count_tokens(content, self.model)
+            })
+            state["next_turn"] += 1
+        key = self._key(tenant, session_id)
+        self.store.put(self._namespace(agent), key, state)
+        with self._lock:
+            self._turns += 1
+            start_fold = (
+                sum(turn["tokens"] for turn in state["turns"]) > self.window_tokens + self.fold_tokens
+                and (agent, key) not in self._folding
+            )
+            if start_fold:
+                self._folding.add((agent, key))
+        if start_fold:
+            task = asyncio.ensure_future(self._fold(agent, tenant, session_id, summarize))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, agent: str, tenant: str, session_id: str, summarize: Summarizer):
+        key = self._key(tenant, session_id)
+        started = time.perf_counter()
+        try:
+            state = await self.load(agent, tenant, session_id)
+            # Keep what fits the window verbatim; everything older goes into the summary
+            budget, keep_from = self.window_tokens, len(state["turns"])
+            for index in range(len(state["turns"]) - 1, -1, -1):
+                if state["turns"][index]["tokens"] > budget:
+                    break
+                budget -= state["turns"][index]["tokens"]
+                keep_from = index
+            folded = state["turns"][:keep_from]
+            if not folded:
+                return
+            summary = await summarize(state["summary"], folded)
+
+            # Turns may have been appended while summarizing: reload and drop only what was folded
+            state = await self.load(agent, tenant, session_id)
+            last_folded = folded[-1]["n"]
+            state["summary"] = summary
+            state["turns"] = [turn for turn in state["turns"] if turn["n"] > last_folded]
+            self.store.put(self._namespace(agent), key, state)
+            with self._lock:
+                self._folds += 1
+                self._turns_folded += len(folded)
+                self._fold_ms.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            with self._lock:
+                self._fold_errors += 1
+            # The window still bounds the prompt; the next append retries the fold
+            print(f"Warning: Failed to summarize chat session {session_id} - {str(e)}")
+        finally:
+            with self._lock:
+                self._folding.discard((agent, key))
+
+    async def close(self):
+        """Wait for summaries still in progress."""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return turn and fold counts, fold latency and history size per prompt."""
+        with self._lock:
+            fold_ms = sorted(self._fold_ms)
+            history = list(self._history_tokens)
+            return {
+                "turns": self._turns,
+                "folds": self._folds,
+                "folding": len(self._folding),
+                "turns_folded": self._turns_folded,
+                "fold_errors": self._fold_errors,
+                "fold_p50_ms": round(fold_ms[len(fold_ms) // 2], 1) if fold_ms else None,
+                "avg_history_tokens": round(sum(history) / len(history)) if history else None,
+                "max_history_tokens": max(history) if history else None,
+                "window_tokens": self.window_tokens
+            }
@@ -0,0 +1,187 @@
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+RUN_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class RunInProgress(Exception):
+    """Raised when a run is already executing in this process."""
+
+
+class CheckpointStore:
+    """One JSON file per team run, rewritten atomically after every stage.
+
+    A checkpoint holds the run input and the output of each completed
+    stage, so a failed or interrupted run can be resumed without
+    repeating the LLM calls that already succeeded. Writes go through one
+    background thread in the order they were saved, so stages never wait
+    on the disk and a read always sees every earlier save.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+        self._running = set()
+        self._started = 0
+        self._resumed = 0
+        self._completed = 0
+        self._failed = 0
+        self._stages_run = 0
+        self._stages_reused = 0
+        self._write_failures = 0
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="checkpoints")
+
+    @staticmethod
+    def new_run_id() -> str:
+        return uuid.uuid4().hex
+
+    def _path(self, run_id: str) -> Path:
+        # Run ids end up in file names, so only accept the ids we generate
+        if not RUN_ID_PATTERN.match(run_id or ''):
+            raise KeyError(run_id)
+        return self.directory / f"{run_id}.json"
+
+    def create(self, payload: Dict[str, Any], options: Optional[Dict[str, Any]] = None,
+               owner: Optional[str] = None) -> Dict[str, Any]:
+        """Start a new run checkpoint for `payload`, the request options it runs with and its owner."""
+        now = time.time()
+        checkpoint = {
+            "run_id": self.new_run_id(),
+            "owner": owner,
+            "status": "running",
+            "created_at": now,
+            "updated_at": now,
+            "input": payload,
+            "options": options or {},
+            "stages": {},
+            "error": None
+        }
+        self.save(checkpoint)
+        with self._lock:
+            self._started += 1
+        return checkpoint
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    async def load(self, run_id: str, owner: Optional[str] = None) -> Dict[str, Any]:
+        """Read a checkpoint; raises KeyError for unknown runs and runs belonging to another owner."""
+        path = self._path(run_id)
+        # Queued behind pending writes, so a run reads back as last saved
+        checkpoint = await asyncio.wrap_future(self._writer.submit(self._read, path))
+        # Same error as an unknown run, so run ids can't be probed across owners
+        if checkpoint is None or checkpoint.get("owner") != owner:
+            raise KeyError(run_id)
+        return checkpoint
+
+    def _write(self, path: Path, data: str):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # Write atomically so a crash never leaves a truncated checkpoint
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            with self._lock:
+                self._write_failures += 1
+            print(f"Warning: Failed to save checkpoint {path.stem} - {str(e)}")
+
+    def save(self, checkpoint: Dict[str, Any]):
+        """Queue a write of the checkpoint as it is now; later changes to the dict aren't included."""
+        checkpoint["updated_at"] = time.time()
+        path = self._path(checkpoint["run_id"])
+        self._writer.submit(self._write, path, json.dumps(checkpoint))
+
+    async def close(self):
+        """Wait for queued writes."""
+        await asyncio.to_thread(self._writer.shutdown, wait=True)
+
+    def is_running(self, run_id: str) -> bool:
+        with self._lock:
+            return run_id in self._running
+
+    @contextmanager
+    def claim(self, checkpoint: Dict[str, Any], resumed: bool = False) -> Iterator[Dict[str, Any]]:
+        """Mark a run as executing in this process for the duration of the block."""
+        run_id = checkpoint["run_id"]
+        with self._lock:
+            if run_id in self._running:
+                raise RunInProgress(run_id)
+            self._running.add(run_id)
+            if resumed:
+                self._resumed += 1
+        try:
+            if checkpoint["status"] != "completed":
+                checkpoint["status"] = "running"
+                checkpoint["error"] = None
+                self.save(checkpoint)
+            yield checkpoint
+        finally:
+            if checkpoint["status"] == "running":
+                # Client went away or the server is shutting down mid-stage
+                checkpoint["status"] = "interrupted"
+                self.save(checkpoint)
+            with self._lock:
+                self._running.discard(run_id)
+
+    def complete_stage(self, checkpoint: Dict[str, Any], stage: str, output: str,
+                       elapsed_ms: float, agent_version: Optional[str] = None):
+        checkpoint["stages"][stage] = {
+            "output": output,
+            "elapsed_ms": elapsed_ms,
+            "agent_version": agent_version,
+            "completed_at": time.time()
+        }
+        self.save(checkpoint)
+        with self._lock:
+            self._stages_run += 1
+
+    def reuse_stage(self):
+        with self._lock:
+            self._stages_reused += 1
+
+    def fail(self, checkpoint: Dict[str, Any], stage: str, error: str):
+        checkpoint["status"] = "failed"
+        checkpoint["error"] = {"stage": stage, "message": error}
+        self.save(checkpoint)
+        with self._lock:
+            self._failed += 1
+
+    def finish(self, checkpoint: Dict[str, Any]):
+        checkpoint["status"] = "completed"
+        self.save(checkpoint)
+        with self._lock:
+            self._completed += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Return run and stage counters."""
+        with self._lock:
+            return {
+                "running": len(self._running),
+                "started": self._started,
+                "resumed": self._resumed,
+                "completed": self._completed,
+                "failed": self._failed,
+                "stages_run": self._stages_run,
+                "stages_reused": self._stages_reused,
+                "write_failures": self._write_failures
+            }
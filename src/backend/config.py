@@ -1,9 +1,127 @@
 import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables from the root directory. This runs on the first import of
+# config, before any setting below (or in modules importing config) is read
+load_dotenv(Path(__file__).parent.parent / '.env', override=True)
 
 # API Configuration
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", "8000"))
 
+# Agent definitions (agent_config.json / prompt.yaml per agent)
+AGENTS_DIR = os.getenv("AGENTS_DIR", str(Path(__file__).resolve().parent.parent / "agents"))
+# Precompiled manifest built by `python manifest.py`; loaded at startup when present
+AGENTS_MANIFEST = os.getenv("AGENTS_MANIFEST", str(Path(AGENTS_DIR) / "agents_manifest.json"))
+# Watch agent files and swap edited prompts/configs into the running server
+AGENT_HOT_RELOAD = os.getenv("AGENT_HOT_RELOAD", "1") == "1"
+AGENT_RELOAD_INTERVAL = float(os.getenv("AGENT_RELOAD_INTERVAL", "2.0"))
+
+# Pool of reusable agent instances keyed by (agent, hashed API key, model params)
+AGENT_POOL_MAX_SIZE = int(os.getenv("AGENT_POOL_MAX_SIZE", "64"))
+AGENT_POOL_TTL = float(os.getenv("AGENT_POOL_TTL", "600"))
+
+# Bounded executor for blocking agent calls; excess load gets a 503 with Retry-After
+EXECUTOR_MAX_WORKERS = int(os.getenv("EXECUTOR_MAX_WORKERS", "10"))
+EXECUTOR_MAX_QUEUE = int(os.getenv("EXECUTOR_MAX_QUEUE", "50"))
+EXECUTOR_RETRY_AFTER = int(os.getenv("EXECUTOR_RETRY_AFTER", "5"))
+
+# Shared async HTTP pool for LLM calls (connections across all API keys, idle keep-alives)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "200"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "50"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+# Admission control for LLM calls: at most LLM_MAX_ACTIVE run at once and LLM_MAX_QUEUE wait,
+# each for up to LLM_QUEUE_TIMEOUT seconds; beyond that callers get a 503 with Retry-After
+LLM_MAX_ACTIVE = int(os.getenv("LLM_MAX_ACTIVE", "100"))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", "200"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+# Team-run checkpoints (one JSON file per run) and the deadline for each stage
+TEAM_RUN_DIR = os.getenv("TEAM_RUN_DIR", str(Path(__file__).resolve().parent / "team_runs"))
+TEAM_STAGE_TIMEOUT = float(os.getenv("TEAM_STAGE_TIMEOUT", "600"))
+
+# Exact-match response cache for agents with "cache_responses": true in agent_config.json
+# (memory LRU + disk tier; set RESPONSE_CACHE_DIR to an empty string for memory only)
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+RESPONSE_CACHE_DIR = os.getenv("RESPONSE_CACHE_DIR", str(Path(__file__).resolve().parent / "response_cache"))
+# Opted-in agents sampling above this temperature are never cached
+RESPONSE_CACHE_MAX_TEMPERATURE = float(os.getenv("RESPONSE_CACHE_MAX_TEMPERATURE", "0.3"))
+
+# Per-call prompt token budget when an agent sets no "prompt_token_budget"; upstream
+# outputs beyond it are trimmed, or summarized with this model for "budget_strategy": "summarize"
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))
+BUDGET_SUMMARY_MODEL = os.getenv("BUDGET_SUMMARY_MODEL", "gpt-4o-mini")
+
+# Analyst self-reflection: "off", "cheap" (REFLECTION_CHEAP_MODEL), "full", or "adaptive"
+# (full reflection only when the analysis looks unreliable). Requests can override it, and
+# REFLECTION_TENANT_POLICIES maps hashed API keys to a policy as JSON
+REFLECTION_POLICY = os.getenv("REFLECTION_POLICY", "full")
+REFLECTION_CHEAP_MODEL = os.getenv("REFLECTION_CHEAP_MODEL", "gpt-4o-mini")
+REFLECTION_TENANT_POLICIES = os.getenv("REFLECTION_TENANT_POLICIES", "")
+# Adaptive reflection triggers on analyses shorter than this or hedging more than this per 1k words
+REFLECTION_MIN_TOKENS = int(os.getenv("REFLECTION_MIN_TOKENS", "150"))
+REFLECTION_MAX_HEDGES = float(os.getenv("REFLECTION_MAX_HEDGES", "15"))
+
+# JSON-lines log of model cascade decisions (agents' "cascades"); empty disables it
+ROUTE_LOG_FILE = os.getenv("ROUTE_LOG_FILE", "")
+
+# Team member memory: LRU of the most recent results per worker, written behind to
+# MongoDB every MEMORY_FLUSH_INTERVAL seconds; entries expire after MEMORY_TTL seconds
+MEMORY_MAX_ENTRIES = int(os.getenv("MEMORY_MAX_ENTRIES", "500"))
+MEMORY_TTL = float(os.getenv("MEMORY_TTL", "604800"))
+MEMORY_FLUSH_INTERVAL = float(os.getenv("MEMORY_FLUSH_INTERVAL", "2"))
+# Writes queued while MongoDB is unreachable; the oldest are dropped beyond this
+MEMORY_MAX_PENDING = int(os.getenv("MEMORY_MAX_PENDING", "1000"))
+MEMORY_COLLECTION = os.getenv("MEMORY_COLLECTION", "agent_memory")
+
+# Conversation log: chat turns and pipeline outputs are buffered and written with insert_many
+# every CONVERSATION_LOG_BATCH_SIZE records or CONVERSATION_LOG_FLUSH_INTERVAL seconds.
+# Beyond CONVERSATION_LOG_MAX_BUFFER records they spill to this JSON-lines file (empty = drop)
+CONVERSATION_LOG_COLLECTION = os.getenv("CONVERSATION_LOG_COLLECTION", "conversations")
+CONVERSATION_LOG_BATCH_SIZE = int(os.getenv("CONVERSATION_LOG_BATCH_SIZE", "100"))
+CONVERSATION_LOG_FLUSH_INTERVAL = float(os.getenv("CONVERSATION_LOG_FLUSH_INTERVAL", "1"))
+CONVERSATION_LOG_MAX_BUFFER = int(os.getenv("CONVERSATION_LOG_MAX_BUFFER", "10000"))
+CONVERSATION_LOG_SPILL_FILE = os.getenv(
+    "CONVERSATION_LOG_SPILL_FILE", str(Path(__file__).resolve().parent / "conversation_spill.jsonl")
+)
+# Logged conversations are expired by a TTL index after this many seconds
+CONVERSATION_LOG_TTL = float(os.getenv("CONVERSATION_LOG_TTL", "2592000"))
+
+# /chat sessions (context.session_id): each prompt carries the newest turns that fit in
+# CHAT_WINDOW_TOKENS plus a rolling summary; once unsummarized turns exceed the window by
+# CHAT_FOLD_TOKENS the overflow is summarized with CHAT_SUMMARY_MODEL in the background
+CHAT_WINDOW_TOKENS = int(os.getenv("CHAT_WINDOW_TOKENS", "2000"))
+CHAT_FOLD_TOKENS = int(os.getenv("CHAT_FOLD_TOKENS", "1000"))
+CHAT_SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gpt-4o-mini")
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "400"))
+# Sessions held in memory per worker, in their own LRU so chat traffic never evicts agent memory
+CHAT_MAX_SESSIONS = int(os.getenv("CHAT_MAX_SESSIONS", "1000"))
+
+# Offline BM25 index of earlier pipeline step prompts/outputs and analyses, per API key.
+# Steps whose prompt is at least RETRIEVAL_GROUND_SIMILARITY similar to an earlier one get an
+# excerpt of its output as a reference; outputs are never reused verbatim.
+# Snapshotted to RETRIEVAL_INDEX_PATH on shutdown (empty = memory only)
+RETRIEVAL_INDEX_PATH = os.getenv("RETRIEVAL_INDEX_PATH", str(Path(__file__).resolve().parent / "retrieval_index.json"))
+RETRIEVAL_MAX_DOCUMENTS = int(os.getenv("RETRIEVAL_MAX_DOCUMENTS", "5000"))
+RETRIEVAL_GROUND_SIMILARITY = float(os.getenv("RETRIEVAL_GROUND_SIMILARITY", "0.6"))
+RETRIEVAL_GROUND_TOKENS = int(os.getenv("RETRIEVAL_GROUND_TOKENS", "300"))
+
+# MongoDB: one client per process. The pool is sized for the write-behind batches plus
+# request-path lookups; minPoolSize keeps warm connections so the first lookups don't pay for them
+MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017")
+MONGODB_DB = os.getenv("MONGODB_DB", "juici_agents")
+MONGODB_MAX_POOL_SIZE = int(os.getenv("MONGODB_MAX_POOL_SIZE", "50"))
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", "5"))
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+MONGODB_MAX_IDLE_TIME_MS = int(os.getenv("MONGODB_MAX_IDLE_TIME_MS", "60000"))
+# Seconds between background health probes (0 disables them; GET /health always probes)
+MONGODB_PROBE_INTERVAL = float(os.getenv("MONGODB_PROBE_INTERVAL", "30"))
+
+# Print the import/construction time breakdown once the server is ready
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") == "1"
+
 # Ollama Configuration
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 OLLAMA_GENERATE_ENDPOINT = f"{OLLAMA_BASE_URL}/api/generate"
@@ -17,9 +135,13 @@ CORS_ORIGINS = [
 ]
 
 # Timeout settings (in seconds)
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
 DEFAULT_TIMEOUT = 60
+# Deadline for each parallel Analyst branch; late branches are reported as missing
+ANALYST_BRANCH_TIMEOUT = float(os.getenv("ANALYST_BRANCH_TIMEOUT", "45"))
 UPLOAD_TIMEOUT = 120
 
 # Models
+DEFAULT_CHAT_MODEL = os.getenv("OPENAI_MODEL_NAME", "gpt-4o")
 DEFAULT_VISION_MODEL = "llava"
 DEFAULT_TEXT_MODEL = "llama3" 
\ No newline at end of file
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Returns the Mongo collection to write to, or None while MongoDB is unavailable
+CollectionGetter = Callable[[], Any]
+
+DUPLICATE_KEY = 11000
+
+
+def unwritten(error: Exception, documents: List[Any]) -> List[Any]:
+    """The documents a failed insert_many did not store.
+
+    Duplicate-key errors are records an earlier attempt already wrote, so
+    they count as written; without per-document errors nothing did.
+    """
+    write_errors = (getattr(error, "details", None) or {}).get("writeErrors")
+    if write_errors is None:
+        return list(documents)
+    failed_at = {write_error["index"] for write_error in write_errors if write_error.get("code") != DUPLICATE_KEY}
+    return [documents[i] for i in sorted(failed_at)]
+
+
+class ConversationLog:
+    """Write-behind log of chat turns and pipeline outputs.
+
+    record() only appends to an in-memory buffer, so the response path never
+    waits on MongoDB. A background task drains the buffer with insert_many
+    once `batch_size` records are waiting or `flush_interval` seconds have
+    passed. When the buffer is full, new records are spilled to a JSON-lines
+    file (replayed once MongoDB is back) or dropped if no spill file is set.
+    Every record gets its `_id` up front, so retrying a batch or replaying a
+    spill file after a partial failure never writes a record twice.
+    """
+
+    def __init__(self, get_collection: CollectionGetter, batch_size: int = 100, flush_interval: float = 1.0,
+                 max_buffer: int = 10000, spill_path: Optional[str] = None):
+        self.get_collection = get_collection
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.spill_path = spill_path
+        self._lock = threading.Lock()
+        # (enqueued at, document); oldest first
+        self._buffer: Deque[tuple] = deque()
+        self._spill: List[Dict[str, Any]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._recorded = 0
+        self._written = 0
+        self._batches = 0
+        self._max_batch = 0
+        self._errors = 0
+        self._spilled = 0
+        self._replayed = 0
+        self._dropped = 0
+        self._lag_ms: Deque[float] = deque(maxlen=500)
+
+    def record(self, kind: str, **fields):
+        """Queue one document; never blocks and never raises."""
+        document = {"_id": uuid.uuid4().hex, "kind": kind, "ts": datetime.now(timezone.utc), **fields}
+        with self._lock:
+            self._recorded += 1
+            if len(self._buffer) >= self.max_buffer:
+                if self.spill_path:
+                    self._spill.append(document)
+                    self._spilled += 1
+                else:
+                    self._dropped += 1
+            else:
+                self._buffer.append((time.perf_counter(), document))
+            full = len(self._buffer) >= self.batch_size or self._spill
+        if full and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _take(self) -> List[tuple]:
+        with self._lock:
+            return [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+
+    def _requeue(self, batch: List[tuple]):
+        with self._lock:
+            room = self.max_buffer - len(self._buffer)
+            # Put back in front, oldest first; whatever doesn't fit goes to the spill file
+            self._buffer.extendleft(reversed(batch[:room]))
+            overflow = [document for _, document in batch[room:]]
+            if self.spill_path:
+                self._spill.extend(overflow)
+                self._spilled += len(overflow)
+            else:
+                self._dropped += len(overflow)
+
+    def _write_spill(self, documents: List[Dict[str, Any]]):
+        with open(self.spill_path, 'a') as f:
+            for document in documents:
+                f.write(json.dumps({**document, "ts": document["ts"].isoformat()}) + "\n")
+
+    def _rewrite_replay(self, documents: List[Dict[str, Any]]):
+        replay_path = f"{self.spill_path}.replay"
+        with open(f"{replay_path}.tmp", 'w') as f:
+            for document in documents:
+                f.write(json.dumps({**document, "ts": document["ts"].isoformat()}) + "\n")
+        os.replace(f"{replay_path}.tmp", replay_path)
+
+    def _read_spill(self) -> List[Dict[str, Any]]:
+        replay_path = f"{self.spill_path}.replay"
+        # Rename first so records spilled while we replay land in a fresh file
+        if not os.path.exists(replay_path):
+            if not os.path.exists(self.spill_path):
+                return []
+            os.replace(self.spill_path, replay_path)
+        documents = []
+        with open(replay_path, 'r') as f:
+            for line in f:
+                if line.strip():
+                    document = json.loads(line)
+                    document["ts"] = datetime.fromisoformat(document["ts"])
+                    # Spilled before ids were assigned at record time
+                    document.setdefault("_id", uuid.uuid4().hex)
+                    documents.append(document)
+        return documents
+
+    async def _offload(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def flush(self) -> int:
+        """Write everything buffered in batches of `batch_size`; stops at the first failed batch."""
+        collection = self.get_collection()
+        with self._lock:
+            spill, self._spill = self._spill, []
+        if spill:
+            try:
+                await self._offload(self._write_spill, spill)
+            except Exception as e:
+                with self._lock:
+                    self._dropped += len(spill)
+                print(f"Warning: Failed to spill {len(spill)} conversation records - {str(e)}")
+        if collection is None:
+            return 0
+
+        written = 0
+        while True:
+            batch = self._take()
+            if not batch:
+                break
+            try:
+                await collection.insert_many([document for _, document in batch], ordered=False)
+            except Exception as e:
+                # Partial write: retry only what failed, except records a retry already wrote
+                failed = unwritten(e, batch)
+                if failed:
+                    self._requeue(failed)
+                    with self._lock:
+                        self._errors += 1
+                    print(f"Warning: Failed to write {len(failed)} conversation records - {str(e)}")
+                    break
+            now = time.perf_counter()
+            with self._lock:
+                self._written += len(batch)
+                self._batches += 1
+                self._max_batch = max(self._max_batch, len(batch))
+                # Flush lag: how long the oldest record of the batch sat in the buffer
+                self._lag_ms.append((now - batch[0][0]) * 1000)
+            written += len(batch)
+
+        if self.spill_path and not self._buffer:
+            await self._replay_spill(collection)
+        return written
+
+    async def _replay_spill(self, collection):
+        try:
+            documents = await self._offload(self._read_spill)
+        except Exception as e:
+            print(f"Warning: Failed to read spilled conversation records - {str(e)}")
+            return
+        if not documents:
+            return
+        replayed = 0
+        for start in range(0, len(documents), self.batch_size):
+            chunk = documents[start:start + self.batch_size]
+            try:
+                await collection.insert_many(chunk, ordered=False)
+            except Exception as e:
+                failed = unwritten(e, chunk)
+                if failed:
+                    # Keep only what is still unwritten; the ids make a later retry skip anything stored meanwhile
+                    remaining = failed + documents[start + self.batch_size:]
+                    replayed += len(chunk) - len(failed)
+                    with self._lock:
+                        self._replayed += replayed
+                    try:
+                        await self._offload(self._rewrite_replay, remaining)
+                    except Exception as rewrite_error:
+                        print(f"Warning: Failed to truncate the conversation replay file - {str(rewrite_error)}")
+                    print(f"Warning: Failed to replay {len(remaining)} spilled conversation records - {str(e)}")
+                    return
+            replayed += len(chunk)
+        await self._offload(os.remove, f"{self.spill_path}.replay")
+        with self._lock:
+            self._replayed += replayed
+        print(f"Replayed {replayed} spilled conversation records")
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Warning: Conversation log flush failed - {str(e)}")
+
+    def start(self):
+        """Start the background writer."""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def close(self):
+        """Stop the background writer and write out everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+        with self._lock:
+            leftover = [document for _, document in self._buffer]
+            self._buffer.clear()
+        if not leftover:
+            return
+        if self.spill_path:
+            # MongoDB is gone: keep what's left for the next start
+            self._write_spill(leftover)
+        with self._lock:
+            if self.spill_path:
+                self._spilled += len(leftover)
+            else:
+                self._dropped += len(leftover)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return throughput, batch sizes, flush lag and backlog."""
+        with self._lock:
+            lag = sorted(self._lag_ms)
+            oldest = self._buffer[0][0] if self._buffer else None
+            return {
+                "recorded": self._recorded,
+                "written": self._written,
+                "buffered": len(self._buffer),
+                "max_buffer": self.max_buffer,
+                "batches": self._batches,
+                "avg_batch_size": round(self._written / self._batches, 1) if self._batches else None,
+                "max_batch_size": self._max_batch,
+                "flush_lag_p50_ms": round(lag[len(lag) // 2], 1) if lag else None,
+                "flush_lag_max_ms": round(lag[-1], 1) if lag else None,
+                "oldest_buffered_ms": round((time.perf_counter() - oldest) * 1000, 1) if oldest else None,
+                "write_errors": self._errors,
+                "spilled": self._spilled,
+                "replayed": self._replayed,
+                "dropped": self._dropped
+            }
@@ -0,0 +1,174 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+from fastapi import HTTPException
+
+
+class ExecutorSaturated(HTTPException):
+    """Raised when the executor is full; surfaces as a 503 with Retry-After."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=503,
+            detail="Server is busy processing other requests. Please retry shortly.",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+
+class BoundedExecutor:
+    """Thread pool for blocking calls with admission control.
+
+    At most `max_workers` calls run at once and at most `max_queue` wait for
+    a worker; anything beyond that is rejected immediately instead of piling
+    up behind the event loop.
+    """
+
+    def __init__(self, max_workers: int = 10, max_queue: int = 50, retry_after: int = 5):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._completed = 0
+        self._rejected = 0
+        self._failed = 0
+
+    def _call(self, fn: Callable, *args, **kwargs) -> Any:
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def submit(self, fn: Callable, *args, **kwargs):
+        """Submit a blocking call, or raise ExecutorSaturated if the queue is full."""
+        with self._lock:
+            if self._active + self._queued >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(self.retry_after)
+            self._queued += 1
+        try:
+            return self._pool.submit(partial(self._call, fn, *args, **kwargs))
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            raise
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking call off the event loop and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+    def stats(self) -> Dict[str, int]:
+        """Return active, queued, completed and rejected counts."""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected
+            }
+
+
+class AdmissionGate:
+    """Admission control for async calls, the event-loop counterpart of BoundedExecutor.
+
+    At most `max_active` calls hold a slot at once and at most `max_queue`
+    wait for one, each for up to `queue_timeout` seconds. Anything beyond
+    that is rejected with ExecutorSaturated instead of waiting in the HTTP
+    connection pool until it times out.
+    """
+
+    def __init__(self, max_active: int = 50, max_queue: int = 200, queue_timeout: float = 30.0,
+                 retry_after: int = 5):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        # Created on first use, inside the server's event loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._active = 0
+        self._queued = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._wait_ms: Deque[float] = deque(maxlen=500)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Hold one slot for the duration of the block, or raise ExecutorSaturated."""
+        with self._lock:
+            if self._active + self._queued >= self.max_active + self.max_queue:
+                self._rejected += 1
+                raise ExecutorSaturated(self.retry_after)
+            self._queued += 1
+            if self._semaphore is None:
+                self._semaphore = asyncio.Semaphore(self.max_active)
+            semaphore = self._semaphore
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._queued -= 1
+                self._timed_out += 1
+            raise ExecutorSaturated(self.retry_after)
+        except BaseException:
+            with self._lock:
+                self._queued -= 1
+            raise
+        with self._lock:
+            self._queued -= 1
+            self._active += 1
+            self._wait_ms.append((time.perf_counter() - started) * 1000)
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            semaphore.release()
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return active, queued, completed and rejected counts and queue wait times."""
+        with self._lock:
+            waits = sorted(self._wait_ms)
+            return {
+                "max_active": self.max_active,
+                "max_queue": self.max_queue,
+                "active": self._active,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "timed_out": self._timed_out,
+                "wait_p50_ms": round(waits[len(waits) // 2], 1) if waits else None,
+                "wait_max_ms": round(waits[-1], 1) if waits else None
+            }
@@ -0,0 +1,264 @@
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from agent_pool import hash_api_key
+from config import (
+    LLM_MAX_CONNECTIONS, LLM_MAX_KEEPALIVE, LLM_TIMEOUT, LLM_MAX_ACTIVE, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT,
+    EXECUTOR_RETRY_AFTER
+)
+from executor import AdmissionGate
+
+
+# Every LLM call in the process shares one connection pool
+_http_client: Optional[httpx.AsyncClient] = None
+
+# One lightweight OpenAI client per API key, all sharing the pooled HTTP client
+_clients: Dict[str, AsyncOpenAI] = {}
+_clients_lock = threading.Lock()
+
+# Every completion and stream takes a slot first; overload gets a 503 instead of a pool timeout
+llm_gate = AdmissionGate(
+    max_active=LLM_MAX_ACTIVE,
+    max_queue=LLM_MAX_QUEUE,
+    queue_timeout=LLM_QUEUE_TIMEOUT,
+    retry_after=EXECUTOR_RETRY_AFTER
+)
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the process-wide pooled HTTP client."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        with _clients_lock:
+            if _http_client is None or _http_client.is_closed:
+                _http_client = httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                        keepalive_expiry=60
+                    ),
+                    timeout=httpx.Timeout(LLM_TIMEOUT, connect=10.0)
+                )
+                _clients.clear()
+    return _http_client
+
+
+async def aclose():
+    """Close the shared HTTP client and drop the per-key clients."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+    _clients.clear()
+
+
+def get_client(api_key: str) -> AsyncOpenAI:
+    """Return the async OpenAI client for an API key."""
+    http_client = get_http_client()
+    key = hash_api_key(api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = AsyncOpenAI(api_key=api_key, http_client=http_client)
+                _clients[key] = client
+    return client
+
+
+class CompletionStats:
+    """Counters for non-streaming completions."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "in_flight": self.in_flight,
+                "prompt_tokens": self.prompt_tokens,
+                "completion_tokens": self.completion_tokens
+            }
+
+
+completion_stats = CompletionStats()
+
+
+class PromptCacheStats:
+    """Provider prompt-cache hits, with latency split by hit and miss."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hits = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self._hit_latency: Deque[float] = deque(maxlen=window)
+        self._miss_latency: Deque[float] = deque(maxlen=window)
+
+    def record(self, usage: Any, latency: float):
+        if usage is None:
+            return
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = (getattr(details, 'cached_tokens', 0) or 0) if details is not None else 0
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.cached_tokens += cached
+            if cached:
+                self.hits += 1
+                self._hit_latency.append(latency)
+            else:
+                self._miss_latency.append(latency)
+
+    @staticmethod
+    def _median_ms(values: List[float]) -> Optional[float]:
+        if not values:
+            return None
+        return round(sorted(values)[len(values) // 2] * 1000, 1)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hits": self.hits,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "cached_ratio": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else None,
+                "hit_latency_p50_ms": self._median_ms(list(self._hit_latency)),
+                "miss_latency_p50_ms": self._median_ms(list(self._miss_latency))
+            }
+
+
+prompt_cache_stats = PromptCacheStats()
+
+
+def _params(messages: List[Dict[str, str]], model: str, temperature: Optional[float],
+            max_tokens: Optional[int], **extra) -> Dict[str, Any]:
+    params: Dict[str, Any] = {"model": model, "messages": messages, **extra}
+    if temperature is not None:
+        params["temperature"] = temperature
+    if max_tokens is not None:
+        params["max_tokens"] = max_tokens
+    return params
+
+
+async def complete(messages: List[Dict[str, str]], model: str, api_key: str,
+                   temperature: Optional[float] = None,
+                   max_tokens: Optional[int] = None) -> str:
+    """Run one chat completion on the shared connection pool."""
+    stats = completion_stats
+    with stats._lock:
+        stats.calls += 1
+        stats.in_flight += 1
+    try:
+        async with llm_gate.slot():
+            started = time.perf_counter()
+            response = await get_client(api_key).chat.completions.create(
+                **_params(messages, model, temperature, max_tokens)
+            )
+    except Exception:
+        with stats._lock:
+            stats.errors += 1
+        raise
+    finally:
+        with stats._lock:
+            stats.in_flight -= 1
+
+    usage = getattr(response, 'usage', None)
+    prompt_cache_stats.record(usage, time.perf_counter() - started)
+    if usage is not None:
+        with stats._lock:
+            stats.prompt_tokens += usage.prompt_tokens or 0
+            stats.completion_tokens += usage.completion_tokens or 0
+    return response.choices[0].message.content or ""
+
+
+class LatencyStats:
+    """Rolling window of streaming latencies, reported as percentiles."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._ttft: Deque[float] = deque(maxlen=window)
+        self._total: Deque[float] = deque(maxlen=window)
+        self._streams = 0
+        self._errors = 0
+
+    def record(self, ttft: Optional[float], total: float, error: bool = False):
+        with self._lock:
+            self._streams += 1
+            if error:
+                self._errors += 1
+            if ttft is not None:
+                self._ttft.append(ttft)
+            self._total.append(total)
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+        if not values:
+            return {"p50": None, "p95": None, "p99": None}
+        values = sorted(values)
+        pick = lambda q: round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 1)
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            ttft, total = list(self._ttft), list(self._total)
+            streams, errors = self._streams, self._errors
+        return {
+            "streams": streams,
+            "errors": errors,
+            "time_to_first_token_ms": self._percentiles(ttft),
+            "total_ms": self._percentiles(total)
+        }
+
+
+stream_stats = LatencyStats()
+
+
+async def stream_chat(messages: List[Dict[str, str]], model: str, api_key: str,
+                      temperature: Optional[float] = None,
+                      max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+    """Yield completion tokens as the provider produces them."""
+    # The slot is held until the stream ends, since that is how long the connection is busy
+    async with llm_gate.slot():
+        started = time.perf_counter()
+        first_token = None
+        error = False
+        stream = None
+        try:
+            stream = await get_client(api_key).chat.completions.create(
+                **_params(messages, model, temperature, max_tokens, stream=True,
+                          stream_options={"include_usage": True})
+            )
+            async for chunk in stream:
+                if getattr(chunk, 'usage', None) is not None:
+                    # Final chunk: usage only, including cached prompt tokens
+                    prompt_cache_stats.record(chunk.usage, first_token or (time.perf_counter() - started))
+                if not chunk.choices:
+                    continue
+                content = chunk.choices[0].delta.content
+                if content:
+                    if first_token is None:
+                        first_token = time.perf_counter() - started
+                    yield content
+        except Exception:
+            error = True
+            raise
+        finally:
+            # Closing the response stops the provider from generating unread tokens
+            if stream is not None:
+                await stream.close()
+            stream_stats.record(first_token, time.perf_counter() - started, error)
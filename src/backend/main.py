@@ -1,39 +1,74 @@
-from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Header, Depends
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, AsyncGenerator
+from startup_profile import startup_profiler, LazyModule
+with startup_profiler.phase("fastapi, pydantic"):
+    from fastapi import FastAPI, HTTPException, File, UploadFile, Form, Header, Depends, Request
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.middleware.gzip import GZipMiddleware
+    from pydantic import BaseModel
+from typing import List, Optional, Dict, Any, AsyncGenerator, Tuple, TYPE_CHECKING
 import os
-import yaml
 import json
 import asyncio
-import plotly.graph_objects as go
-import plotly.express as px
-import pandas as pd
-import numpy as np
-from pathlib import Path
-from dotenv import load_dotenv
-from praisonaiagents import Agent
-import requests
-from PIL import Image
+with startup_profiler.phase("praisonaiagents"):
+    from praisonaiagents import Agent
+import httpx
 from io import BytesIO
 import base64
-import queue
-import threading
-from concurrent.futures import ThreadPoolExecutor
-from functools import lru_cache
-from fastapi.middleware.gzip import GZipMiddleware
-import aiohttp
-from motor.motor_asyncio import AsyncIOMotorClient
+import hashlib
+import copy
+from contextlib import ExitStack
 import gc
-import psutil
 import time
 import random
-from config import CORS_ORIGINS, OLLAMA_GENERATE_ENDPOINT, DEFAULT_TIMEOUT
+from config import (
+    CORS_ORIGINS, OLLAMA_GENERATE_ENDPOINT, DEFAULT_TIMEOUT, AGENTS_DIR, AGENTS_MANIFEST,
+    AGENT_HOT_RELOAD, AGENT_RELOAD_INTERVAL, STARTUP_PROFILE, AGENT_POOL_MAX_SIZE, AGENT_POOL_TTL,
+    DEFAULT_CHAT_MODEL, SSE_HEARTBEAT_INTERVAL, EXECUTOR_MAX_WORKERS, EXECUTOR_MAX_QUEUE,
+    EXECUTOR_RETRY_AFTER, ANALYST_BRANCH_TIMEOUT, TEAM_RUN_DIR, TEAM_STAGE_TIMEOUT,
+    RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL, RESPONSE_CACHE_DIR, RESPONSE_CACHE_MAX_TEMPERATURE,
+    PROMPT_TOKEN_BUDGET, BUDGET_SUMMARY_MODEL, REFLECTION_POLICY, REFLECTION_CHEAP_MODEL,
+    REFLECTION_TENANT_POLICIES, REFLECTION_MIN_TOKENS, REFLECTION_MAX_HEDGES, ROUTE_LOG_FILE,
+    MEMORY_MAX_ENTRIES, MEMORY_TTL, MEMORY_FLUSH_INTERVAL, MEMORY_MAX_PENDING, MEMORY_COLLECTION,
+    CONVERSATION_LOG_COLLECTION, CONVERSATION_LOG_BATCH_SIZE, CONVERSATION_LOG_FLUSH_INTERVAL,
+    CONVERSATION_LOG_MAX_BUFFER, CONVERSATION_LOG_SPILL_FILE, CONVERSATION_LOG_TTL,
+    MONGODB_URL, MONGODB_DB, MONGODB_MAX_POOL_SIZE, MONGODB_MIN_POOL_SIZE,
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS, MONGODB_MAX_IDLE_TIME_MS, MONGODB_PROBE_INTERVAL,
+    CHAT_WINDOW_TOKENS, CHAT_FOLD_TOKENS, CHAT_SUMMARY_MODEL, CHAT_SUMMARY_TOKENS, CHAT_MAX_SESSIONS,
+    RETRIEVAL_INDEX_PATH, RETRIEVAL_MAX_DOCUMENTS, RETRIEVAL_GROUND_SIMILARITY,
+    RETRIEVAL_GROUND_TOKENS
+)
+from registry import AgentRegistry, AgentSpec, thaw
+from agent_pool import AgentPool, hash_api_key
+from llm import (
+    stream_chat, stream_stats, complete, completion_stats, prompt_cache_stats, get_http_client, llm_gate,
+    aclose as close_llm_clients
+)
+import sse
+from executor import BoundedExecutor
+from pipeline import Pipeline, PipelineRun, Step, pipeline_stats
+from checkpoints import CheckpointStore
+from response_cache import ResponseCache, CacheBypassMiddleware, cache_key, cache_bypass
+from singleflight import SingleFlight
+from memory_store import MemoryStore
+from conversation_log import ConversationLog
+from mongo import MongoRegistry
+from chat_history import ChatSessions
+from budget import fit_artifacts, budget_stats
+from retrieval import BM25Index, grounded_prompt, grounding_source, grounding_stats
+from tokens import count_tokens
+from routing import Cascade, parse_cascade, route_stats
+from reflection import (
+    OFF, CHEAP, FULL, ADAPTIVE, resolve_policy, parse_tenant_policies, confidence_flags, reflection_stats
+)
+from watcher import AgentWatcher
 
-# Load environment variables from the root directory
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(env_path, override=True)
+# Heavy dependencies only needed by one subsystem are imported on first use
+pd = LazyModule("pandas")
+np = LazyModule("numpy")
+px = LazyModule("plotly.express")
+Image = LazyModule("PIL.Image")
+psutil = LazyModule("psutil")
+if TYPE_CHECKING:
+    import pandas
 
 # Optional environment variable check - now we don't require it since users can provide their own
 default_api_key = os.getenv('OPENAI_API_KEY')
@@ -51,6 +86,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# X-Cache-Bypass: 1 skips response cache reads for this request
+app.add_middleware(CacheBypassMiddleware)
+
 # Models
 class Message(BaseModel):
     role: str
@@ -69,6 +107,7 @@ class AgentConfig(BaseModel):
 class AgentInfo(BaseModel):
     config: AgentConfig
     example_prompts: List[str]
+    prompt_tokens: Optional[int] = None
 
 # Digital Transform Team Models
 class BusinessInfo(BaseModel):
@@ -81,6 +120,8 @@ class BusinessInfo(BaseModel):
 
 class AnalysisRequest(BaseModel):
     business_info: BusinessInfo
+    # Self-reflection policy for this request: off, cheap, full or adaptive
+    reflection: Optional[str] = None
 
 class DesignRequest(BaseModel):
     solution_design: str
@@ -98,179 +139,575 @@ class MeasurementRequest(BaseModel):
     training_data: str
     measurement_requirements: Dict[str, Any]
 
-# Create thread pool for parallel processing
-thread_pool = ThreadPoolExecutor(max_workers=10)
+# Bounded thread pool for the remaining blocking calls, keeping them off the event loop
+blocking_executor = BoundedExecutor(
+    max_workers=EXECUTOR_MAX_WORKERS,
+    max_queue=EXECUTOR_MAX_QUEUE,
+    retry_after=EXECUTOR_RETRY_AFTER
+)
+
+# Coalesces identical in-flight LLM calls
+single_flight = SingleFlight()
 
-# Create response queue for streaming
-response_queue = queue.Queue()
+# Offline full-text index of earlier step prompts and their outputs, for grounding new ones
+retrieval_index = BM25Index(max_documents=RETRIEVAL_MAX_DOCUMENTS)
 
 class StreamingAgent(Agent):
-    """Enhanced Agent with streaming capabilities"""
-    def __init__(self, *args, api_key=None, **kwargs):
+    """Enhanced Agent with async and token-level streaming capabilities"""
+    def __init__(self, *args, api_key=None, focus=None, temperature=None, max_tokens=None, cache=None,
+                 cascade=None, **kwargs):
         # Pass API key to the parent Agent class
         if api_key:
             kwargs['api_key'] = api_key
         super().__init__(*args, **kwargs)
-        self.response_queue = response_queue
+        self.stream_api_key = api_key or default_api_key
+        # Role-specific line sent ahead of each prompt, after the shared system prefix
+        self.focus = focus
+        # Sampling params from agent_config.json, sent with every async call
+        self.llm_params = {"temperature": temperature, "max_tokens": max_tokens}
+        # Response cache, only for agents that opt in with cache_responses
+        self.cache = cache
+        # Cheaper models to try before the configured one, from the agent's "cascades"
+        self.cascade: Optional[Cascade] = cascade
+
+    @property
+    def model_name(self) -> str:
+        """Model the parent Agent was configured with."""
+        llm = getattr(self, 'llm', None)
+        return llm if isinstance(llm, str) else DEFAULT_CHAT_MODEL
+
+    def build_messages(self, prompt: str, history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, str]]:
+        """Build the system + user messages for one call.
+
+        The system message is the agent's instructions, unchanged, so every
+        role of a team sends the same prefix; anything role- or
+        request-specific goes last, after any conversation history.
+        """
+        if self.focus:
+            prompt = f"{self.focus}\n\n{prompt}"
+        return [
+            {"role": "system", "content": self.instructions},
+            *(history or []),
+            {"role": "user", "content": prompt}
+        ]
+
+    def request_key(self, messages: List[Dict[str, str]], model: Optional[str] = None) -> str:
+        """Key identifying this exact completion for this API key, ignoring whitespace differences."""
+        normalized = [{**m, "content": " ".join(m["content"].split())} for m in messages]
+        return cache_key(hash_api_key(self.stream_api_key), model or self.model_name, messages=normalized,
+                         **self.llm_params)
+
+    async def _complete(self, messages: List[Dict[str, str]], key: str, model: Optional[str] = None) -> str:
+        response = await complete(messages, model or self.model_name, self.stream_api_key, **self.llm_params)
+        if self.cache is not None and response:
+            self.cache.set(key, response)
+        return response
+
+    async def _stream(self, messages: List[Dict[str, str]], key: str) -> AsyncGenerator[str, None]:
+        tokens = []
+        async for token in stream_chat(messages, self.model_name, self.stream_api_key, **self.llm_params):
+            tokens.append(token)
+            yield token
+        # Only complete streams are cached; an abandoned one never gets here
+        if self.cache is not None and tokens:
+            self.cache.set(key, "".join(tokens))
+
+    async def astart(self, prompt: str, model: Optional[str] = None) -> str:
+        """Async counterpart of start(), awaiting the completion on the shared HTTP pool"""
+        messages = self.build_messages(prompt)
+        if model is None and self.cascade is not None:
+            # Cheap models first, escalating only when a validator rejects the answer
+            return await self.cascade.run(lambda cascade_model: self._astart(messages, cascade_model))
+        return await self._astart(messages, model)
+
+    async def cached(self, prompt: str) -> Optional[str]:
+        """Return the cached completion for `prompt` without calling the model, or None."""
+        # Cascades may have cached answers their validators rejected, so they always go through astart()
+        if self.cache is None or self.cascade is not None:
+            return None
+        return await self.cache.get(self.request_key(self.build_messages(prompt)), count_miss=False)
+
+    async def _astart(self, messages: List[Dict[str, str]], model: Optional[str]) -> str:
+        key = self.request_key(messages, model)
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+        
+        # Identical concurrent calls on the same API key share one upstream completion
+        return await single_flight.do(key, lambda: self._complete(messages, key, model))
+
+    async def stream_start(self, prompt: str,
+                           history: Optional[List[Dict[str, str]]] = None) -> AsyncGenerator[str, None]:
+        """Stream response tokens as the provider generates them"""
+        # Tokens reach the client before they could be validated, so streams skip the cascade
+        messages = self.build_messages(prompt, history)
+        key = self.request_key(messages)
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        # Identical concurrent streams share one upstream stream, fanned out to every caller
+        async for token in single_flight.stream(key, lambda: self._stream(messages, key)):
+            yield token
 
-    async def stream_start(self, prompt: str) -> AsyncGenerator[str, None]:
-        """Stream responses as they are generated"""
-        try:
-            # Start response generation in a separate thread
-            future = thread_pool.submit(self.start, prompt)
-            
-            # Stream partial responses
-            while not future.done():
-                if not self.response_queue.empty():
-                    yield self.response_queue.get()
-                await asyncio.sleep(0.1)
-            
-            # Get final response
-            final_response = future.result()
-            if final_response:
-                yield final_response
-                
-        except Exception as e:
-            yield f"Error: {str(e)}"
+# Parsed agent configs and prompts, shared by every request
+agent_registry = AgentRegistry(AGENTS_DIR)
+if os.path.exists(AGENTS_MANIFEST):
+    try:
+        with startup_profiler.phase("agent manifest", "construct"):
+            print(f"Loaded {agent_registry.load_manifest(AGENTS_MANIFEST)} agents from {AGENTS_MANIFEST}")
+    except Exception as e:
+        print(f"Warning: Failed to load agent manifest - {str(e)}")
+agent_watcher = AgentWatcher(agent_registry, poll_interval=AGENT_RELOAD_INTERVAL)
 
 # Add utility functions
-def load_agent_config(agent_name: str) -> tuple[dict, str]:
-    """Load agent configuration and prompt."""
+def get_agent_spec(agent_name: str) -> AgentSpec:
+    """Get the parsed agent spec from the registry."""
     try:
-        base_path = Path(__file__).parent.parent
-        
-        if agent_name.startswith('digital_transform_'):
-            # Load from DigitalTransform directory
-            config_path = base_path / 'DigitalTransform/agent_config.json'
-            agent_type = agent_name.split('_')[-1].capitalize()
-            prompt_path = base_path / 'DigitalTransform/prompts' / f"{agent_type.lower()}.yaml"
-            
-            if not config_path.exists() or not prompt_path.exists():
-                raise FileNotFoundError(f"Configuration files not found for agent {agent_name}")
-            
-            with open(config_path) as f:
-                full_config = json.load(f)
-                if agent_type not in full_config['agents']:
-                    raise ValueError(f"Agent {agent_type} not found in Digital Transform team")
-                config = full_config['agents'][agent_type]
-        else:
-            # Load from agent-specific directory
-            config_path = base_path / agent_name / "agent_config.json"
-            prompt_path = base_path / agent_name / "prompt.yaml"
-            
-            if not config_path.exists() or not prompt_path.exists():
-                raise FileNotFoundError(f"Configuration files not found for agent {agent_name}")
-            
-            with open(config_path) as f:
-                config = json.load(f)
-        
-        with open(prompt_path) as f:
-            prompt = yaml.safe_load(f)['instructions']
-        
-        return config, prompt
+        return agent_registry.get(agent_name)
     except Exception as e:
         print(f"Error loading agent {agent_name}: {str(e)}")  # Debug log
         raise HTTPException(status_code=404, detail=f"Error loading agent {agent_name}: {str(e)}")
 
-# Add AnalystAgent class
-class AnalystAgent:
+def load_agent_config(agent_name: str) -> tuple[dict, str]:
+    """Load agent configuration and prompt."""
+    spec = get_agent_spec(agent_name)
+    return spec.config, spec.instructions
+
+# Reusable agent instances, so LLM clients and their connections survive across requests
+agent_pool = AgentPool(max_size=AGENT_POOL_MAX_SIZE, ttl=AGENT_POOL_TTL)
+
+# Exact-match completion cache for deterministic agents
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_MAX_ENTRIES,
+    ttl=RESPONSE_CACHE_TTL,
+    directory=RESPONSE_CACHE_DIR or None
+)
+
+def response_cache_for(spec: AgentSpec) -> Optional[ResponseCache]:
+    """Return the response cache if this agent opted in and samples deterministically enough."""
+    if not spec.config.get('cache_responses'):
+        return None
+    temperature = spec.config.get('temperature')
+    if temperature is not None and temperature > RESPONSE_CACHE_MAX_TEMPERATURE:
+        return None
+    return response_cache
+
+def cascade_for(spec: AgentSpec, role: str) -> Optional[Cascade]:
+    """Return the model cascade configured for one role of an agent, if any."""
+    try:
+        return parse_cascade(f"{spec.name}.{role}", (spec.config.get('cascades') or {}).get(role),
+                             spec.config.get('model'))
+    except ValueError as e:
+        print(f"Warning: Ignoring cascade for {spec.name}.{role} - {str(e)}")
+        return None
+
+def checkout_agent(spec: AgentSpec, api_key: str, role: str = "default",
+                   instructions: Optional[str] = None, focus: Optional[str] = None):
+    """Borrow a pooled agent for this spec, API key and role; return it when done."""
+    key = AgentPool.make_key(
+        spec.name, api_key,
+        role=role,
+        version=spec.content_hash,
+        model=spec.config.get('model'),
+        temperature=spec.config.get('temperature'),
+        max_tokens=spec.config.get('max_tokens')
+    )
+    return agent_pool.checkout(key, lambda: StreamingAgent(
+        instructions=instructions or spec.instructions,
+        api_key=api_key,
+        llm=spec.config.get('model'),
+        focus=focus,
+        temperature=spec.config.get('temperature'),
+        max_tokens=spec.config.get('max_tokens'),
+        cache=response_cache_for(spec),
+        cascade=cascade_for(spec, role)
+    ))
+
+# Shared base for the Digital Transform team members
+class TeamMember:
+    """A team member's shared, read-only blueprint.
+
+    Requests never touch the global instance's state. Instead they call
+    bind(api_key), which pins the current prompt version and credentials
+    into a per-request copy whose sub-agents are borrowed from the pool
+    the first time a pipeline step uses them.
+    """
+    agent_name: str = ''
+    # Sub-agent attribute name -> role-specific focus line
+    components: Dict[str, str] = {}
+    # Sub-agent steps and their inputs, run by run_pipeline()
+    pipeline: Optional[Pipeline] = None
+    # Context key the request payload is exposed as in step prompts
+    pipeline_input: str = 'requirements'
+    # Stage name for the assembled document when streaming
+    result_stage: str = 'result'
+    # Per-request options bind() accepts as attributes; others are ignored
+    request_options: Tuple[str, ...] = ()
+
     def __init__(self):
-        self.config = load_agent_config('digital_transform_analyst')[0]
-        self.instructions = load_agent_config('digital_transform_analyst')[1]
-        self.memory = {}
+        self.spec = get_agent_spec(self.agent_name)
         self.api_key = None
-        self.initialize_components()
-
-    def update_api_key(self, api_key):
-        """Update the API key for all components."""
-        self.api_key = api_key
-        # Update API key for all components
-        self.process_analyzer = Agent(
-            instructions=f"{self.instructions}\nFocus on process analysis and workflow optimization.",
-            api_key=api_key
-        )
+        self._checkouts = None
+        self.last_run: Optional[PipelineRun] = None
+
+    @property
+    def config(self):
+        return self.spec.config
+
+    @property
+    def instructions(self) -> str:
+        return self.spec.instructions
+
+    def component_prompt(self, name: str) -> Tuple[str, Optional[str]]:
+        """Return the system prompt and role focus for one sub-agent."""
+        # Every role shares the team instructions verbatim so the provider can cache them;
+        # the focus line travels with the user message instead
+        return self.instructions, self.components[name]
+
+    def bind(self, api_key: str, **options) -> "TeamMember":
+        """Return a request-scoped copy bound to an API key, prompt version and request options."""
+        bound = copy.copy(self)
+        # Pick up prompts hot-reloaded since the global instance was created
+        bound.spec = get_agent_spec(self.agent_name)
+        bound.api_key = api_key
+        bound._checkouts = ExitStack()
+        for name, value in options.items():
+            if name in self.request_options and value is not None:
+                setattr(bound, name, value)
+        return bound
+
+    def memory_scope(self, key: str) -> str:
+        """Prefix a memory key with the hashed API key, so one key's results are never recalled for another."""
+        return f"{hash_api_key(self.api_key)}:{key}"
+
+    async def recall(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up an earlier result this member stored under `key` for the bound API key."""
+        return await memory_store.get(self.agent_name, self.memory_scope(key))
+
+    def remember(self, key: str, entry: Dict[str, Any]):
+        """Store a result in this member's memory for the bound API key; persisted in the background."""
+        memory_store.put(self.agent_name, self.memory_scope(key), entry)
+
+    def pipeline_context(self, payload: Dict) -> Dict[str, Any]:
+        """Expose a request payload to the step prompts."""
+        return {self.pipeline_input: json.dumps(payload, indent=2)}
+
+    def render(self, run: PipelineRun) -> str:
+        """Assemble the pipeline outputs into one document."""
+        return "\n\n".join(run.outputs[name] for name in self.pipeline.order)
+
+    async def fit_inputs(self, agent: StreamingAgent, artifacts: Dict[str, str], fixed: str,
+                         stage: str) -> Dict[str, str]:
+        """Compress upstream outputs so the call stays within this member's prompt token budget."""
+        model = agent.model_name
+        fixed_tokens = sum(count_tokens(text, model) for text in (agent.instructions, agent.focus, fixed))
+        budget = self.config.get('prompt_token_budget') or PROMPT_TOKEN_BUDGET
         
-        self.gap_assessor = Agent(
-            instructions=f"{self.instructions}\nFocus on identifying gaps and maturity assessment.",
-            api_key=api_key
-        )
+        summarize = None
+        if self.config.get('budget_strategy') == 'summarize':
+            async def summarize(text: str, limit: int) -> str:
+                messages = [
+                    {"role": "system", "content": "Condense documents without losing concrete decisions, names or numbers."},
+                    {"role": "user", "content": f"Condense the following to at most {limit} tokens:\n\n{text}"}
+                ]
+                # Parallel steps often condense the same upstream output
+                key = cache_key(hash_api_key(agent.stream_api_key), BUDGET_SUMMARY_MODEL, 0, limit, messages)
+                return await single_flight.do(key, lambda: complete(
+                    messages, BUDGET_SUMMARY_MODEL, agent.stream_api_key, temperature=0, max_tokens=limit
+                ))
         
-        self.opportunity_finder = Agent(
-            instructions=f"{self.instructions}\nFocus on identifying opportunities and innovation potential.",
-            api_key=api_key
-        )
+        return await fit_artifacts(artifacts, fixed_tokens, budget, stage, model=model, summarize=summarize)
+
+    def retrieval_scope(self, **extra) -> Dict[str, Any]:
+        """Metadata every retrieval for this member must match; never crosses API keys."""
+        return {"agent": self.agent_name, "tenant": hash_api_key(self.api_key), **extra}
+
+    async def call_with_retrieval(self, step: Step, agent: StreamingAgent, prompt: str) -> str:
+        """Run one step, grounded on the closest earlier result for the same step if it is similar enough.
+
+        Exact repeats are served by the response cache where an agent opts in,
+        checked before grounding so the repeat's prompt is never rewritten.
+        """
+        stage = f"{self.pipeline.name}.{step.name}"
+        scope = self.retrieval_scope(step=step.name)
+        doc_id = f"{scope['tenant']}:{stage}:{hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]}"
+        output = await agent.cached(prompt)
+        if output is not None:
+            return output
         
-        self.recommendation_maker = Agent(
-            instructions=f"{self.instructions}\nFocus on making actionable recommendations.",
-            api_key=api_key
+        best = None if cache_bypass.get() else grounding_source(
+            retrieval_index, prompt, RETRIEVAL_GROUND_SIMILARITY, where=scope, own_id=doc_id
         )
+        grounded = prompt
+        if best is not None:
+            grounded = grounded_prompt(prompt, best["metadata"]["output"], RETRIEVAL_GROUND_TOKENS, agent.model_name)
+        output = await agent.astart(grounded)
+        grounding_stats.record(stage, grounded is not prompt)
+        
+        retrieval_index.add(doc_id, prompt, {**scope, "output": output})
+        return output
 
-    def initialize_components(self):
-        """Initialize specialized components for different analysis tasks."""
-        self.process_analyzer = Agent(
-            instructions=f"{self.instructions}\nFocus on process analysis and workflow optimization."
-        )
+    async def run_pipeline(self, context: Dict[str, Any], on_step=None) -> PipelineRun:
+        """Run this member's pipeline, each step on its own pooled sub-agent."""
+        async def call(step: Step, prompt: str) -> str:
+            return await self.call_with_retrieval(step, getattr(self, step.agent), prompt)
         
-        self.gap_assessor = Agent(
-            instructions=f"{self.instructions}\nFocus on identifying gaps and maturity assessment."
-        )
+        async def prepare(step: Step, context: Dict[str, Any], inputs: Dict[str, str]) -> Dict[str, str]:
+            fixed = step.prompt.format(**context, **{name: '' for name in inputs})
+            return await self.fit_inputs(getattr(self, step.agent), inputs, fixed, f"{self.pipeline.name}.{step.name}")
         
-        self.opportunity_finder = Agent(
-            instructions=f"{self.instructions}\nFocus on identifying opportunities and innovation potential."
-        )
+        run = await self.pipeline.run(call, context, on_step=on_step, prepare=prepare)
+        self.last_run = run
+        print(f"{self.pipeline.name} pipeline: {run.elapsed_ms} ms, critical path "
+              f"{' -> '.join(run.critical_path)} ({run.critical_path_ms} ms)")
+        return run
+
+    async def execute(self, payload: Dict) -> str:
+        """Run the full pipeline for a request payload and return the document; raises on failure."""
+        return self.render(await self.run_pipeline(self.pipeline_context(payload)))
+
+    @staticmethod
+    def stage_event(stage: str, output: str, started: float, **extra) -> Tuple[str, Dict[str, Any]]:
+        """Build an SSE stage event with the time since the stream started."""
+        return sse.STAGE, {
+            "stage": stage,
+            "output": output,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            **extra
+        }
+
+    async def stream_pipeline(self, context: Dict[str, Any],
+                              started: Optional[float] = None) -> AsyncGenerator[Tuple[str, Dict[str, Any]], None]:
+        """Yield a stage event as each step finishes, then the assembled result."""
+        started = started or time.perf_counter()
+        finished = asyncio.Queue()
+        task = asyncio.ensure_future(self.run_pipeline(context, on_step=finished.put_nowait))
+        task.add_done_callback(lambda _: finished.put_nowait(None))
+        try:
+            while True:
+                step = await finished.get()
+                if step is None:
+                    break
+                name, output, timing = step
+                yield self.stage_event(name, output, started,
+                                       duration_ms=timing["duration_ms"], status=timing["status"])
+            run = task.result()
+        finally:
+            # The client went away mid-pipeline: stop the remaining steps
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+        yield self.stage_event(self.result_stage, self.render(run), started, missing=run.missing)
+
+    def close(self):
+        """Return every sub-agent this context borrowed to the pool."""
+        if self._checkouts is not None:
+            self._checkouts.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __getattr__(self, name: str):
+        # Only reached for attributes that are not set yet: build sub-agents lazily
+        if name in type(self).components:
+            if self.__dict__.get('_checkouts') is None:
+                raise AttributeError(f"{type(self).__name__}.{name} requires bind(api_key) first")
+            instructions, focus = self.component_prompt(name)
+            agent = self._checkouts.enter_context(checkout_agent(
+                self.spec, self.api_key, role=name, instructions=instructions, focus=focus
+            ))
+            setattr(self, name, agent)
+            return agent
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+# Add AnalystAgent class
+class AnalystAgent(TeamMember):
+    agent_name = 'digital_transform_analyst'
+    components = {
+        "process_analyzer": "Focus on process analysis and workflow optimization.",
+        "gap_assessor": "Focus on identifying gaps and maturity assessment.",
+        "opportunity_finder": "Focus on identifying opportunities and innovation potential.",
+        "recommendation_maker": "Focus on making actionable recommendations.",
+        "reflection_agent": "You are a critical thinking expert focused on validation and reflection."
+    }
+    result_stage = 'process_analysis'
+    request_options = ('reflection',)
+    # Reflection policy requested for this run; None falls back to the tenant or server default
+    reflection: Optional[str] = None
+    # Independent branches, each with its own deadline; late or failed ones are left out
+    pipeline = Pipeline('analyst', [
+        Step("processes", "process_analyzer", "Analyze current processes:\n{current_processes}",
+             timeout=ANALYST_BRANCH_TIMEOUT, required=False),
+        Step("gaps", "gap_assessor", "Assess gaps and maturity:\n{current_processes}",
+             timeout=ANALYST_BRANCH_TIMEOUT, required=False),
+        Step("opportunities", "opportunity_finder", "Identify opportunities:\n{current_processes}",
+             timeout=ANALYST_BRANCH_TIMEOUT, required=False)
+    ])
+
+    def component_prompt(self, name: str) -> Tuple[str, Optional[str]]:
+        """Return the system prompt and role focus for one sub-agent."""
+        # The reflection step is a standalone critic, not a team member
+        if name == "reflection_agent":
+            return self.components[name], None
+        return super().component_prompt(name)
+
+    def render(self, run: PipelineRun) -> str:
+        """Combine the branches that finished and flag the rest for reflection; raises if none did."""
+        completed = run.completed()
+        if not completed:
+            reasons = ', '.join(f'{name}: {reason}' for name, reason in run.missing.items())
+            # Nothing to reflect on or recommend from: fail rather than pay for both on an error
+            raise RuntimeError(f"No analysis branch finished ({reasons})")
         
-        self.recommendation_maker = Agent(
-            instructions=f"{self.instructions}\nFocus on making actionable recommendations."
-        )
+        results = [completed[name] for name in self.pipeline.order if name in completed]
+        if run.missing:
+            results.append("Missing analyses: " + ", ".join(
+                f"{name} ({reason})" for name, reason in run.missing.items()
+            ))
+        return "\n\n".join(results)
 
     async def analyze_business(self, business_info: Dict) -> str:
         """Analyze business processes with enhanced capabilities."""
         try:
-            # Perform parallel analysis
-            initial_analysis = await self.analyze_processes(business_info)
-            
-            # Self-reflection
-            reflection = self.self_reflect(initial_analysis, business_info)
-            
-            # Generate final recommendations
-            final_analysis = self.recommendation_maker.start(f"""
-            Create final recommendations based on:
-            
-            Initial Analysis:
-            {initial_analysis}
-            
-            Self-Reflection:
-            {reflection}
-            
-            Business Context:
-            {business_info}
-            """)
-            
-            # Store in memory
-            self.store_in_memory(business_info, final_analysis)
-            
-            return final_analysis
+            return await self.execute(business_info)
             
+        except HTTPException as he:
+            raise he
         except Exception as e:
             return f"Error performing analysis: {str(e)}"
 
+    async def execute(self, payload: Dict) -> str:
+        """Run every analysis stage and return the final recommendations; raises on failure."""
+        final_analysis = None
+        async for _, event in self.stream_analyze_business(payload):
+            final_analysis = event["output"]
+        return final_analysis
+
+    async def stream_analyze_business(self, business_info: Dict) -> AsyncGenerator[Tuple[str, Dict[str, Any]], None]:
+        """Analyze business processes, yielding each stage as it completes."""
+        started = time.perf_counter()
+        
+        # Same business, same inputs: replay the stored analysis instead of recomputing it
+        previous = await self.recall_analysis(business_info)
+        if previous is not None:
+            for stage, output in previous["stages"].items():
+                yield self.stage_event(stage, output, started, reused=True)
+            return
+        
+        # Perform parallel analysis
+        async for event in self.stream_pipeline({"current_processes": business_info['current_processes']}, started):
+            yield event
+        initial_analysis = self.render(self.last_run)
+        
+        # Self-reflection, as deep as the policy allows
+        reflection, details = await self.reflect(initial_analysis, business_info)
+        yield self.stage_event("reflection", reflection, started, **details)
+        stages = {self.result_stage: initial_analysis, "reflection": reflection}
+        
+        # Generate final recommendations, compressing upstream text to the prompt budget
+        fitted = await self.fit_inputs(
+            self.recommendation_maker,
+            {"initial_analysis": initial_analysis, "reflection": reflection},
+            fixed=str(business_info),
+            stage="analyst.final_recommendations"
+        )
+        initial_analysis, reflection = fitted["initial_analysis"], fitted["reflection"]
+        final_analysis = await self.recommendation_maker.astart(f"""
+        Create final recommendations based on:
+        
+        Initial Analysis:
+        {initial_analysis}
+        
+        Self-Reflection:
+        {reflection}
+        
+        Business Context:
+        {business_info}
+        """)
+        
+        stages["final_recommendations"] = final_analysis
+        # Only a complete analysis is worth replaying; one missing a branch is recomputed next time
+        if not self.last_run.missing:
+            self.store_in_memory(business_info, final_analysis, stages, details["policy"])
+        yield self.stage_event("final_recommendations", final_analysis, started)
+
     async def analyze_processes(self, business_info: Dict) -> str:
         """Analyze business processes in parallel."""
         try:
-            tasks = [
-                self.process_analyzer.start(f"Analyze current processes:\n{business_info['current_processes']}"),
-                self.gap_assessor.start(f"Assess gaps and maturity:\n{business_info['current_processes']}"),
-                self.opportunity_finder.start(f"Identify opportunities:\n{business_info['current_processes']}")
-            ]
-            results = await asyncio.gather(*tasks)
-            return "\n\n".join(results)
+            run = await self.run_pipeline({"current_processes": business_info['current_processes']})
+            return self.render(run)
+        except HTTPException as he:
+            raise he
         except Exception as e:
             print(f"Error in analyze_processes: {str(e)}")
             return f"Error analyzing processes: {str(e)}"
 
-    def self_reflect(self, analysis: str, business_info: Dict) -> str:
-        """Perform self-reflection on the analysis."""
+    async def reflect(self, analysis: str, business_info: Dict) -> Tuple[str, Dict[str, Any]]:
+        """Reflect on the analysis according to the reflection policy and report what it cost or saved."""
+        policy = resolve_policy(self.reflection, self.api_key, tenant_reflection_policies, REFLECTION_POLICY)
+        # Read from the spec so a skipped reflection never checks a reflection agent out of the pool
+        full_model = self.config.get('model') or DEFAULT_CHAT_MODEL
+        mode, reasons = (FULL if policy == ADAPTIVE else policy), []
+        if policy == ADAPTIVE:
+            reasons = confidence_flags(
+                analysis, self.last_run.missing if self.last_run else {}, REFLECTION_MIN_TOKENS,
+                REFLECTION_MAX_HEDGES, count_tokens(analysis, full_model)
+            )
+            if not reasons:
+                mode = OFF
+        
+        estimate = reflection_stats.estimate_full()
+        model = REFLECTION_CHEAP_MODEL if mode == CHEAP else full_model
+        # Tokens a full reflection would send, before any budget trimming
+        prompt_tokens = sum(count_tokens(text, model) for text in (
+            self.component_prompt("reflection_agent")[0], analysis, str(business_info)
+        ))
+        reflection_started = time.perf_counter()
+        if mode == OFF:
+            reflection = f"Self-reflection skipped (policy: {policy})."
+            output_tokens = 0
+        else:
+            reflection = await self.self_reflect(analysis, business_info, model=model if mode == CHEAP else None)
+            output_tokens = count_tokens(reflection, model)
+        latency_ms = round((time.perf_counter() - reflection_started) * 1000, 1)
+        
+        # Measured against the full model: a skipped call saves its whole prompt and typical
+        # output; a cheap one still spends its tokens, just on the smaller model
+        tokens_saved, tokens_shifted, latency_saved_ms = 0, 0, None
+        if mode == OFF:
+            tokens_saved = prompt_tokens + (estimate["output_tokens"] or 0)
+            latency_saved_ms = estimate["latency_ms"]
+        elif mode == CHEAP:
+            tokens_shifted = prompt_tokens + output_tokens
+            if estimate["latency_ms"] is not None:
+                latency_saved_ms = round(estimate["latency_ms"] - latency_ms, 1)
+        reflection_stats.record(policy, mode, latency_ms, output_tokens, tokens_saved, tokens_shifted,
+                                latency_saved_ms)
+        
+        return reflection, {
+            "policy": policy,
+            "reflected": mode != OFF,
+            "model": model if mode != OFF else None,
+            "reasons": reasons,
+            "latency_ms": latency_ms,
+            "tokens_saved": tokens_saved,
+            "tokens_shifted": tokens_shifted,
+            "latency_saved_ms": latency_saved_ms
+        }
+
+    async def self_reflect(self, analysis: str, business_info: Dict, model: Optional[str] = None) -> str:
+        """Perform self-reflection on the analysis, optionally on a different model."""
         try:
+            analysis = (await self.fit_inputs(
+                self.reflection_agent, {"analysis": analysis}, fixed=str(business_info), stage="analyst.reflection"
+            ))["analysis"]
             reflection_prompt = f"""
             Review and reflect on the following analysis:
             
@@ -290,84 +727,70 @@ class AnalystAgent:
             Provide reflection notes and any necessary adjustments.
             """
             
-            reflection_agent = Agent(
-                instructions="You are a critical thinking expert focused on validation and reflection."
-            )
-            
-            return reflection_agent.start(reflection_prompt)
+            return await self.reflection_agent.astart(reflection_prompt, model=model)
             
+        except HTTPException as he:
+            raise he
         except Exception as e:
             print(f"Error in self_reflect: {str(e)}")
             return f"Error during reflection: {str(e)}"
 
-    def store_in_memory(self, business_info: Dict, analysis: str):
+    @staticmethod
+    def memory_key(business_info: Dict) -> str:
+        """Key of a business in memory; recall() and remember() scope it to the API key."""
+        return f"{business_info.get('name')}_{business_info.get('industry')}"
+
+    async def recall_analysis(self, business_info: Dict) -> Optional[Dict[str, Any]]:
+        """Return a stored analysis of exactly this business info under the same reflection policy."""
+        if cache_bypass.get():
+            return None
+        try:
+            entry = await self.recall(self.memory_key(business_info))
+            policy = resolve_policy(self.reflection, self.api_key, tenant_reflection_policies, REFLECTION_POLICY)
+        except Exception as e:
+            print(f"Error reading memory: {str(e)}")
+            return None
+        if (entry is None or not entry.get('stages') or entry.get('context') != business_info
+                or entry.get('reflection_policy') != policy):
+            return None
+        return entry
+
+    def store_in_memory(self, business_info: Dict, analysis: str, stages: Optional[Dict[str, str]] = None,
+                        reflection_policy: Optional[str] = None):
         """Store analysis results in memory for future reference."""
         try:
-            key = f"{business_info['name']}_{business_info['industry']}"
-            self.memory[key] = {
+            # Also make the analysis findable for similar businesses, not just this exact one
+            retrieval_index.add(
+                self.memory_scope(f"analyst:{self.memory_key(business_info)}"),
+                " ".join(str(value) for value in business_info.values()),
+                self.retrieval_scope(step="analysis", name=business_info.get('name'),
+                                     industry=business_info.get('industry'), output=analysis)
+            )
+            self.remember(self.memory_key(business_info), {
                 'analysis': analysis,
-                'timestamp': asyncio.get_event_loop().time(),
+                'stages': stages or {},
+                'reflection_policy': reflection_policy,
+                'timestamp': time.time(),
                 'context': business_info
-            }
+            })
         except Exception as e:
             print(f"Error storing in memory: {str(e)}")
 
-# Now create the global instance
-analyst_agent = AnalystAgent()
+# Append every cascade decision to a JSON-lines file when configured
+route_stats.log_path = ROUTE_LOG_FILE or None
 
-class StreamingAgent(Agent):
-    """Enhanced Agent with streaming capabilities"""
-    def __init__(self, *args, api_key=None, **kwargs):
-        # Pass API key to the parent Agent class
-        if api_key:
-            kwargs['api_key'] = api_key
-        super().__init__(*args, **kwargs)
-        self.response_queue = response_queue
+# Tenant reflection defaults, keyed by hashed API key
+tenant_reflection_policies = parse_tenant_policies(REFLECTION_TENANT_POLICIES)
 
-    async def stream_start(self, prompt: str) -> AsyncGenerator[str, None]:
-        """Stream responses as they are generated"""
-        try:
-            # Start response generation in a separate thread
-            future = thread_pool.submit(self.start, prompt)
-            
-            # Stream partial responses
-            while not future.done():
-                if not self.response_queue.empty():
-                    yield self.response_queue.get()
-                await asyncio.sleep(0.1)
-            
-            # Get final response
-            final_response = future.result()
-            if final_response:
-                yield final_response
-                
-        except Exception as e:
-            yield f"Error: {str(e)}"
+# Now create the global instance
+with startup_profiler.phase("analyst_agent", "construct"):
+    analyst_agent = AnalystAgent()
 
 @app.get("/agents", response_model=List[str])
 async def list_agents():
     """List all available agents."""
     try:
-        base_path = Path(__file__).parent.parent
-        # List of directories to exclude
-        exclude_dirs = {'frontend', 'backend', 'PraisonAI', '.git', '.pytest_cache', '__pycache__', 'DigitalTransform'}
-        
-        # Standard agents
-        agent_dirs = [d.name for d in base_path.iterdir() 
-                     if d.is_dir() 
-                     and not d.name.startswith('.') 
-                     and d.name not in exclude_dirs
-                     and (d / "agent_config.json").exists()]
-        
-        # Add Digital Transform agents
-        dt_config_path = base_path / 'DigitalTransform/agent_config.json'
-        if dt_config_path.exists():
-            with open(dt_config_path) as f:
-                dt_config = json.load(f)
-                agent_dirs.extend([f"digital_transform_{agent.lower()}" 
-                                 for agent in dt_config['agents'].keys()])
-        
-        return sorted(agent_dirs)
+        return agent_registry.agent_names()
     except Exception as e:
         print(f"Error listing agents: {str(e)}")  # Debug log
         raise HTTPException(status_code=500, detail=f"Error listing agents: {str(e)}")
@@ -380,55 +803,12 @@ async def get_agent_info(agent_name: str):
         if agent_name == "DigitalTransform":
             raise HTTPException(status_code=404, detail="DigitalTransform is not a direct agent")
             
-        config, _ = load_agent_config(agent_name)
-        
-        # Example prompts for Digital Transform agents
-        dt_example_prompts = {
-            "digital_transform_analyst": [
-                "Analyze our current customer service processes for automation opportunities",
-                "Assess our digital maturity and identify key gaps",
-                "Evaluate our e-commerce workflow and recommend improvements"
-            ],
-            "digital_transform_architect": [
-                "Design a cloud migration strategy for our legacy systems",
-                "Create a technical roadmap for implementing AI-powered analytics",
-                "Plan a microservices architecture for our monolithic application"
-            ],
-            "digital_transform_designer": [
-                "Design a user-friendly interface for our new workflow automation system",
-                "Create a mobile-first design for our customer portal",
-                "Develop an accessible UI for our employee dashboard"
-            ],
-            "digital_transform_automator": [
-                "Automate our invoice processing workflow",
-                "Create API integrations between our CRM and ERP systems",
-                "Implement automated testing for our deployment pipeline"
-            ],
-            "digital_transform_trainer": [
-                "Create a training program for our new digital workflow",
-                "Develop documentation for our automated systems",
-                "Design learning paths for different user roles"
-            ],
-            "digital_transform_measurer": [
-                "Set up KPIs for our digital transformation initiative",
-                "Track ROI metrics for our automation project",
-                "Measure user adoption and satisfaction rates"
-            ],
-            "digital_transform_datadetective": [
-                "Create a trend analysis chart from our sales data",
-                "Analyze this performance metrics visualization",
-                "Generate a correlation matrix for our customer data",
-                "Create an interactive dashboard for our KPIs",
-                "Analyze this uploaded chart and identify key patterns"
-            ]
-        }
-        
-        # Combine with existing example prompts
-        example_prompts = dt_example_prompts.get(agent_name, [])
+        spec = get_agent_spec(agent_name)
         
         return {
-            "config": config,
-            "example_prompts": example_prompts
+            "config": thaw(spec.config),
+            "example_prompts": list(spec.example_prompts),
+            "prompt_tokens": spec.prompt_tokens
         }
     except HTTPException as he:
         raise he
@@ -436,6 +816,48 @@ async def get_agent_info(agent_name: str):
         print(f"Error getting agent info for {agent_name}: {str(e)}")  # Debug log
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics", response_model=Dict[str, Any])
+async def get_metrics():
+    """Report in-process cache and runtime counters."""
+    return {
+        "registry": agent_registry.stats(),
+        "watcher": agent_watcher.stats(),
+        "agent_pool": agent_pool.stats(),
+        "chat_streams": stream_stats.stats(),
+        "completions": completion_stats.stats(),
+        "prompt_cache": prompt_cache_stats.stats(),
+        "response_cache": response_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "prompt_budget": budget_stats.stats(),
+        "reflection": reflection_stats.stats(),
+        "routing": route_stats.stats(),
+        "memory": memory_store.stats(),
+        "chat_sessions": {**chat_sessions.stats(), "store": chat_store.stats()},
+        "retrieval": {**retrieval_index.stats(), "steps": grounding_stats.stats()},
+        "conversation_log": conversation_log.stats(),
+        "mongodb": mongo.stats(),
+        "pipelines": pipeline_stats.stats(),
+        "team_runs": team_checkpoints.stats(),
+        "executor": blocking_executor.stats(),
+        "llm_admission": llm_gate.stats()
+    }
+
+@app.get("/debug/startup", response_model=Dict[str, Any])
+async def get_startup_profile():
+    """Break time-to-ready down by import and global construction."""
+    return startup_profiler.report()
+
+@app.get("/health", response_model=Dict[str, Any])
+async def health():
+    """Liveness plus a live MongoDB probe; MongoDB being down degrades persistence, not the API."""
+    probe = await mongo.ping()
+    return {"status": "ok" if probe["status"] == "ok" else "degraded", "mongodb": probe}
+
+@app.get("/debug/routes", response_model=List[Dict[str, Any]])
+async def get_route_decisions():
+    """List the latest model cascade decisions, oldest first."""
+    return route_stats.recent()
+
 # Helper function to get API key from header or environment
 async def get_api_key(x_openai_api_key: str = Header(None)):
     """
@@ -453,32 +875,63 @@ async def get_api_key(x_openai_api_key: str = Header(None)):
         )
 
 @app.post("/chat", response_model=Message)
-async def chat_with_agent(request: ChatRequest, api_key: str = Depends(get_api_key)):
+async def chat_with_agent(request: ChatRequest, http_request: Request, api_key: str = Depends(get_api_key)):
     """Chat with a specific agent using streaming responses."""
     try:
-        config, prompt = load_agent_config(request.agent_name)
-        # Pass API key to Agent
-        agent = StreamingAgent(instructions=prompt, api_key=api_key)
+        # Pin the prompt version for the lifetime of this stream
+        spec = get_agent_spec(request.agent_name)
+        
+        session_id = (request.context or {}).get("session_id")
+        # Session ids come from the client: never let one API key load another's history
+        tenant = hash_api_key(api_key)
         
-        return StreamingResponse(
-            agent.stream_start(request.message),
-            media_type='text/event-stream'
+        async def events():
+            # Sessions keep their history server-side: a rolling summary plus a bounded window of turns
+            session = await chat_sessions.load(spec.name, tenant, session_id) if session_id else None
+            history = chat_sessions.window(session) if session is not None else None
+            tokens = []
+            # Hold the pooled agent until the stream finishes
+            with checkout_agent(spec, api_key) as agent:
+                async for token in agent.stream_start(request.message, history):
+                    tokens.append(token)
+                    yield sse.TOKEN, {"text": token}
+            if session is not None:
+                chat_sessions.append(spec.name, tenant, session_id, session, request.message, "".join(tokens),
+                                     lambda summary, turns: summarize_chat(summary, turns, api_key))
+        
+        return sse.sse_response(
+            http_request,
+            log_events(events(), spec.name, request.message, session_id),
+            heartbeat_interval=SSE_HEARTBEAT_INTERVAL,
+            headers={"X-Agent-Version": spec.content_hash[:12]}
         )
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Digital Transform Team Endpoints
 @app.post("/digital_transform/analyze", response_model=Message)
-async def analyze_business(request: AnalysisRequest, api_key: str = Depends(get_api_key)):
+async def analyze_business(request: AnalysisRequest, http_request: Request, api_key: str = Depends(get_api_key)):
     """Analyze business processes with streaming responses."""
     try:
-        # Update analyst_agent with the API key
-        analyst_agent.update_api_key(api_key)
         business_info = request.business_info.dict()
-        return StreamingResponse(
-            analyst_agent.stream_analyze_business(business_info),
-            media_type='text/event-stream'
+        # Reject unknown policies before the stream starts
+        resolve_policy(request.reflection, api_key, tenant_reflection_policies, REFLECTION_POLICY)
+        
+        async def events():
+            # Bind the analyst to this request's API key for the whole stream
+            with analyst_agent.bind(api_key, reflection=request.reflection) as analyst:
+                async for event in analyst.stream_analyze_business(business_info):
+                    yield event
+        
+        return sse.sse_response(
+            http_request,
+            log_events(events(), analyst_agent.agent_name, business_info),
+            heartbeat_interval=SSE_HEARTBEAT_INTERVAL
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -486,8 +939,7 @@ async def analyze_business(request: AnalysisRequest, api_key: str = Depends(get_
 async def create_design(request: DesignRequest, api_key: str = Depends(get_api_key)):
     """Create design specifications using the Designer agent."""
     try:
-        config, prompt = load_agent_config('digital_transform_designer')
-        agent = Agent(instructions=prompt, api_key=api_key)
+        spec = get_agent_spec('digital_transform_designer')
         
         design_prompt = f"""
         Create design based on:
@@ -496,8 +948,12 @@ async def create_design(request: DesignRequest, api_key: str = Depends(get_api_k
         Requirements: {json.dumps(request.design_requirements, indent=2)}
         """
         
-        response = agent.start(design_prompt)
+        with checkout_agent(spec, api_key) as agent:
+            response = await agent.astart(design_prompt)
+        log_turn(spec.name, design_prompt, response)
         return Message(role="assistant", content=response)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -505,8 +961,7 @@ async def create_design(request: DesignRequest, api_key: str = Depends(get_api_k
 async def create_automation(request: AutomationRequest, api_key: str = Depends(get_api_key)):
     """Create automation solutions using the Automator agent."""
     try:
-        config, prompt = load_agent_config('digital_transform_automator')
-        agent = Agent(instructions=prompt, api_key=api_key)
+        spec = get_agent_spec('digital_transform_automator')
         
         automation_prompt = f"""
         Create automation solution based on:
@@ -515,8 +970,12 @@ async def create_automation(request: AutomationRequest, api_key: str = Depends(g
         Requirements: {json.dumps(request.automation_requirements, indent=2)}
         """
         
-        response = agent.start(automation_prompt)
+        with checkout_agent(spec, api_key) as agent:
+            response = await agent.astart(automation_prompt)
+        log_turn(spec.name, automation_prompt, response)
         return Message(role="assistant", content=response)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -524,8 +983,7 @@ async def create_automation(request: AutomationRequest, api_key: str = Depends(g
 async def create_training(request: TrainingRequest, api_key: str = Depends(get_api_key)):
     """Create training materials using the Trainer agent."""
     try:
-        config, prompt = load_agent_config('digital_transform_trainer')
-        agent = Agent(instructions=prompt, api_key=api_key)
+        spec = get_agent_spec('digital_transform_trainer')
         
         training_prompt = f"""
         Create training program based on:
@@ -534,8 +992,12 @@ async def create_training(request: TrainingRequest, api_key: str = Depends(get_a
         Requirements: {json.dumps(request.training_requirements, indent=2)}
         """
         
-        response = agent.start(training_prompt)
+        with checkout_agent(spec, api_key) as agent:
+            response = await agent.astart(training_prompt)
+        log_turn(spec.name, training_prompt, response)
         return Message(role="assistant", content=response)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -543,8 +1005,7 @@ async def create_training(request: TrainingRequest, api_key: str = Depends(get_a
 async def analyze_performance(request: MeasurementRequest, api_key: str = Depends(get_api_key)):
     """Analyze performance metrics using the Measurer agent."""
     try:
-        config, prompt = load_agent_config('digital_transform_measurer')
-        agent = Agent(instructions=prompt, api_key=api_key)
+        spec = get_agent_spec('digital_transform_measurer')
         
         measurement_prompt = f"""
         Analyze performance based on:
@@ -553,8 +1014,12 @@ async def analyze_performance(request: MeasurementRequest, api_key: str = Depend
         Requirements: {json.dumps(request.measurement_requirements, indent=2)}
         """
         
-        response = agent.start(measurement_prompt)
+        with checkout_agent(spec, api_key) as agent:
+            response = await agent.astart(measurement_prompt)
+        log_turn(spec.name, measurement_prompt, response)
         return Message(role="assistant", content=response)
+    except HTTPException as he:
+        raise he
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -578,45 +1043,13 @@ class DataAnalysisRequest(BaseModel):
     parameters: Optional[Dict[str, Any]] = None
 
 # DataDetective Agent Class
-class DataDetectiveAgent:
-    def __init__(self):
-        self.config = load_agent_config('digital_transform_datadetective')[0]
-        self.instructions = load_agent_config('digital_transform_datadetective')[1]
-        self.api_key = None
-        self.initialize_components()
-
-    def update_api_key(self, api_key):
-        """Update the API key for all components."""
-        self.api_key = api_key
-        # Update API key for all components
-        self.data_analyzer = Agent(
-            instructions=f"{self.instructions}\nFocus on data analysis and pattern detection.",
-            api_key=api_key
-        )
-        
-        self.chart_creator = Agent(
-            instructions=f"{self.instructions}\nFocus on data visualization and chart creation.",
-            api_key=api_key
-        )
-        
-        self.vision_analyzer = Agent(
-            instructions=f"{self.instructions}\nFocus on visual analysis and chart interpretation.",
-            api_key=api_key
-        )
-
-    def initialize_components(self):
-        """Initialize specialized components for different analysis tasks."""
-        self.data_analyzer = Agent(
-            instructions=f"{self.instructions}\nFocus on data analysis and pattern detection."
-        )
-        
-        self.chart_creator = Agent(
-            instructions=f"{self.instructions}\nFocus on data visualization and chart creation."
-        )
-        
-        self.vision_analyzer = Agent(
-            instructions=f"{self.instructions}\nFocus on visual analysis and chart interpretation."
-        )
+class DataDetectiveAgent(TeamMember):
+    agent_name = 'digital_transform_datadetective'
+    components = {
+        "data_analyzer": "Focus on data analysis and pattern detection.",
+        "chart_creator": "Focus on data visualization and chart creation.",
+        "vision_analyzer": "Focus on visual analysis and chart interpretation."
+    }
 
     async def create_chart(self, request: ChartRequest) -> Dict[str, Any]:
         """Create a chart based on provided data and parameters."""
@@ -652,7 +1085,7 @@ class DataDetectiveAgent:
         try:
             # Download image if URL provided
             if request.image_url.startswith('http'):
-                response = requests.get(request.image_url)
+                response = await get_http_client().get(request.image_url, timeout=DEFAULT_TIMEOUT, follow_redirects=True)
                 img = Image.open(BytesIO(response.content))
                 image_data = response.content
             else:
@@ -698,7 +1131,7 @@ class DataDetectiveAgent:
             if is_vercel:
                 # In Vercel, fallback to mock response for demo purposes
                 print("Running in Vercel environment, returning mock analysis")
-                time.sleep(2)  # Simulate processing time
+                await asyncio.sleep(2)  # Simulate processing time
                 return f"""
                 # Chart Analysis
 
@@ -730,7 +1163,7 @@ class DataDetectiveAgent:
                 image_base64 = base64.b64encode(image_data).decode('utf-8')
                 
                 # Call Ollama llava model API with optimized parameters
-                ollama_response = requests.post(
+                ollama_response = await get_http_client().post(
                     OLLAMA_GENERATE_ENDPOINT,
                     json={
                         "model": "llava",
@@ -766,13 +1199,13 @@ class DataDetectiveAgent:
                 
                 return response_data['response']
                 
-            except requests.exceptions.ConnectionError:
+            except httpx.ConnectError:
                 print("Failed to connect to Ollama service")
                 raise HTTPException(
                     status_code=503,
                     detail="Vision model service is not available. Please ensure Ollama is running."
                 )
-            except requests.exceptions.Timeout:
+            except httpx.TimeoutException:
                 print("Ollama request timed out")
                 raise HTTPException(
                     status_code=504,
@@ -819,7 +1252,7 @@ class DataDetectiveAgent:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error analyzing data: {str(e)}")
 
-    def _detect_trends(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _detect_trends(self, df: "pandas.DataFrame") -> Dict[str, Any]:
         """Detect trends in the data."""
         trends = {}
         for column in df.select_dtypes(include=[np.number]).columns:
@@ -831,7 +1264,7 @@ class DataDetectiveAgent:
             }
         return trends
 
-    def _detect_outliers(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _detect_outliers(self, df: "pandas.DataFrame") -> Dict[str, Any]:
         """Detect outliers using IQR method."""
         outliers = {}
         for column in df.select_dtypes(include=[np.number]).columns:
@@ -845,7 +1278,7 @@ class DataDetectiveAgent:
             }
         return outliers
 
-    def _analyze_seasonality(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _analyze_seasonality(self, df: "pandas.DataFrame") -> Dict[str, Any]:
         """Analyze seasonality in time series data."""
         seasonality = {}
         for column in df.select_dtypes(include=[np.number]).columns:
@@ -857,7 +1290,7 @@ class DataDetectiveAgent:
                 }
         return seasonality
 
-    def _generate_forecast(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _generate_forecast(self, df: "pandas.DataFrame") -> Dict[str, Any]:
         """Generate simple forecasts using moving averages."""
         forecast = {}
         for column in df.select_dtypes(include=[np.number]).columns:
@@ -871,7 +1304,7 @@ class DataDetectiveAgent:
             }
         return forecast
 
-    def _calculate_confidence(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def _calculate_confidence(self, df: "pandas.DataFrame") -> Dict[str, Any]:
         """Calculate confidence intervals for predictions."""
         confidence = {}
         for column in df.select_dtypes(include=[np.number]).columns:
@@ -885,27 +1318,50 @@ class DataDetectiveAgent:
         return confidence
 
 # Create global instance
-data_detective = DataDetectiveAgent()
+with startup_profiler.phase("data_detective", "construct"):
+    data_detective = DataDetectiveAgent()
+
+@app.get("/digital_transform/similar", response_model=List[Dict[str, Any]])
+async def find_similar(q: str, agent: Optional[str] = None, industry: Optional[str] = None, k: int = 5,
+                       api_key: str = Depends(get_api_key)):
+    """Search earlier analyses and pipeline outputs made with this API key."""
+    where = {"tenant": hash_api_key(api_key)}
+    if agent:
+        where["agent"] = agent
+    if industry:
+        where["industry"] = industry
+    return [
+        {
+            "id": hit["id"],
+            "score": hit["score"],
+            "similarity": hit["similarity"],
+            "agent": hit["metadata"].get("agent"),
+            "step": hit["metadata"].get("step"),
+            "industry": hit["metadata"].get("industry"),
+            "output": hit["metadata"].get("output")
+        }
+        for hit in retrieval_index.search(q, k=min(max(k, 1), 20), where=where)
+    ]
 
 # DataDetective endpoints
 @app.post("/digital_transform/datadetective/create_chart", response_model=Dict[str, Any])
 async def create_chart(request: ChartRequest, api_key: str = Depends(get_api_key)):
     """Create a chart using the DataDetective agent."""
-    data_detective.update_api_key(api_key)
-    return await data_detective.create_chart(request)
+    with data_detective.bind(api_key) as detective:
+        return await detective.create_chart(request)
 
 @app.post("/digital_transform/datadetective/analyze_image", response_model=Message)
 async def analyze_image(request: ImageAnalysisRequest, api_key: str = Depends(get_api_key)):
     """Analyze a chart or visualization using vision capabilities."""
-    data_detective.update_api_key(api_key)
-    analysis = await data_detective.analyze_image(request)
+    with data_detective.bind(api_key) as detective:
+        analysis = await detective.analyze_image(request)
     return Message(role="assistant", content=analysis)
 
 @app.post("/digital_transform/datadetective/analyze_data", response_model=Dict[str, Any])
 async def analyze_data(request: DataAnalysisRequest, api_key: str = Depends(get_api_key)):
     """Analyze data using the DataDetective agent."""
-    data_detective.update_api_key(api_key)
-    return await data_detective.analyze_data(request)
+    with data_detective.bind(api_key) as detective:
+        return await detective.analyze_data(request)
 
 @app.post("/digital_transform/datadetective/upload_chart", response_model=Message)
 async def upload_chart(
@@ -916,9 +1372,6 @@ async def upload_chart(
 ):
     """Upload and analyze a chart image."""
     try:
-        # Update the agent with the provided API key
-        data_detective.update_api_key(api_key)
-        
         # Validate file type
         if not file.content_type.startswith('image/'):
             raise HTTPException(
@@ -944,11 +1397,12 @@ async def upload_chart(
             
             # Analyze using Ollama llava model
             try:
-                analysis = await data_detective.analyze_image(ImageAnalysisRequest(
-                    image_url=temp_path,
-                    analysis_type=analysis_type,
-                    context=json.loads(context)
-                ))
+                with data_detective.bind(api_key) as detective:
+                    analysis = await detective.analyze_image(ImageAnalysisRequest(
+                        image_url=temp_path,
+                        analysis_type=analysis_type,
+                        context=json.loads(context)
+                    ))
                 
                 return Message(role="assistant", content=analysis)
                 
@@ -982,420 +1436,261 @@ async def upload_chart(
         )
 
 # Architect Agent Class
-class ArchitectAgent:
-    def __init__(self):
-        self.config = load_agent_config('digital_transform_architect')[0]
-        self.instructions = load_agent_config('digital_transform_architect')[1]
-        self.memory = {}
-        self.api_key = None
-        self.initialize_components()
-
-    def update_api_key(self, api_key):
-        """Update the API key for all components."""
-        self.api_key = api_key
-        # Update API key for all components
-        self.solution_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on technical solution design.",
-            api_key=api_key
-        )
-        
-        self.security_assessor = Agent(
-            instructions=f"{self.instructions}\nFocus on security and compliance.",
-            api_key=api_key
-        )
-        
-        self.integration_planner = Agent(
-            instructions=f"{self.instructions}\nFocus on system integration and APIs.",
-            api_key=api_key
-        )
-        
-        self.performance_optimizer = Agent(
-            instructions=f"{self.instructions}\nFocus on scalability and optimization.",
-            api_key=api_key
-        )
-
-    def initialize_components(self):
-        """Initialize specialized components for different architecture tasks."""
-        self.solution_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on technical solution design."
-        )
-        
-        self.security_assessor = Agent(
-            instructions=f"{self.instructions}\nFocus on security and compliance."
-        )
-        
-        self.integration_planner = Agent(
-            instructions=f"{self.instructions}\nFocus on system integration and APIs."
-        )
-        
-        self.performance_optimizer = Agent(
-            instructions=f"{self.instructions}\nFocus on scalability and optimization."
-        )
-
-    async def design_solution(self, requirements: Dict) -> str:
-        """Design technical solution based on requirements."""
-        try:
-            # Create solution design
-            solution = self.solution_designer.start(f"""
+class ArchitectAgent(TeamMember):
+    agent_name = 'digital_transform_architect'
+    components = {
+        "solution_designer": "Focus on technical solution design.",
+        "security_assessor": "Focus on security and compliance.",
+        "integration_planner": "Focus on system integration and APIs.",
+        "performance_optimizer": "Focus on scalability and optimization."
+    }
+    # Security review runs alongside integration and performance planning
+    pipeline = Pipeline('architect', [
+        Step("solution", "solution_designer", """
             Design technical solution based on:
-            Requirements: {json.dumps(requirements, indent=2)}
-            """)
-            
-            # Assess security
-            security = self.security_assessor.start(f"""
+            Requirements: {requirements}
+            """),
+        Step("security", "security_assessor", """
             Assess security implications of:
             Solution: {solution}
-            """)
-            
-            # Plan integrations
-            integrations = self.integration_planner.start(f"""
+            """, inputs=("solution",)),
+        Step("integrations", "integration_planner", """
             Plan system integrations for:
             Solution: {solution}
-            Security: {security}
-            """)
-            
-            # Optimize performance
-            performance = self.performance_optimizer.start(f"""
+            """, inputs=("solution",)),
+        Step("performance", "performance_optimizer", """
             Optimize performance for:
             Solution: {solution}
             Integrations: {integrations}
-            """)
-            
-            return f"""
-            Technical Solution Design:
-            {solution}
-            
-            Security Assessment:
-            {security}
-            
-            Integration Plan:
-            {integrations}
-            
-            Performance Optimization:
-            {performance}
-            """
+            """, inputs=("solution", "integrations"))
+    ])
+
+    def render(self, run: PipelineRun) -> str:
+        """Assemble the pipeline outputs into one document."""
+        return f"""
+        Technical Solution Design:
+        {run.outputs['solution']}
+        
+        Security Assessment:
+        {run.outputs['security']}
+        
+        Integration Plan:
+        {run.outputs['integrations']}
+        
+        Performance Optimization:
+        {run.outputs['performance']}
+        """
+
+    async def design_solution(self, requirements: Dict) -> str:
+        """Design technical solution based on requirements."""
+        try:
+            return await self.execute(requirements)
             
+        except HTTPException as he:
+            raise he
         except Exception as e:
             return f"Error designing solution: {str(e)}"
 
 # Designer Agent Class
-class DesignerAgent:
-    def __init__(self):
-        self.config = load_agent_config('digital_transform_designer')[0]
-        self.instructions = load_agent_config('digital_transform_designer')[1]
-        self.memory = {}
-        self.api_key = None
-        self.initialize_components()
-
-    def update_api_key(self, api_key):
-        """Update the API key for all components."""
-        self.api_key = api_key
-        # Update API key for all components
-        self.ui_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on interface design.",
-            api_key=api_key
-        )
-        
-        self.flow_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on user flow mapping.",
-            api_key=api_key
-        )
-        
-        self.accessibility_tester = Agent(
-            instructions=f"{self.instructions}\nFocus on accessibility compliance.",
-            api_key=api_key
-        )
-
-    def initialize_components(self):
-        """Initialize specialized components for different design tasks."""
-        self.ui_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on interface design."
-        )
+class DesignerAgent(TeamMember):
+    agent_name = 'digital_transform_designer'
+    components = {
+        "ui_designer": "Focus on interface design.",
+        "flow_designer": "Focus on user flow mapping.",
+        "accessibility_tester": "Focus on accessibility compliance."
+    }
+    # Flows and accessibility both only need the interface
+    pipeline = Pipeline('designer', [
+        Step("interface", "ui_designer", """
+            Design interface based on:
+            Requirements: {requirements}
+            """),
+        Step("flows", "flow_designer", """
+            Create user flows for:
+            Interface: {interface}
+            """, inputs=("interface",)),
+        Step("accessibility", "accessibility_tester", """
+            Test accessibility for:
+            Interface: {interface}
+            """, inputs=("interface",))
+    ])
+
+    def render(self, run: PipelineRun) -> str:
+        """Assemble the pipeline outputs into one document."""
+        return f"""
+        Interface Design:
+        {run.outputs['interface']}
         
-        self.flow_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on user flow mapping."
-        )
+        User Flows:
+        {run.outputs['flows']}
         
-        self.accessibility_tester = Agent(
-            instructions=f"{self.instructions}\nFocus on accessibility compliance."
-        )
+        Accessibility Report:
+        {run.outputs['accessibility']}
+        """
 
     async def create_design(self, requirements: Dict) -> str:
         """Create UI/UX design based on requirements."""
         try:
-            # Design interface
-            interface = self.ui_designer.start(f"""
-            Design interface based on:
-            Requirements: {json.dumps(requirements, indent=2)}
-            """)
-            
-            # Create user flows
-            flows = self.flow_designer.start(f"""
-            Create user flows for:
-            Interface: {interface}
-            """)
-            
-            # Test accessibility
-            accessibility = self.accessibility_tester.start(f"""
-            Test accessibility for:
-            Interface: {interface}
-            Flows: {flows}
-            """)
-            
-            return f"""
-            Interface Design:
-            {interface}
-            
-            User Flows:
-            {flows}
-            
-            Accessibility Report:
-            {accessibility}
-            """
+            return await self.execute(requirements)
             
+        except HTTPException as he:
+            raise he
         except Exception as e:
             return f"Error creating design: {str(e)}"
 
 # Automator Agent Class
-class AutomatorAgent:
-    def __init__(self):
-        self.config = load_agent_config('digital_transform_automator')[0]
-        self.instructions = load_agent_config('digital_transform_automator')[1]
-        self.memory = {}
-        self.api_key = None
-        self.initialize_components()
-
-    def update_api_key(self, api_key):
-        """Update the API key for all components."""
-        self.api_key = api_key
-        # Update API key for all components
-        self.workflow_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on workflow automation.",
-            api_key=api_key
-        )
-        
-        self.integration_builder = Agent(
-            instructions=f"{self.instructions}\nFocus on system integration.",
-            api_key=api_key
-        )
-        
-        self.test_creator = Agent(
-            instructions=f"{self.instructions}\nFocus on automated testing.",
-            api_key=api_key
-        )
-
-    def initialize_components(self):
-        """Initialize specialized components for different automation tasks."""
-        self.workflow_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on workflow automation."
-        )
-        
-        self.integration_builder = Agent(
-            instructions=f"{self.instructions}\nFocus on system integration."
-        )
-        
-        self.test_creator = Agent(
-            instructions=f"{self.instructions}\nFocus on automated testing."
-        )
-
-    async def create_automation(self, requirements: Dict) -> str:
-        """Create automation solution based on requirements."""
-        try:
-            # Design workflows
-            workflows = self.workflow_designer.start(f"""
+class AutomatorAgent(TeamMember):
+    agent_name = 'digital_transform_automator'
+    components = {
+        "workflow_designer": "Focus on workflow automation.",
+        "integration_builder": "Focus on system integration.",
+        "test_creator": "Focus on automated testing."
+    }
+    pipeline = Pipeline('automator', [
+        Step("workflows", "workflow_designer", """
             Design automation workflows based on:
-            Requirements: {json.dumps(requirements, indent=2)}
-            """)
-            
-            # Build integrations
-            integrations = self.integration_builder.start(f"""
+            Requirements: {requirements}
+            """),
+        Step("integrations", "integration_builder", """
             Create system integrations for:
             Workflows: {workflows}
-            """)
-            
-            # Create tests
-            tests = self.test_creator.start(f"""
+            """, inputs=("workflows",)),
+        Step("tests", "test_creator", """
             Create automated tests for:
             Workflows: {workflows}
             Integrations: {integrations}
-            """)
-            
-            return f"""
-            Automation Workflows:
-            {workflows}
-            
-            System Integrations:
-            {integrations}
-            
-            Automated Tests:
-            {tests}
-            """
+            """, inputs=("workflows", "integrations"))
+    ])
+
+    def render(self, run: PipelineRun) -> str:
+        """Assemble the pipeline outputs into one document."""
+        return f"""
+        Automation Workflows:
+        {run.outputs['workflows']}
+        
+        System Integrations:
+        {run.outputs['integrations']}
+        
+        Automated Tests:
+        {run.outputs['tests']}
+        """
+
+    async def create_automation(self, requirements: Dict) -> str:
+        """Create automation solution based on requirements."""
+        try:
+            return await self.execute(requirements)
             
+        except HTTPException as he:
+            raise he
         except Exception as e:
             return f"Error creating automation: {str(e)}"
 
 # Trainer Agent Class
-class TrainerAgent:
-    def __init__(self):
-        self.config = load_agent_config('digital_transform_trainer')[0]
-        self.instructions = load_agent_config('digital_transform_trainer')[1]
-        self.memory = {}
-        self.api_key = None
-        self.initialize_components()
-
-    def update_api_key(self, api_key):
-        """Update the API key for all components."""
-        self.api_key = api_key
-        # Update API key for all components
-        self.program_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on training program design.",
-            api_key=api_key
-        )
-        
-        self.content_creator = Agent(
-            instructions=f"{self.instructions}\nFocus on content creation.",
-            api_key=api_key
-        )
-        
-        self.assessment_builder = Agent(
-            instructions=f"{self.instructions}\nFocus on skill assessment.",
-            api_key=api_key
-        )
-
-    def initialize_components(self):
-        """Initialize specialized components for different training tasks."""
-        self.program_designer = Agent(
-            instructions=f"{self.instructions}\nFocus on training program design."
-        )
-        
-        self.content_creator = Agent(
-            instructions=f"{self.instructions}\nFocus on content creation."
-        )
-        
-        self.assessment_builder = Agent(
-            instructions=f"{self.instructions}\nFocus on skill assessment."
-        )
-
-    async def create_training(self, requirements: Dict) -> str:
-        """Create training program based on requirements."""
-        try:
-            # Design program
-            program = self.program_designer.start(f"""
+class TrainerAgent(TeamMember):
+    agent_name = 'digital_transform_trainer'
+    components = {
+        "program_designer": "Focus on training program design.",
+        "content_creator": "Focus on content creation.",
+        "assessment_builder": "Focus on skill assessment."
+    }
+    pipeline = Pipeline('trainer', [
+        Step("program", "program_designer", """
             Design training program based on:
-            Requirements: {json.dumps(requirements, indent=2)}
-            """)
-            
-            # Create content
-            content = self.content_creator.start(f"""
+            Requirements: {requirements}
+            """),
+        Step("content", "content_creator", """
             Create training content for:
             Program: {program}
-            """)
-            
-            # Build assessments
-            assessments = self.assessment_builder.start(f"""
+            """, inputs=("program",)),
+        Step("assessments", "assessment_builder", """
             Create skill assessments for:
             Program: {program}
             Content: {content}
-            """)
-            
-            return f"""
-            Training Program:
-            {program}
-            
-            Training Content:
-            {content}
-            
-            Skill Assessments:
-            {assessments}
-            """
+            """, inputs=("program", "content"))
+    ])
+
+    def render(self, run: PipelineRun) -> str:
+        """Assemble the pipeline outputs into one document."""
+        return f"""
+        Training Program:
+        {run.outputs['program']}
+        
+        Training Content:
+        {run.outputs['content']}
+        
+        Skill Assessments:
+        {run.outputs['assessments']}
+        """
+
+    async def create_training(self, requirements: Dict) -> str:
+        """Create training program based on requirements."""
+        try:
+            return await self.execute(requirements)
             
+        except HTTPException as he:
+            raise he
         except Exception as e:
             return f"Error creating training: {str(e)}"
 
 # Measurer Agent Class
-class MeasurerAgent:
-    def __init__(self):
-        self.config = load_agent_config('digital_transform_measurer')[0]
-        self.instructions = load_agent_config('digital_transform_measurer')[1]
-        self.memory = {}
-        self.api_key = None
-        self.initialize_components()
-
-    def update_api_key(self, api_key):
-        """Update the API key for all components."""
-        self.api_key = api_key
-        # Update API key for all components
-        self.kpi_analyzer = Agent(
-            instructions=f"{self.instructions}\nFocus on KPI analysis.",
-            api_key=api_key
-        )
-        
-        self.roi_calculator = Agent(
-            instructions=f"{self.instructions}\nFocus on ROI calculation.",
-            api_key=api_key
-        )
-        
-        self.impact_assessor = Agent(
-            instructions=f"{self.instructions}\nFocus on impact assessment.",
-            api_key=api_key
-        )
-
-    def initialize_components(self):
-        """Initialize specialized components for different measurement tasks."""
-        self.kpi_analyzer = Agent(
-            instructions=f"{self.instructions}\nFocus on KPI analysis."
-        )
-        
-        self.roi_calculator = Agent(
-            instructions=f"{self.instructions}\nFocus on ROI calculation."
-        )
-        
-        self.impact_assessor = Agent(
-            instructions=f"{self.instructions}\nFocus on impact assessment."
-        )
-
-    async def analyze_metrics(self, data: Dict) -> str:
-        """Analyze metrics and calculate ROI."""
-        try:
-            # Analyze KPIs
-            kpis = self.kpi_analyzer.start(f"""
+class MeasurerAgent(TeamMember):
+    agent_name = 'digital_transform_measurer'
+    components = {
+        "kpi_analyzer": "Focus on KPI analysis.",
+        "roi_calculator": "Focus on ROI calculation.",
+        "impact_assessor": "Focus on impact assessment."
+    }
+    pipeline_input = 'data'
+    pipeline = Pipeline('measurer', [
+        Step("kpis", "kpi_analyzer", """
             Analyze KPIs based on:
-            Data: {json.dumps(data, indent=2)}
-            """)
-            
-            # Calculate ROI
-            roi = self.roi_calculator.start(f"""
+            Data: {data}
+            """),
+        Step("roi", "roi_calculator", """
             Calculate ROI based on:
             KPIs: {kpis}
-            """)
-            
-            # Assess impact
-            impact = self.impact_assessor.start(f"""
+            """, inputs=("kpis",)),
+        Step("impact", "impact_assessor", """
             Assess impact based on:
             KPIs: {kpis}
             ROI: {roi}
-            """)
-            
-            return f"""
-            KPI Analysis:
-            {kpis}
-            
-            ROI Calculation:
-            {roi}
-            
-            Impact Assessment:
-            {impact}
-            """
+            """, inputs=("kpis", "roi"))
+    ])
+
+    def render(self, run: PipelineRun) -> str:
+        """Assemble the pipeline outputs into one document."""
+        return f"""
+        KPI Analysis:
+        {run.outputs['kpis']}
+        
+        ROI Calculation:
+        {run.outputs['roi']}
+        
+        Impact Assessment:
+        {run.outputs['impact']}
+        """
+
+    async def analyze_metrics(self, data: Dict) -> str:
+        """Analyze metrics and calculate ROI."""
+        try:
+            return await self.execute(data)
             
+        except HTTPException as he:
+            raise he
         except Exception as e:
             return f"Error analyzing metrics: {str(e)}"
 
 # Create global instances
-architect_agent = ArchitectAgent()
-designer_agent = DesignerAgent()
-automator_agent = AutomatorAgent()
-trainer_agent = TrainerAgent()
-measurer_agent = MeasurerAgent()
+with startup_profiler.phase("architect_agent", "construct"):
+    architect_agent = ArchitectAgent()
+with startup_profiler.phase("designer_agent", "construct"):
+    designer_agent = DesignerAgent()
+with startup_profiler.phase("automator_agent", "construct"):
+    automator_agent = AutomatorAgent()
+with startup_profiler.phase("trainer_agent", "construct"):
+    trainer_agent = TrainerAgent()
+with startup_profiler.phase("measurer_agent", "construct"):
+    measurer_agent = MeasurerAgent()
 
 # Add new request models
 class ArchitectRequest(BaseModel):
@@ -1417,92 +1712,313 @@ class MeasurerRequest(BaseModel):
 @app.post("/digital_transform/architect/design", response_model=Message)
 async def design_solution(request: ArchitectRequest, api_key: str = Depends(get_api_key)):
     """Design technical solution using the Architect agent."""
-    architect_agent.update_api_key(api_key)
-    solution = await architect_agent.design_solution(request.solution_requirements)
+    with architect_agent.bind(api_key) as architect:
+        solution = await architect.design_solution(request.solution_requirements)
+    log_turn(architect_agent.agent_name, request.solution_requirements, solution)
     return Message(role="assistant", content=solution)
 
 @app.post("/digital_transform/designer/create", response_model=Message)
 async def create_design(request: DesignerRequest, api_key: str = Depends(get_api_key)):
     """Create UI/UX design using the Designer agent."""
-    designer_agent.update_api_key(api_key)
-    design = await designer_agent.create_design(request.design_requirements)
+    with designer_agent.bind(api_key) as designer:
+        design = await designer.create_design(request.design_requirements)
+    log_turn(designer_agent.agent_name, request.design_requirements, design)
     return Message(role="assistant", content=design)
 
 @app.post("/digital_transform/automator/create", response_model=Message)
 async def create_automation(request: AutomatorRequest, api_key: str = Depends(get_api_key)):
     """Create automation solution using the Automator agent."""
-    automator_agent.update_api_key(api_key)
-    automation = await automator_agent.create_automation(request.automation_requirements)
+    with automator_agent.bind(api_key) as automator:
+        automation = await automator.create_automation(request.automation_requirements)
+    log_turn(automator_agent.agent_name, request.automation_requirements, automation)
     return Message(role="assistant", content=automation)
 
 @app.post("/digital_transform/trainer/create", response_model=Message)
 async def create_training(request: TrainerRequest, api_key: str = Depends(get_api_key)):
     """Create training program using the Trainer agent."""
-    trainer_agent.update_api_key(api_key)
-    training = await trainer_agent.create_training(request.training_requirements)
+    with trainer_agent.bind(api_key) as trainer:
+        training = await trainer.create_training(request.training_requirements)
+    log_turn(trainer_agent.agent_name, request.training_requirements, training)
     return Message(role="assistant", content=training)
 
 @app.post("/digital_transform/measurer/analyze", response_model=Message)
 async def analyze_metrics(request: MeasurerRequest, api_key: str = Depends(get_api_key)):
     """Analyze metrics using the Measurer agent."""
-    measurer_agent.update_api_key(api_key)
-    analysis = await measurer_agent.analyze_metrics(request.metric_data)
+    with measurer_agent.bind(api_key) as measurer:
+        analysis = await measurer.analyze_metrics(request.metric_data)
+    log_turn(measurer_agent.agent_name, request.metric_data, analysis)
     return Message(role="assistant", content=analysis)
 
-# Add response compression
-app.add_middleware(GZipMiddleware, minimum_size=1000)
+# Streaming variants: one SSE stage event per finished step, then the assembled result
+def stream_team_member(http_request: Request, member: TeamMember, api_key: str, payload: Dict):
+    """Stream a team member's pipeline as SSE stage events."""
+    async def events():
+        with member.bind(api_key) as bound:
+            async for event in bound.stream_pipeline(bound.pipeline_context(payload)):
+                yield event
+    
+    return sse.sse_response(
+        http_request,
+        log_events(events(), member.agent_name, payload),
+        heartbeat_interval=SSE_HEARTBEAT_INTERVAL
+    )
+
+@app.post("/digital_transform/architect/design/stream")
+async def stream_design_solution(request: ArchitectRequest, http_request: Request, api_key: str = Depends(get_api_key)):
+    """Stream the Architect pipeline stage by stage."""
+    return stream_team_member(http_request, architect_agent, api_key, request.solution_requirements)
+
+@app.post("/digital_transform/designer/create/stream")
+async def stream_create_design(request: DesignerRequest, http_request: Request, api_key: str = Depends(get_api_key)):
+    """Stream the Designer pipeline stage by stage."""
+    return stream_team_member(http_request, designer_agent, api_key, request.design_requirements)
+
+@app.post("/digital_transform/automator/create/stream")
+async def stream_create_automation(request: AutomatorRequest, http_request: Request, api_key: str = Depends(get_api_key)):
+    """Stream the Automator pipeline stage by stage."""
+    return stream_team_member(http_request, automator_agent, api_key, request.automation_requirements)
+
+@app.post("/digital_transform/trainer/create/stream")
+async def stream_create_training(request: TrainerRequest, http_request: Request, api_key: str = Depends(get_api_key)):
+    """Stream the Trainer pipeline stage by stage."""
+    return stream_team_member(http_request, trainer_agent, api_key, request.training_requirements)
+
+@app.post("/digital_transform/measurer/analyze/stream")
+async def stream_analyze_metrics(request: MeasurerRequest, http_request: Request, api_key: str = Depends(get_api_key)):
+    """Stream the Measurer pipeline stage by stage."""
+    return stream_team_member(http_request, measurer_agent, api_key, request.metric_data)
+
+# Full team run: every stage feeds the next server-side and is checkpointed to disk
+class TeamRunRequest(BaseModel):
+    business_info: BusinessInfo
+    # Self-reflection policy for the analysis stage: off, cheap, full or adaptive
+    reflection: Optional[str] = None
+
+team_checkpoints = CheckpointStore(TEAM_RUN_DIR)
+
+# (stage, team member, payload built from the run input and earlier stage outputs)
+TEAM_STAGES = [
+    ("analysis", analyst_agent, lambda run, done: run["input"]),
+    ("architecture", architect_agent, lambda run, done: {
+        "business_info": run["input"],
+        "business_analysis": done["analysis"]
+    }),
+    ("design", designer_agent, lambda run, done: {"solution_design": done["architecture"]}),
+    ("automation", automator_agent, lambda run, done: {"design_specs": done["design"]}),
+    ("training", trainer_agent, lambda run, done: {"automation_specs": done["automation"]}),
+    ("measurement", measurer_agent, lambda run, done: {
+        "business_goals": run["input"].get("goals"),
+        "training_program": done["training"]
+    })
+]
+
+async def stream_team_run(checkpoint: Dict[str, Any], api_key: str) -> AsyncGenerator[Tuple[str, Dict[str, Any]], None]:
+    """Run the remaining team stages, yielding each one as it completes."""
+    started = time.perf_counter()
+    with team_checkpoints.claim(checkpoint, resumed=bool(checkpoint["stages"])):
+        for stage, member, build_payload in TEAM_STAGES:
+            done = {name: entry["output"] for name, entry in checkpoint["stages"].items()}
+            if stage in done:
+                # Already paid for on an earlier attempt
+                team_checkpoints.reuse_stage()
+                yield TeamMember.stage_event(stage, done[stage], started, resumed=True)
+                continue
+            
+            stage_started = time.perf_counter()
+            try:
+                with member.bind(api_key, **checkpoint.get("options", {})) as bound:
+                    output = await asyncio.wait_for(
+                        bound.execute(build_payload(checkpoint, done)), timeout=TEAM_STAGE_TIMEOUT
+                    )
+                    version = bound.spec.content_hash
+            except asyncio.TimeoutError:
+                team_checkpoints.fail(checkpoint, stage, f"timed out after {TEAM_STAGE_TIMEOUT}s")
+                raise TimeoutError(f"Stage {stage} timed out; resume run {checkpoint['run_id']} to retry it")
+            except Exception as e:
+                team_checkpoints.fail(checkpoint, stage, str(e))
+                raise
+            
+            elapsed_ms = round((time.perf_counter() - stage_started) * 1000, 1)
+            team_checkpoints.complete_stage(checkpoint, stage, output, elapsed_ms, version)
+            yield TeamMember.stage_event(stage, output, started, duration_ms=elapsed_ms)
+        
+        team_checkpoints.finish(checkpoint)
+
+def team_run_response(http_request: Request, checkpoint: Dict[str, Any], api_key: str):
+    """Stream a team run as SSE, with its id in a header for resuming."""
+    return sse.sse_response(
+        http_request,
+        log_events(stream_team_run(checkpoint, api_key), "team", checkpoint["input"], checkpoint["run_id"]),
+        heartbeat_interval=SSE_HEARTBEAT_INTERVAL,
+        headers={"X-Team-Run-Id": checkpoint["run_id"]}
+    )
+
+async def load_team_run(run_id: str, api_key: str) -> Dict[str, Any]:
+    """Load a team run checkpoint started with this API key or raise a 404."""
+    try:
+        return await team_checkpoints.load(run_id, owner=hash_api_key(api_key))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Team run {run_id} not found")
 
-# Add MongoDB configuration
-MONGODB_URL = os.getenv('MONGODB_URL', 'mongodb://localhost:27017')
-MONGODB_DB = os.getenv('MONGODB_DB', 'juici_agents')
-
-# Initialize MongoDB client
-try:
-    mongodb_client = AsyncIOMotorClient(MONGODB_URL)
-    mongodb_db = mongodb_client[MONGODB_DB]
-except Exception as e:
-    print(f"Warning: MongoDB connection failed - {str(e)}")
-    mongodb_client = None
-    mongodb_db = None
-
-# Add connection pooling for database operations
-async def get_db_pool():
-    """Get MongoDB connection pool."""
+@app.post("/digital_transform/team/run")
+async def run_team(request: TeamRunRequest, http_request: Request, api_key: str = Depends(get_api_key)):
+    """Run Analyst through Measurer in one request, streaming each stage."""
     try:
-        return AsyncIOMotorClient(
-            MONGODB_URL,
-            maxPoolSize=50,
-            minPoolSize=10,
-            serverSelectionTimeoutMS=5000
+        resolve_policy(request.reflection, api_key, tenant_reflection_policies, REFLECTION_POLICY)
+        checkpoint = team_checkpoints.create(
+            request.business_info.dict(), {"reflection": request.reflection}, owner=hash_api_key(api_key)
         )
+        return team_run_response(http_request, checkpoint, api_key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        print(f"Warning: Failed to create MongoDB pool - {str(e)}")
-        return None
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/digital_transform/team/runs/{run_id}/resume")
+async def resume_team_run(run_id: str, http_request: Request, api_key: str = Depends(get_api_key)):
+    """Resume a failed or interrupted team run from its last completed stage."""
+    checkpoint = await load_team_run(run_id, api_key)
+    if team_checkpoints.is_running(run_id):
+        raise HTTPException(status_code=409, detail=f"Team run {run_id} is already running")
+    return team_run_response(http_request, checkpoint, api_key)
+
+@app.get("/digital_transform/team/runs/{run_id}", response_model=Dict[str, Any])
+async def get_team_run(run_id: str, api_key: str = Depends(get_api_key)):
+    """Get a team run's status and completed stage outputs."""
+    return await load_team_run(run_id, api_key)
+
+# Add response compression
+app.add_middleware(GZipMiddleware, minimum_size=1000)
 
-# Initialize connection pools
-http_session = aiohttp.ClientSession()
-db_pool = None
+# The one MongoDB client; connected at startup, closed at shutdown. Every
+# persistence feature gets its collections and indexes from here
+mongo = MongoRegistry(
+    MONGODB_URL,
+    MONGODB_DB,
+    max_pool_size=MONGODB_MAX_POOL_SIZE,
+    min_pool_size=MONGODB_MIN_POOL_SIZE,
+    server_selection_timeout_ms=MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+    max_idle_time_ms=MONGODB_MAX_IDLE_TIME_MS,
+    probe_interval=MONGODB_PROBE_INTERVAL
+)
+mongo.require_index(MEMORY_COLLECTION, [("agent", 1), ("key", 1)], unique=True)
+mongo.require_index(MEMORY_COLLECTION, "stored_at", expireAfterSeconds=int(MEMORY_TTL))
+mongo.require_index(CONVERSATION_LOG_COLLECTION, [("session_id", 1), ("ts", 1)])
+mongo.require_index(CONVERSATION_LOG_COLLECTION, [("agent", 1), ("ts", -1)])
+mongo.require_index(CONVERSATION_LOG_COLLECTION, "ts", expireAfterSeconds=int(CONVERSATION_LOG_TTL))
+
+# Team member memory, persisted to MongoDB once it is connected
+memory_store = MemoryStore(
+    lambda: mongo.collection(MEMORY_COLLECTION),
+    max_entries=MEMORY_MAX_ENTRIES,
+    ttl=MEMORY_TTL,
+    flush_interval=MEMORY_FLUSH_INTERVAL,
+    max_pending=MEMORY_MAX_PENDING
+)
+
+# Per-session /chat history, in its own LRU so busy chats can't evict team member memory
+chat_store = MemoryStore(
+    lambda: mongo.collection(MEMORY_COLLECTION),
+    max_entries=CHAT_MAX_SESSIONS,
+    ttl=MEMORY_TTL,
+    flush_interval=MEMORY_FLUSH_INTERVAL,
+    max_pending=MEMORY_MAX_PENDING
+)
+chat_sessions = ChatSessions(chat_store, window_tokens=CHAT_WINDOW_TOKENS, fold_tokens=CHAT_FOLD_TOKENS,
+                             model=DEFAULT_CHAT_MODEL)
+
+async def summarize_chat(summary: str, turns: List[Dict[str, Any]], api_key: str) -> str:
+    """Fold older chat turns into a session's rolling summary."""
+    transcript = "\n".join(f"{turn['role'].capitalize()}: {turn['content']}" for turn in turns)
+    messages = [
+        {"role": "system", "content": "You maintain a running summary of a conversation. Keep facts, decisions, "
+                                      "names, numbers and open questions; drop pleasantries."},
+        {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}\n\n"
+                                    f"Return the updated summary in at most {CHAT_SUMMARY_TOKENS} tokens."}
+    ]
+    return await complete(messages, CHAT_SUMMARY_MODEL, api_key, temperature=0, max_tokens=CHAT_SUMMARY_TOKENS)
+
+# Chat turns and pipeline outputs, batched into MongoDB off the response path
+conversation_log = ConversationLog(
+    lambda: mongo.collection(CONVERSATION_LOG_COLLECTION),
+    batch_size=CONVERSATION_LOG_BATCH_SIZE,
+    flush_interval=CONVERSATION_LOG_FLUSH_INTERVAL,
+    max_buffer=CONVERSATION_LOG_MAX_BUFFER,
+    spill_path=CONVERSATION_LOG_SPILL_FILE or None
+)
+
+def log_turn(agent: str, request: Any, response: str, session_id: Optional[str] = None, **extra):
+    """Queue one request/response pair for the conversation log."""
+    conversation_log.record("turn", agent=agent, session_id=session_id, request=request, response=response, **extra)
+
+async def log_events(events: AsyncGenerator[Tuple[str, Dict[str, Any]], None], agent: str, request: Any,
+                     session_id: Optional[str] = None) -> AsyncGenerator[Tuple[str, Dict[str, Any]], None]:
+    """Pass SSE events through, logging each stage output and the streamed text as one turn."""
+    tokens = []
+    completed = False
+    try:
+        async for event, data in events:
+            if event == sse.TOKEN:
+                tokens.append(data["text"])
+            elif event == sse.STAGE:
+                conversation_log.record("stage", agent=agent, session_id=session_id, request=request,
+                                        stage=data["stage"], output=data["output"], reused=bool(data.get("reused")))
+            yield event, data
+        completed = True
+    finally:
+        if tokens:
+            # A disconnected client still leaves the partial answer in the log
+            log_turn(agent, request, "".join(tokens), session_id, completed=completed)
+
+async def load_retrieval_index():
+    """Rebuild the retrieval index from its last snapshot without holding up startup."""
+    try:
+        loaded = await blocking_executor.run(retrieval_index.load, RETRIEVAL_INDEX_PATH)
+        print(f"Loaded {loaded} documents into the retrieval index")
+    except Exception as e:
+        print(f"Warning: Failed to load retrieval index - {str(e)}")
 
 @app.on_event("startup")
 async def startup_event():
     """Initialize connections on startup."""
-    global db_pool
-    try:
-        db_pool = await get_db_pool()
-        if db_pool:
-            # Test connection
-            await db_pool.server_info()
-            print("MongoDB connection successful")
-    except Exception as e:
-        print(f"Warning: MongoDB startup connection failed - {str(e)}")
-        db_pool = None
+    if AGENT_HOT_RELOAD:
+        with startup_profiler.phase("agent watcher", "startup"):
+            agent_watcher.start()
+        print(f"Watching agent files for changes ({agent_watcher.backend})")
+    if response_cache.directory is not None:
+        # Sweep expired disk entries in the background; startup doesn't wait on it
+        asyncio.ensure_future(blocking_executor.run(response_cache.prune))
+    if RETRIEVAL_INDEX_PATH:
+        asyncio.ensure_future(load_retrieval_index())
+    with startup_profiler.phase("mongodb connect", "startup"):
+        await mongo.connect()
+    # Writes queue in memory until MongoDB is reachable
+    memory_store.start()
+    chat_store.start()
+    conversation_log.start()
+    startup_profiler.mark_ready()
+    if STARTUP_PROFILE:
+        print(startup_profiler.format_report())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up connections on shutdown."""
-    await http_session.close()
-    if db_pool:
-        db_pool.close()
+    agent_watcher.stop()
+    await chat_sessions.close()
+    await chat_store.close()
+    await memory_store.close()
+    await conversation_log.close()
+    await response_cache.close()
+    await team_checkpoints.close()
+    await route_stats.close()
+    await close_llm_clients()
+    # Last, so the writers above can flush through it
+    await mongo.close()
+    if RETRIEVAL_INDEX_PATH:
+        try:
+            retrieval_index.save(RETRIEVAL_INDEX_PATH)
+        except Exception as e:
+            print(f"Warning: Failed to save retrieval index - {str(e)}")
 
 # Add request batching for efficiency
 class BatchProcessor:
@@ -1526,7 +2042,7 @@ class BatchProcessor:
             self.batch.clear()
             
             # Process requests in parallel
-            tasks = [thread_pool.submit(process_request, req) for req in batch]
+            tasks = [blocking_executor.run(process_request, req) for req in batch]
             return await asyncio.gather(*tasks)
         finally:
             self.processing = False
@@ -1544,5 +2060,14 @@ def optimize_memory():
             torch.cuda.empty_cache()  # Clear GPU memory if available
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    import argparse
+    parser = argparse.ArgumentParser(description="Juici Agents API")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print the startup time breakdown and exit instead of serving")
+    args = parser.parse_args()
+    if args.profile_startup:
+        startup_profiler.mark_ready()
+        print(startup_profiler.format_report())
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8000)
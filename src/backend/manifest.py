@@ -0,0 +1,41 @@
+import argparse
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from config import AGENTS_DIR, AGENTS_MANIFEST
+from registry import AgentRegistry
+
+
+def write_manifest(agents_dir, output_path) -> dict:
+    """Compile all agent configs and prompts into one manifest file."""
+    manifest = AgentRegistry(agents_dir).build_manifest()
+    output_path = Path(output_path)
+
+    # Write atomically so a running server never reads a half-written file
+    fd, tmp_path = tempfile.mkstemp(dir=output_path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, output_path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precompiled agent manifest.")
+    parser.add_argument("--agents-dir", default=AGENTS_DIR, help="Directory containing the agents")
+    parser.add_argument("--output", default=AGENTS_MANIFEST, help="Manifest file to write")
+    args = parser.parse_args()
+
+    manifest = write_manifest(args.agents_dir, args.output)
+    print(f"Wrote {len(manifest['agents'])} agents to {args.output}")
+    for agent_name, entry in sorted(manifest['agents'].items()):
+        print(f"  {agent_name}: {entry['prompt_tokens']} prompt tokens ({entry['content_hash'][:12]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Returns the Mongo collection backing the store, or None while MongoDB is unavailable
+CollectionGetter = Callable[[], Any]
+
+
+class MemoryStore:
+    """Agent memory: a bounded in-process LRU with write-behind to MongoDB.
+
+    Entries are keyed by (agent, key), e.g. ("digital_transform_analyst",
+    "Acme_Retail"), and expire after `ttl` seconds in both tiers. Writes
+    land in memory immediately and are upserted to Mongo in batches by a
+    background task, so callers never wait on the database; several
+    writes to one key before a flush collapse into one.
+    """
+
+    def __init__(self, get_collection: CollectionGetter, max_entries: int = 500, ttl: float = 604800.0,
+                 flush_interval: float = 2.0, max_pending: int = 1000):
+        self.get_collection = get_collection
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._pending: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._memory_hits = 0
+        self._db_hits = 0
+        self._misses = 0
+        self._evicted = 0
+        self._writes = 0
+        self._flushed = 0
+        self._flush_errors = 0
+        self._dropped = 0
+
+    def _remember(self, key: Tuple[str, str], entry: Dict[str, Any], stored_at: float):
+        with self._lock:
+            self._memory[key] = (entry, stored_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+                self._evicted += 1
+
+    async def get(self, agent: str, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored entry for `key`, checking memory first, then MongoDB."""
+        now = time.time()
+        with self._lock:
+            cached = self._memory.get((agent, key))
+            if cached is not None:
+                if now - cached[1] <= self.ttl:
+                    self._memory.move_to_end((agent, key))
+                    self._memory_hits += 1
+                    return cached[0]
+                del self._memory[(agent, key)]
+
+        collection = self.get_collection()
+        if collection is not None:
+            try:
+                document = await collection.find_one({
+                    "agent": agent,
+                    "key": key,
+                    "stored_at": {"$gte": datetime.now(timezone.utc) - timedelta(seconds=self.ttl)}
+                })
+                if document is not None:
+                    stored_at = document["stored_at"].replace(tzinfo=timezone.utc).timestamp()
+                    self._remember((agent, key), document["entry"], stored_at)
+                    with self._lock:
+                        self._db_hits += 1
+                    return document["entry"]
+            except Exception as e:
+                print(f"Warning: Failed to read memory {agent}/{key} - {str(e)}")
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, agent: str, key: str, entry: Dict[str, Any]):
+        """Store `entry` in memory now and queue it for MongoDB."""
+        stored_at = time.time()
+        self._remember((agent, key), entry, stored_at)
+        with self._lock:
+            self._writes += 1
+            self._pending[(agent, key)] = (entry, stored_at)
+            self._pending.move_to_end((agent, key))
+            while len(self._pending) > self.max_pending:
+                # MongoDB has been away for a while: keep the newest writes
+                self._pending.popitem(last=False)
+                self._dropped += 1
+
+    async def flush(self) -> int:
+        """Upsert every queued write to MongoDB; failed batches are retried on the next flush."""
+        collection = self.get_collection()
+        with self._lock:
+            if collection is None or not self._pending:
+                return 0
+            batch, self._pending = self._pending, OrderedDict()
+
+        from pymongo import ReplaceOne
+        operations = [
+            ReplaceOne(
+                {"agent": agent, "key": key},
+                {
+                    "agent": agent,
+                    "key": key,
+                    "entry": entry,
+                    "stored_at": datetime.fromtimestamp(stored_at, timezone.utc)
+                },
+                upsert=True
+            )
+            for (agent, key), (entry, stored_at) in batch.items()
+        ]
+        try:
+            await collection.bulk_write(operations, ordered=False)
+        except Exception as e:
+            with self._lock:
+                self._flush_errors += 1
+                # Requeue, without overwriting anything written since
+                for key, value in batch.items():
+                    if key not in self._pending:
+                        self._pending[key] = value
+            print(f"Warning: Failed to persist {len(operations)} memory entries - {str(e)}")
+            return 0
+        with self._lock:
+            self._flushed += len(operations)
+        return len(operations)
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        """Start the background write-behind task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._flush_loop())
+
+    async def close(self):
+        """Stop the background task and persist anything still queued."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-tier hit counts, occupancy and write-behind backlog."""
+        with self._lock:
+            lookups = self._memory_hits + self._db_hits + self._misses
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "memory_hits": self._memory_hits,
+                "db_hits": self._db_hits,
+                "misses": self._misses,
+                "hit_ratio": round((self._memory_hits + self._db_hits) / lookups, 3) if lookups else None,
+                "evicted": self._evicted,
+                "writes": self._writes,
+                "pending": len(self._pending),
+                "flushed": self._flushed,
+                "flush_errors": self._flush_errors,
+                "dropped": self._dropped
+            }
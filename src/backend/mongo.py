@@ -0,0 +1,142 @@
+import asyncio
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+IndexKeys = Union[str, Sequence[Tuple[str, int]]]
+
+
+class MongoRegistry:
+    """Owns the process's one MongoDB client and the indexes features depend on.
+
+    Features register the indexes they need with require_index() at import
+    time and get collections through collection(). connect() runs at
+    startup and close() at shutdown. If MongoDB is down, the client stays
+    in place and reconnects on its own; background health probes notice
+    when it is back and provision any indexes still missing.
+    """
+
+    def __init__(self, url: str, database: str, max_pool_size: int = 50, min_pool_size: int = 5,
+                 server_selection_timeout_ms: int = 5000, max_idle_time_ms: int = 60000,
+                 probe_interval: float = 30.0):
+        self.url = url
+        self.database = database
+        self.options = {
+            "maxPoolSize": max_pool_size,
+            "minPoolSize": min_pool_size,
+            "serverSelectionTimeoutMS": server_selection_timeout_ms,
+            "maxIdleTimeMS": max_idle_time_ms
+        }
+        self.probe_interval = probe_interval
+        self.client = None
+        self.db = None
+        self._probe_task: Optional[asyncio.Task] = None
+        self._lock = threading.Lock()
+        self._indexes: List[Tuple[str, IndexKeys, Dict[str, Any]]] = []
+        self._indexes_ready = False
+        self._index_errors: Dict[str, str] = {}
+        self._last_probe: Optional[Dict[str, Any]] = None
+        self._probes = 0
+        self._probe_failures = 0
+
+    def require_index(self, collection: str, keys: IndexKeys, **options):
+        """Declare an index created at startup (or once MongoDB becomes reachable)."""
+        self._indexes.append((collection, keys, options))
+
+    @property
+    def available(self) -> bool:
+        """Whether the latest probe reached the server."""
+        with self._lock:
+            return self._last_probe is not None and self._last_probe["status"] == "ok"
+
+    def collection(self, name: str):
+        """Return a collection handle, or None while MongoDB is unreachable.
+
+        Callers treat None as "not now", so an outage costs them a queued
+        write or a cache miss instead of a server selection timeout.
+        """
+        return self.db[name] if self.db is not None and self.available else None
+
+    async def connect(self):
+        """Create the client, check the server is reachable and provision indexes."""
+        try:
+            from motor.motor_asyncio import AsyncIOMotorClient
+            self.client = AsyncIOMotorClient(self.url, **self.options)
+            self.db = self.client[self.database]
+        except Exception as e:
+            print(f"Warning: Failed to create MongoDB client - {str(e)}")
+            return
+        probe = await self.ping()
+        if probe["status"] == "ok":
+            print(f"MongoDB connection successful ({probe['latency_ms']} ms)")
+        else:
+            print(f"Warning: MongoDB unreachable at startup, will retry - {probe['error']}")
+        if self.probe_interval > 0:
+            self._probe_task = asyncio.ensure_future(self._probe_loop())
+
+    async def _probe_loop(self):
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            await self.ping()
+
+    async def ensure_indexes(self):
+        """Create every required index; each failure is reported and the rest still run."""
+        errors = {}
+        for collection, keys, options in self._indexes:
+            name = f"{collection}.{keys if isinstance(keys, str) else '_'.join(k for k, _ in keys)}"
+            try:
+                await self.db[collection].create_index(keys, **options)
+            except Exception as e:
+                errors[name] = str(e)
+                print(f"Warning: Failed to create index {name} - {str(e)}")
+        with self._lock:
+            self._index_errors = errors
+            self._indexes_ready = True
+        print(f"MongoDB indexes ready ({len(self._indexes) - len(errors)}/{len(self._indexes)})")
+
+    async def ping(self) -> Dict[str, Any]:
+        """Health probe: round-trip a ping and finish index provisioning if it is still pending."""
+        started = time.perf_counter()
+        if self.client is None:
+            probe = {"status": "unavailable", "latency_ms": None, "error": "no client"}
+        else:
+            try:
+                await self.client.admin.command("ping")
+                probe = {"status": "ok", "latency_ms": round((time.perf_counter() - started) * 1000, 1), "error": None}
+            except Exception as e:
+                probe = {"status": "unavailable", "latency_ms": None, "error": str(e)}
+        with self._lock:
+            self._probes += 1
+            if probe["status"] != "ok":
+                self._probe_failures += 1
+            self._last_probe = {**probe, "at": time.time()}
+            provision = probe["status"] == "ok" and not self._indexes_ready
+        if provision:
+            await self.ensure_indexes()
+        return probe
+
+    async def close(self):
+        """Stop probing and close the client and its connection pool."""
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+        if self.client is not None:
+            self.client.close()
+        self.client = None
+        self.db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool settings, index state and the latest probe."""
+        with self._lock:
+            return {
+                "client": self.client is not None,
+                "database": self.database,
+                "pool": dict(self.options),
+                "indexes_required": len(self._indexes),
+                "indexes_ready": self._indexes_ready,
+                "index_errors": dict(self._index_errors),
+                "probes": self._probes,
+                "probe_failures": self._probe_failures,
+                "last_probe": self._last_probe
+            }
@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+# Runs one step: (step, rendered prompt) -> output text
+StepCall = Callable[["Step", str], Awaitable[str]]
+# Notified as each step finishes with (step name, output, timing)
+StepCallback = Callable[[Tuple[str, str, Dict[str, Any]]], None]
+# Rewrites a step's upstream inputs (e.g. to fit a token budget) before its prompt is built
+StepPrepare = Callable[["Step", Dict[str, Any], Dict[str, str]], Awaitable[Dict[str, str]]]
+
+
+@dataclass(frozen=True)
+class Step:
+    """One sub-agent call in a pipeline.
+
+    `prompt` is a str.format template; it may reference the pipeline's
+    context keys and the outputs of the steps listed in `inputs`. A step
+    that is not `required` may time out or fail without failing the run:
+    its output is replaced by a "missing" marker and dependents carry on.
+    """
+    name: str
+    agent: str
+    prompt: str
+    inputs: Tuple[str, ...] = ()
+    timeout: Optional[float] = None
+    required: bool = True
+
+
+def missing_marker(step: str, reason: str) -> str:
+    """Placeholder output for a step that produced nothing."""
+    return f"[{step} unavailable: {reason}]"
+
+
+@dataclass
+class PipelineRun:
+    """Outputs and timings of one pipeline execution."""
+    pipeline: str
+    outputs: Dict[str, str] = field(default_factory=dict)
+    timings: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    elapsed_ms: float = 0.0
+    critical_path: List[str] = field(default_factory=list)
+    critical_path_ms: float = 0.0
+    # Optional steps that timed out or failed -> reason
+    missing: Dict[str, str] = field(default_factory=dict)
+
+    def completed(self) -> Dict[str, str]:
+        """Outputs of the steps that actually produced a result."""
+        return {name: output for name, output in self.outputs.items() if name not in self.missing}
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "pipeline": self.pipeline,
+            "elapsed_ms": self.elapsed_ms,
+            "critical_path": self.critical_path,
+            "critical_path_ms": self.critical_path_ms,
+            "missing": self.missing,
+            "steps": self.timings
+        }
+
+
+class Pipeline:
+    """A DAG of steps; every step whose inputs are ready runs concurrently."""
+
+    def __init__(self, name: str, steps: List[Step]):
+        self.name = name
+        self.steps = {step.name: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError(f"Pipeline {name} has duplicate step names")
+        for step in steps:
+            missing = [i for i in step.inputs if i not in self.steps]
+            if missing:
+                raise ValueError(f"Step {step.name} in {name} depends on unknown steps {missing}")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        order, done = [], set()
+        while len(order) < len(self.steps):
+            ready = [n for n, s in self.steps.items() if n not in done and set(s.inputs) <= done]
+            if not ready:
+                raise ValueError(f"Pipeline {self.name} has a dependency cycle")
+            order.extend(ready)
+            done.update(ready)
+        return order
+
+    def _critical_path(self, run: PipelineRun):
+        # Longest chain of step durations through the DAG
+        best: Dict[str, Tuple[float, List[str]]] = {}
+        for name in self.order:
+            duration = run.timings[name]["duration_ms"]
+            prior = max((best[i] for i in self.steps[name].inputs), default=(0.0, []), key=lambda b: b[0])
+            best[name] = (prior[0] + duration, prior[1] + [name])
+        # On a tie (e.g. a final step that took ~0 ms) prefer the longer chain, so the path reaches the end
+        total, path = max(best.values(), key=lambda b: (b[0], len(b[1])))
+        run.critical_path, run.critical_path_ms = path, round(total, 1)
+
+    async def run(self, call: StepCall, context: Dict[str, Any],
+                  on_step: Optional[StepCallback] = None,
+                  prepare: Optional[StepPrepare] = None) -> PipelineRun:
+        """Execute the DAG; the first failing step cancels the rest and re-raises."""
+        run = PipelineRun(self.name)
+        started = time.perf_counter()
+        pending: Dict[asyncio.Task, str] = {}
+
+        async def execute(step: Step) -> str:
+            step_started = time.perf_counter()
+            status = "ok"
+            try:
+                inputs = {i: run.outputs[i] for i in step.inputs}
+                if prepare is not None and inputs:
+                    inputs = await prepare(step, context, inputs)
+                prompt = step.prompt.format(**context, **inputs)
+                return await asyncio.wait_for(call(step, prompt), timeout=step.timeout)
+            except asyncio.TimeoutError:
+                status = "timeout"
+                if step.required:
+                    raise TimeoutError(f"Step {step.name} timed out after {step.timeout}s")
+                run.missing[step.name] = f"timed out after {step.timeout}s"
+                return missing_marker(step.name, run.missing[step.name])
+            except Exception as e:
+                status = "error"
+                if step.required:
+                    raise
+                print(f"Optional step {step.name} in {self.name} failed: {str(e)}")
+                run.missing[step.name] = f"failed ({type(e).__name__})"
+                return missing_marker(step.name, run.missing[step.name])
+            finally:
+                run.timings[step.name] = {
+                    "started_ms": round((step_started - started) * 1000, 1),
+                    "duration_ms": round((time.perf_counter() - step_started) * 1000, 1),
+                    "status": status
+                }
+
+        try:
+            while len(run.outputs) < len(self.steps):
+                scheduled = set(run.outputs) | set(pending.values())
+                for name in self.order:
+                    step = self.steps[name]
+                    if name not in scheduled and all(i in run.outputs for i in step.inputs):
+                        pending[asyncio.ensure_future(execute(step))] = name
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = pending.pop(task)
+                    run.outputs[name] = task.result()
+                    if on_step is not None:
+                        on_step((name, run.outputs[name], run.timings[name]))
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+            pipeline_stats.record(self.name, None)
+            raise
+
+        run.elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        self._critical_path(run)
+        pipeline_stats.record(self.name, run)
+        return run
+
+
+class PipelineStats:
+    """Rolling per-pipeline and per-step latencies for /metrics."""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._window = window
+        self._runs: Dict[str, int] = {}
+        self._errors: Dict[str, int] = {}
+        self._partial: Dict[str, int] = {}
+        self._elapsed: Dict[str, Deque[float]] = {}
+        self._steps: Dict[str, Dict[str, Deque[float]]] = {}
+
+    def record(self, pipeline: str, run: Optional[PipelineRun]):
+        with self._lock:
+            self._runs[pipeline] = self._runs.get(pipeline, 0) + 1
+            if run is None:
+                self._errors[pipeline] = self._errors.get(pipeline, 0) + 1
+                return
+            if run.missing:
+                self._partial[pipeline] = self._partial.get(pipeline, 0) + 1
+            self._elapsed.setdefault(pipeline, deque(maxlen=self._window)).append(run.elapsed_ms)
+            steps = self._steps.setdefault(pipeline, {})
+            for name, timing in run.timings.items():
+                steps.setdefault(name, deque(maxlen=self._window)).append(timing["duration_ms"])
+
+    @staticmethod
+    def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+        if not values:
+            return {"p50": None, "p95": None}
+        values = sorted(values)
+        pick = lambda q: values[min(len(values) - 1, int(q * len(values)))]
+        return {"p50": pick(0.50), "p95": pick(0.95)}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                pipeline: {
+                    "runs": runs,
+                    "errors": self._errors.get(pipeline, 0),
+                    "partial": self._partial.get(pipeline, 0),
+                    "elapsed_ms": self._percentiles(list(self._elapsed.get(pipeline, ()))),
+                    "steps_ms": {
+                        name: self._percentiles(list(values))
+                        for name, values in self._steps.get(pipeline, {}).items()
+                    }
+                }
+                for pipeline, runs in self._runs.items()
+            }
+
+
+pipeline_stats = PipelineStats()
@@ -0,0 +1,116 @@
+import json
+import re
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from agent_pool import hash_api_key
+
+OFF = "off"
+CHEAP = "cheap"
+FULL = "full"
+ADAPTIVE = "adaptive"
+POLICIES = (OFF, CHEAP, FULL, ADAPTIVE)
+
+# Words that signal the analysis is unsure of itself
+HEDGES = re.compile(
+    r"\b(may|might|could|possibly|perhaps|unclear|uncertain|unknown|insufficient|assume[sd]?|likely|unsure)\b",
+    re.IGNORECASE
+)
+
+
+def parse_tenant_policies(raw: str) -> Dict[str, str]:
+    """Parse {"<tenant id>": "<policy>"} from config, skipping invalid entries."""
+    if not raw:
+        return {}
+    try:
+        policies = json.loads(raw)
+    except ValueError as e:
+        print(f"Warning: Ignoring invalid tenant reflection policies - {str(e)}")
+        return {}
+    return {tenant: policy for tenant, policy in policies.items() if policy in POLICIES}
+
+
+def resolve_policy(requested: Optional[str], api_key: Optional[str], tenant_policies: Dict[str, str],
+                   default: str) -> str:
+    """Pick the policy for a request: explicit request, then tenant, then the server default.
+
+    A tenant is identified by its hashed API key (agent_pool.hash_api_key).
+    """
+    if requested:
+        if requested not in POLICIES:
+            raise ValueError(f"Unknown reflection policy {requested!r}; expected one of {', '.join(POLICIES)}")
+        return requested
+    return tenant_policies.get(hash_api_key(api_key), default)
+
+
+def confidence_flags(analysis: str, missing: Dict[str, str], min_tokens: int,
+                     max_hedges_per_1k: float, token_count: int) -> List[str]:
+    """Reasons an analysis looks unreliable enough to be worth reflecting on."""
+    flags = []
+    if missing:
+        flags.append(f"missing branches: {', '.join(missing)}")
+    if "Error" in analysis:
+        flags.append("analysis contains errors")
+    if token_count < min_tokens:
+        flags.append(f"short analysis ({token_count} tokens)")
+    words = len(analysis.split())
+    if words:
+        hedges_per_1k = len(HEDGES.findall(analysis)) * 1000 / words
+        if hedges_per_1k > max_hedges_per_1k:
+            flags.append(f"hedging ({hedges_per_1k:.1f} per 1k words)")
+    return flags
+
+
+class ReflectionStats:
+    """Reflection outcomes per policy, and what skipping or downgrading saved.
+
+    Skipped reflections count toward `tokens_saved`; cheap ones toward
+    `tokens_shifted`, tokens still spent but on the cheaper model.
+    """
+
+    def __init__(self, window: int = 200):
+        self._lock = threading.Lock()
+        self._by_policy: Dict[str, Dict[str, int]] = {}
+        # Recent full reflections, used to estimate what a skipped one would have cost
+        self._full_latency: Deque[float] = deque(maxlen=window)
+        self._full_output_tokens: Deque[int] = deque(maxlen=window)
+        self.tokens_saved = 0
+        self.tokens_shifted = 0
+        self.latency_saved_ms = 0.0
+
+    def estimate_full(self) -> Dict[str, Optional[float]]:
+        """Average latency and output size of a full reflection, if any were seen."""
+        with self._lock:
+            latency = list(self._full_latency)
+            output = list(self._full_output_tokens)
+        return {
+            "latency_ms": round(sum(latency) / len(latency), 1) if latency else None,
+            "output_tokens": round(sum(output) / len(output)) if output else None
+        }
+
+    def record(self, policy: str, mode: str, latency_ms: float, output_tokens: int,
+               tokens_saved: int, tokens_shifted: int, latency_saved_ms: Optional[float]):
+        with self._lock:
+            entry = self._by_policy.setdefault(policy, {OFF: 0, CHEAP: 0, FULL: 0})
+            entry[mode] += 1
+            if mode == FULL:
+                self._full_latency.append(latency_ms)
+                self._full_output_tokens.append(output_tokens)
+            self.tokens_saved += tokens_saved
+            self.tokens_shifted += tokens_shifted
+            self.latency_saved_ms += latency_saved_ms or 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        estimate = self.estimate_full()
+        with self._lock:
+            return {
+                "by_policy": {policy: dict(modes) for policy, modes in self._by_policy.items()},
+                "full_reflection_avg_ms": estimate["latency_ms"],
+                "tokens_saved": self.tokens_saved,
+                "tokens_shifted": self.tokens_shifted,
+                "latency_saved_ms": round(self.latency_saved_ms, 1)
+            }
+
+
+reflection_stats = ReflectionStats()
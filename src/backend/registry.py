@@ -0,0 +1,285 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+import yaml
+
+from tokens import count_tokens
+
+# Prefix used by the Digital Transform team members in agent names
+DT_PREFIX = 'digital_transform_'
+DT_DIR = 'DigitalTransform'
+
+# Directories under the agents root that never contain a standalone agent
+EXCLUDE_DIRS = {'frontend', 'backend', 'PraisonAI', '.git', '.pytest_cache', '__pycache__', DT_DIR}
+
+MANIFEST_VERSION = 1
+
+
+def freeze(value: Any) -> Any:
+    """Recursively convert parsed JSON/YAML into read-only structures."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """Return a mutable deep copy of a frozen structure."""
+    if isinstance(value, Mapping):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def content_hash(config: Mapping[str, Any], instructions: str) -> str:
+    """Hash an agent's config and instructions independently of file layout."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(thaw(config), sort_keys=True).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update(instructions.encode('utf-8'))
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class AgentSpec:
+    """Immutable parsed configuration and instructions for one agent."""
+    name: str
+    config: Mapping[str, Any]
+    instructions: str
+    example_prompts: Tuple[str, ...]
+    prompt_tokens: int
+    content_hash: str
+    config_path: Path
+    prompt_path: Path
+    stamp: Tuple[Tuple[int, int], Tuple[int, int]]
+
+
+class AgentRegistry:
+    """Parses every agent once and revalidates it only when its files change."""
+
+    def __init__(self, agents_dir):
+        self.agents_dir = Path(agents_dir)
+        self._lock = threading.Lock()
+        self._specs: Dict[str, AgentSpec] = {}
+        self._files: Dict[Path, Tuple[Tuple[int, int], Any]] = {}
+        self._names: Optional[Tuple[Any, List[str]]] = None
+        self._manifest_names: Optional[List[str]] = None
+        self._failed: Dict[str, Any] = {}
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+        # Set to False while a watcher refreshes specs on file changes
+        self.validate = True
+
+    def resolve_paths(self, agent_name: str) -> Tuple[Path, Path]:
+        """Return the config and prompt paths for an agent name."""
+        if agent_name.startswith(DT_PREFIX):
+            agent_type = agent_name.split('_')[-1]
+            return (self.agents_dir / DT_DIR / 'agent_config.json',
+                    self.agents_dir / DT_DIR / 'prompts' / f"{agent_type.lower()}.yaml")
+        return (self.agents_dir / agent_name / 'agent_config.json',
+                self.agents_dir / agent_name / 'prompt.yaml')
+
+    @staticmethod
+    def _stamp(path: Path) -> Tuple[int, int]:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def _load_file(self, path: Path, stamp: Tuple[int, int]) -> Any:
+        """Parse a JSON or YAML file, sharing the result across agents."""
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        with open(path) as f:
+            data = json.load(f) if path.suffix == '.json' else yaml.safe_load(f)
+        data = freeze(data)
+        self._files[path] = (stamp, data)
+        return data
+
+    def _parse(self, agent_name: str, config_path: Path, prompt_path: Path,
+               stamp: Tuple[Tuple[int, int], Tuple[int, int]]) -> AgentSpec:
+        """Build a spec from the agent's files. Caller must hold the lock."""
+        config = self._load_file(config_path, stamp[0])
+        if agent_name.startswith(DT_PREFIX):
+            agent_type = agent_name.split('_')[-1].capitalize()
+            if agent_type not in config['agents']:
+                raise ValueError(f"Agent {agent_type} not found in Digital Transform team")
+            config = config['agents'][agent_type]
+        prompt = self._load_file(prompt_path, stamp[1])
+        instructions = prompt['instructions']
+
+        return AgentSpec(
+            name=agent_name,
+            config=config,
+            instructions=instructions,
+            example_prompts=tuple(prompt.get('example_prompts', ())),
+            prompt_tokens=count_tokens(instructions, config.get('model')),
+            content_hash=content_hash(config, instructions),
+            config_path=config_path,
+            prompt_path=prompt_path,
+            stamp=stamp
+        )
+
+    def get(self, agent_name: str) -> AgentSpec:
+        """Return the parsed spec for an agent, reparsing only on mtime change."""
+        if not self.validate:
+            # A watcher keeps cached specs fresh, so skip the stat calls
+            spec = self._specs.get(agent_name)
+            if spec is not None:
+                with self._lock:
+                    self._hits += 1
+                return spec
+
+        config_path, prompt_path = self.resolve_paths(agent_name)
+        try:
+            stamp = (self._stamp(config_path), self._stamp(prompt_path))
+        except FileNotFoundError:
+            # Manifest-only deployments ship without the source files
+            with self._lock:
+                spec = self._specs.get(agent_name)
+                if spec is not None:
+                    self._hits += 1
+                    return spec
+            raise FileNotFoundError(f"Configuration files not found for agent {agent_name}")
+
+        with self._lock:
+            spec = self._specs.get(agent_name)
+            if spec is not None and spec.stamp == stamp:
+                self._hits += 1
+                return spec
+            self._misses += 1
+            if spec is not None:
+                self._reloads += 1
+
+            spec = self._parse(agent_name, config_path, prompt_path, stamp)
+            self._specs = {**self._specs, agent_name: spec}
+            return spec
+
+    def refresh(self) -> List[str]:
+        """Reparse every cached agent whose files changed and swap them in at once.
+
+        Specs are immutable, so requests already holding the previous version
+        keep using it while new requests get the updated one.
+        """
+        with self._lock:
+            specs = dict(self._specs)
+            reloaded = []
+            for agent_name, spec in self._specs.items():
+                try:
+                    stamp = (self._stamp(spec.config_path), self._stamp(spec.prompt_path))
+                    if stamp == spec.stamp or self._failed.get(agent_name) == stamp:
+                        continue
+                    specs[agent_name] = self._parse(agent_name, spec.config_path, spec.prompt_path, stamp)
+                    self._failed.pop(agent_name, None)
+                    reloaded.append(agent_name)
+                except FileNotFoundError:
+                    continue
+                except Exception as e:
+                    # Keep serving the last good version, e.g. while a file is half-saved
+                    self._failed[agent_name] = stamp
+                    print(f"Warning: Failed to reload agent {agent_name} - {str(e)}")
+            self._reloads += len(reloaded)
+            self._specs = specs
+            self._names = None
+            if self._manifest_names is not None and self.agents_dir.is_dir():
+                self._manifest_names = self.discover()
+        return reloaded
+
+    def watched_paths(self) -> List[Path]:
+        """Return the config and prompt files backing the cached specs."""
+        specs = self._specs
+        return sorted({p for spec in specs.values() for p in (spec.config_path, spec.prompt_path)})
+
+    def discover(self) -> List[str]:
+        """Scan the agents directory for standalone and Digital Transform agents."""
+        agent_names = [d.name for d in self.agents_dir.iterdir()
+                       if d.is_dir()
+                       and not d.name.startswith('.')
+                       and d.name not in EXCLUDE_DIRS
+                       and (d / "agent_config.json").exists()]
+
+        dt_config_path = self.agents_dir / DT_DIR / 'agent_config.json'
+        if dt_config_path.exists():
+            dt_config = self._load_file(dt_config_path, self._stamp(dt_config_path))
+            agent_names.extend([f"{DT_PREFIX}{agent.lower()}"
+                                for agent in dt_config['agents'].keys()])
+
+        return sorted(agent_names)
+
+    def agent_names(self) -> List[str]:
+        """Return all agent names, from the manifest or a cached directory scan."""
+        if self._manifest_names is not None:
+            return list(self._manifest_names)
+
+        dt_config_path = self.agents_dir / DT_DIR / 'agent_config.json'
+        stamp = (self._stamp(self.agents_dir),
+                 self._stamp(dt_config_path) if dt_config_path.exists() else None)
+        names = self._names
+        if names is None or names[0] != stamp:
+            names = (stamp, self.discover())
+            self._names = names
+        return list(names[1])
+
+    def build_manifest(self) -> Dict[str, Any]:
+        """Compile every agent into a single serializable manifest."""
+        agents = {}
+        for agent_name in self.discover():
+            spec = self.get(agent_name)
+            agents[agent_name] = {
+                "config": thaw(spec.config),
+                "instructions": spec.instructions,
+                "example_prompts": list(spec.example_prompts),
+                "prompt_tokens": spec.prompt_tokens,
+                "content_hash": spec.content_hash,
+                "config_path": str(spec.config_path.relative_to(self.agents_dir)),
+                "prompt_path": str(spec.prompt_path.relative_to(self.agents_dir)),
+                "stamp": [list(s) for s in spec.stamp]
+            }
+        return {"version": MANIFEST_VERSION, "agents": agents}
+
+    def load_manifest(self, manifest_path) -> int:
+        """Seed the registry from a precompiled manifest in a single read."""
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version {manifest.get('version')}")
+
+        specs = {}
+        for agent_name, entry in manifest["agents"].items():
+            specs[agent_name] = AgentSpec(
+                name=agent_name,
+                config=freeze(entry["config"]),
+                instructions=entry["instructions"],
+                example_prompts=tuple(entry["example_prompts"]),
+                prompt_tokens=entry["prompt_tokens"],
+                content_hash=entry["content_hash"],
+                config_path=self.agents_dir / entry["config_path"],
+                prompt_path=self.agents_dir / entry["prompt_path"],
+                stamp=tuple(tuple(s) for s in entry["stamp"])
+            )
+
+        with self._lock:
+            self._specs = {**self._specs, **specs}
+            self._manifest_names = sorted(specs)
+        return len(specs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return cache hit/miss counters."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "reloads": self._reloads,
+                "cached_agents": len(self._specs),
+                "cached_files": len(self._files),
+                "from_manifest": self._manifest_names is not None,
+                "validate_on_get": self.validate
+            }
@@ -0,0 +1,188 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Set per request by CacheBypassMiddleware; read wherever the cache is consulted
+cache_bypass: contextvars.ContextVar = contextvars.ContextVar('cache_bypass', default=False)
+
+
+def cache_key(tenant: str, model: str, temperature: Optional[float], max_tokens: Optional[int],
+              messages: List[Dict[str, str]]) -> str:
+    """Hash everything that determines the completion, plus whose API key paid for it.
+
+    `tenant` is the hashed API key: one key's completions are never served to another.
+    """
+    payload = json.dumps([tenant, model, temperature, max_tokens, messages], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Exact-match completion cache: an in-memory LRU in front of a disk tier.
+
+    Entries expire after `ttl` seconds in both tiers. Disk entries are
+    one small JSON file each, sharded by the first two hex digits of
+    the key, so they survive restarts and are shared by every worker.
+    Disk reads run in a worker thread and disk writes are write-behind,
+    so the event loop never waits on the filesystem.
+    """
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 86400.0, directory: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = Path(directory) if directory else None
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple[str, float]]" = OrderedDict()
+        self._memory_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._bypassed = 0
+        self._stores = 0
+        # One writer thread keeps disk writes in order without blocking callers
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache") if directory else None
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, value: str, stored_at: float):
+        with self._lock:
+            self._memory[key] = (value, stored_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _read(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Warning: Failed to read cached response {key[:12]} - {str(e)}")
+            return None
+
+    def _write(self, key: str, value: str, stored_at: float):
+        path = self._path(key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump({"value": value, "stored_at": stored_at}, f)
+                os.replace(tmp_path, path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            print(f"Warning: Failed to write cached response {key[:12]} - {str(e)}")
+
+    async def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        """Return the cached completion, or None on a miss or bypass.
+
+        Pass `count_miss=False` for a lookup that falls through to another
+        one, so a single request isn't counted as two misses.
+        """
+        if cache_bypass.get():
+            with self._lock:
+                self._bypassed += 1
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[1] <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self._memory_hits += 1
+                    return entry[0]
+                del self._memory[key]
+
+        if self.directory is not None:
+            entry = await asyncio.to_thread(self._read, key)
+            if entry is not None and now - entry['stored_at'] <= self.ttl:
+                self._remember(key, entry['value'], entry['stored_at'])
+                with self._lock:
+                    self._disk_hits += 1
+                return entry['value']
+
+        if count_miss:
+            with self._lock:
+                self._misses += 1
+        return None
+
+    def set(self, key: str, value: str):
+        """Store a completion in memory now and on disk in the background."""
+        stored_at = time.time()
+        self._remember(key, value, stored_at)
+        with self._lock:
+            self._stores += 1
+        if self._writer is not None:
+            self._writer.submit(self._write, key, value, stored_at)
+
+    async def close(self):
+        """Wait for pending disk writes."""
+        if self._writer is not None:
+            await asyncio.to_thread(self._writer.shutdown, wait=True)
+
+    def prune(self) -> int:
+        """Delete expired disk entries."""
+        if self.directory is None or not self.directory.exists():
+            return 0
+        cutoff = time.time() - self.ttl
+        removed = 0
+        for path in self.directory.glob('*/*.json'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Return per-tier hit counts and occupancy."""
+        with self._lock:
+            lookups = self._memory_hits + self._disk_hits + self._misses
+            return {
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "memory_hits": self._memory_hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "hit_ratio": round((self._memory_hits + self._disk_hits) / lookups, 3) if lookups else None,
+                "bypassed": self._bypassed,
+                "stores": self._stores
+            }
+
+
+class CacheBypassMiddleware:
+    """ASGI middleware: `X-Cache-Bypass: 1` or `Cache-Control: no-cache` skips cache reads.
+
+    Fresh results are still stored, so a bypass also refreshes the entry.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        bypass = (
+            headers.get(b"x-cache-bypass", b"").lower() in (b"1", b"true", b"yes")
+            or b"no-cache" in headers.get(b"cache-control", b"").lower()
+        )
+        token = cache_bypass.set(bypass)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            cache_bypass.reset(token)
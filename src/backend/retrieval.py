@@ -0,0 +1,219 @@
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter, OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional
+
+from budget import trim
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the their this to was were will with
+""".split())
+
+GROUNDING_NOTE = (
+    "A similar earlier request was answered as follows (excerpt). Reuse what still applies, "
+    "adapt the rest, and skip generic boilerplate:"
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS and len(token) > 1]
+
+
+class BM25Index:
+    """In-process BM25 full-text index over past analyses and pipeline artifacts.
+
+    Each document is the text that was asked about (e.g. a step prompt),
+    stored with metadata such as the agent, step, tenant and the output
+    that was produced for it. search() ranks documents against a query
+    and reports a similarity in [0, 1]: the score relative to the query's
+    score against itself, scaled down by any length mismatch so a long
+    document that merely contains the query doesn't look identical to it.
+    Thresholds therefore don't depend on corpus size. The index holds at
+    most `max_documents`, dropping the oldest, and can be snapshotted to a
+    JSON file; nothing leaves the process.
+    """
+
+    def __init__(self, max_documents: int = 5000, k1: float = 1.5, b: float = 0.75):
+        self.max_documents = max_documents
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        # doc id -> (text, metadata, term counts, length); insertion order = age
+        self._documents: "OrderedDict[str, tuple[str, Dict[str, Any], Counter, int]]" = OrderedDict()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._searches = 0
+        self._hits = 0
+
+    def _remove(self, doc_id: str):
+        _, _, counts, length = self._documents.pop(doc_id)
+        for term in counts:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+        self._total_length -= length
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None):
+        """Index `text` under `doc_id`, replacing any earlier version."""
+        counts = Counter(tokenize(text))
+        length = sum(counts.values())
+        with self._lock:
+            if doc_id in self._documents:
+                self._remove(doc_id)
+            self._documents[doc_id] = (text, dict(metadata or {}), counts, length)
+            for term, count in counts.items():
+                self._postings.setdefault(term, {})[doc_id] = count
+            self._total_length += length
+            while len(self._documents) > self.max_documents:
+                self._remove(next(iter(self._documents)))
+
+    def _idf(self, term: str) -> float:
+        df = len(self._postings.get(term, ()))
+        n = len(self._documents)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _term_score(self, idf: float, tf: int, length: int, avgdl: float) -> float:
+        return idf * tf * (self.k1 + 1) / (tf + self.k1 * (1 - self.b + self.b * length / avgdl))
+
+    @staticmethod
+    def _similarity(score: float, best_possible: float, query_length: int, length: int) -> float:
+        if not best_possible or not length:
+            return 0.0
+        return round(min(1.0, score / best_possible) * min(query_length, length) / max(query_length, length), 3)
+
+    def search(self, query: str, k: int = 3, where: Optional[Mapping[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Return the top `k` documents whose metadata matches every `where` field."""
+        query_counts = Counter(tokenize(query))
+        if not query_counts:
+            return []
+        with self._lock:
+            self._searches += 1
+            if not self._documents:
+                return []
+            avgdl = self._total_length / len(self._documents) or 1.0
+            query_length = sum(query_counts.values())
+            scores: Dict[str, float] = {}
+            best_possible = 0.0
+            for term, query_tf in query_counts.items():
+                idf = self._idf(term)
+                # The query scored against itself, the ceiling for the normalized similarity
+                best_possible += self._term_score(idf, query_tf, query_length, avgdl)
+                for doc_id, tf in self._postings.get(term, {}).items():
+                    metadata = self._documents[doc_id][1]
+                    if where and any(metadata.get(key) != value for key, value in where.items()):
+                        continue
+                    scores[doc_id] = scores.get(doc_id, 0.0) + self._term_score(
+                        idf, tf, self._documents[doc_id][3], avgdl
+                    )
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            if ranked:
+                self._hits += 1
+            return [
+                {
+                    "id": doc_id,
+                    "score": round(score, 3),
+                    "similarity": self._similarity(score, best_possible, query_length, self._documents[doc_id][3]),
+                    "text": self._documents[doc_id][0],
+                    "metadata": dict(self._documents[doc_id][1])
+                }
+                for doc_id, score in ranked
+            ]
+
+    def closest(self, query: str, min_similarity: float,
+                where: Optional[Mapping[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Return the best match for `query` if its similarity reaches `min_similarity`."""
+        hits = self.search(query, k=1, where=where)
+        return hits[0] if hits and hits[0]["similarity"] >= min_similarity else None
+
+    def save(self, path: str):
+        """Write every document to a JSON snapshot, atomically."""
+        with self._lock:
+            documents = [
+                {"id": doc_id, "text": text, "metadata": metadata}
+                for doc_id, (text, metadata, _, _) in self._documents.items()
+            ]
+        directory = Path(path).resolve().parent
+        directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(documents, f)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def load(self, path: str) -> int:
+        """Rebuild the index from a snapshot; returns the number of documents loaded."""
+        try:
+            with open(path, 'r') as f:
+                documents = json.load(f)
+        except FileNotFoundError:
+            return 0
+        for document in documents:
+            self.add(document["id"], document["text"], document["metadata"])
+        return len(documents)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return index size and search counts."""
+        with self._lock:
+            return {
+                "documents": len(self._documents),
+                "max_documents": self.max_documents,
+                "terms": len(self._postings),
+                "avg_document_tokens": round(self._total_length / len(self._documents)) if self._documents else 0,
+                "searches": self._searches,
+                "searches_with_results": self._hits
+            }
+
+
+def grounded_prompt(prompt: str, earlier_output: str, max_tokens: int, model: Optional[str] = None) -> str:
+    """Append an excerpt of an earlier output to `prompt` as a reference, never as the answer.
+
+    BM25 can't tell "we use a CRM" from "we don't use a CRM", so however
+    similar the earlier request looks, its output is only ever context.
+    """
+    return f"{prompt}\n\n{GROUNDING_NOTE}\n{trim(earlier_output, max_tokens, model)}"
+
+
+def grounding_source(index: BM25Index, prompt: str, min_similarity: float,
+                     where: Optional[Mapping[str, Any]] = None, own_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Return the earlier result to ground `prompt` on, or None.
+
+    The prompt's own earlier run (`own_id`, or any document with exactly
+    the same text) never counts: grounding an exact repeat on itself would
+    change the prompt and so defeat the response cache.
+    """
+    for hit in index.search(prompt, k=3, where=where):
+        if hit["similarity"] < min_similarity:
+            break
+        if hit["id"] != own_id and hit["text"] != prompt:
+            return hit
+    return None
+
+
+class GroundingStats:
+    """How often a retrieved earlier result grounded a pipeline step, per agent step."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._steps: Dict[str, Dict[str, int]] = {}
+
+    def record(self, step: str, grounded: bool):
+        with self._lock:
+            entry = self._steps.setdefault(step, {"generated": 0, "grounded": 0})
+            entry["grounded" if grounded else "generated"] += 1
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {step: dict(entry) for step, entry in self._steps.items()}
+
+
+grounding_stats = GroundingStats()
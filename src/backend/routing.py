@@ -0,0 +1,206 @@
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Mapping, Optional, Tuple
+
+from tokens import count_tokens
+
+# (output, validator argument, model) -> rejection reason, or None to accept
+Validator = Callable[[str, Any, str], Optional[str]]
+
+REFUSALS = re.compile(r"\b(I'?m sorry|I cannot|I can'?t help|as an AI( language model)?)\b", re.IGNORECASE)
+
+
+def _min_tokens(output: str, minimum: int, model: str) -> Optional[str]:
+    size = count_tokens(output, model)
+    return f"{size} tokens < {minimum}" if size < minimum else None
+
+
+def _required(output: str, terms: Any, model: str) -> Optional[str]:
+    terms = (terms,) if isinstance(terms, str) else terms
+    missing = [term for term in terms if term.lower() not in output.lower()]
+    return f"missing {', '.join(missing)}" if missing else None
+
+
+def _no_refusal(output: str, enabled: bool, model: str) -> Optional[str]:
+    return "refused" if enabled and REFUSALS.search(output) else None
+
+
+def _json(output: str, enabled: bool, model: str) -> Optional[str]:
+    if not enabled:
+        return None
+    body = re.sub(r'^```(?:json)?\s*|\s*```$', '', output.strip())
+    try:
+        json.loads(body)
+    except ValueError:
+        return "not valid JSON"
+    return None
+
+
+def _min_items(output: str, minimum: int, model: str) -> Optional[str]:
+    items = len(re.findall(r'^\s*(?:[-*•]|\d+[.)])\s+', output, re.MULTILINE))
+    return f"{items} list items < {minimum}" if items < minimum else None
+
+
+# Validator name in agent_config.json -> check
+VALIDATORS: Dict[str, Validator] = {
+    "min_tokens": _min_tokens,
+    "required": _required,
+    "no_refusal": _no_refusal,
+    "json": _json,
+    "min_items": _min_items
+}
+
+
+@dataclass(frozen=True)
+class Cascade:
+    """Models to try in order, cheapest first, and the checks an answer must pass.
+
+    The last model's answer is always accepted, so a cascade never does
+    worse than calling the large model directly.
+    """
+    name: str
+    models: Tuple[str, ...]
+    validators: Tuple[Tuple[str, Any], ...] = ()
+
+    def __post_init__(self):
+        if not self.models:
+            raise ValueError(f"Cascade {self.name} has no models")
+        unknown = [name for name, _ in self.validators if name not in VALIDATORS]
+        if unknown:
+            raise ValueError(f"Cascade {self.name} has unknown validators: {', '.join(unknown)}")
+
+    def validate(self, output: str, model: str) -> List[str]:
+        """Return every reason the output is rejected; empty means accepted."""
+        if not output or not output.strip():
+            return ["empty"]
+        reasons = []
+        for name, argument in self.validators:
+            reason = VALIDATORS[name](output, argument, model)
+            if reason:
+                reasons.append(f"{name}: {reason}")
+        return reasons
+
+    async def run(self, call: Callable[[str], Awaitable[str]]) -> str:
+        """Call each model until one produces an accepted answer."""
+        started = time.perf_counter()
+        attempts = []
+        for tier, model in enumerate(self.models):
+            last = tier == len(self.models) - 1
+            attempt_started = time.perf_counter()
+            try:
+                output = await call(model)
+                reasons = [] if last else self.validate(output, model)
+            except Exception as e:
+                # A failing cheap model escalates; the last one fails the call
+                if last:
+                    route_stats.record(self.name, attempts + [{"model": model, "error": str(e)}], None, started)
+                    raise
+                output, reasons = None, [f"error: {str(e)}"]
+            attempts.append({
+                "model": model,
+                "latency_ms": round((time.perf_counter() - attempt_started) * 1000, 1),
+                "rejected": reasons
+            })
+            if not reasons:
+                route_stats.record(self.name, attempts, model, started)
+                return output
+
+
+def parse_cascade(name: str, config: Optional[Mapping[str, Any]], default_model: Optional[str]) -> Optional[Cascade]:
+    """Build a cascade from {"models": [...], "validators": {...}}; the default model ends it."""
+    if not config:
+        return None
+    models = list(config.get("models") or ())
+    if default_model and default_model not in models:
+        models.append(default_model)
+    validators = tuple((key, value) for key, value in (config.get("validators") or {}).items())
+    return Cascade(name, tuple(models), validators)
+
+
+class RouteStats:
+    """Where each cascade's answers came from, why cheaper tiers were rejected, and recent decisions."""
+
+    def __init__(self, history: int = 100, log_path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._cascades: Dict[str, Dict[str, Any]] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+        # Optional JSON-lines file of every decision, for offline tuning
+        self.log_path = log_path
+        self._writer: Optional[ThreadPoolExecutor] = None
+
+    def _append(self, path: str, line: str):
+        try:
+            with open(path, 'a') as f:
+                f.write(line)
+        except Exception as e:
+            print(f"Warning: Failed to log route decision - {str(e)}")
+
+    def record(self, cascade: str, attempts: List[Dict[str, Any]], accepted: Optional[str], started: float):
+        decision = {
+            "cascade": cascade,
+            "accepted": accepted,
+            "escalations": len(attempts) - 1,
+            "attempts": attempts,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+            "at": time.time()
+        }
+        with self._lock:
+            entry = self._cascades.setdefault(cascade, {
+                "calls": 0, "first_try": 0, "failed": 0, "accepted_by": {}, "rejections": {}
+            })
+            entry["calls"] += 1
+            if accepted is None:
+                entry["failed"] += 1
+            else:
+                entry["accepted_by"][accepted] = entry["accepted_by"].get(accepted, 0) + 1
+                if len(attempts) == 1:
+                    entry["first_try"] += 1
+            for attempt in attempts:
+                for reason in attempt.get("rejected") or ():
+                    # Count by validator, not by the exact measurement
+                    kind = reason.split(":", 1)[0]
+                    entry["rejections"][kind] = entry["rejections"].get(kind, 0) + 1
+            self._recent.append(decision)
+        if self.log_path:
+            # Appended by one background thread, in decision order, off the event loop
+            with self._lock:
+                if self._writer is None:
+                    self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="route-log")
+            self._writer.submit(self._append, self.log_path, json.dumps(decision) + "\n")
+
+        route = " -> ".join(
+            f"{a['model']}" + (f" (rejected: {'; '.join(a['rejected'])})" if a.get('rejected') else "")
+            for a in attempts
+        )
+        print(f"Route {cascade}: {route} [{decision['elapsed_ms']} ms]")
+
+    async def close(self):
+        """Wait for pending log appends."""
+        if self._writer is not None:
+            await asyncio.to_thread(self._writer.shutdown, wait=True)
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """Return the latest route decisions, oldest first."""
+        with self._lock:
+            return list(self._recent)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                cascade: {
+                    **entry,
+                    "accepted_by": dict(entry["accepted_by"]),
+                    "rejections": dict(entry["rejections"]),
+                    "escalation_rate": round(1 - entry["first_try"] / entry["calls"], 3) if entry["calls"] else None
+                }
+                for cascade, entry in self._cascades.items()
+            }
+
+
+route_stats = RouteStats()
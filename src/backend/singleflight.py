@@ -0,0 +1,125 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+
+class _Flight:
+    """One in-flight call and the number of requests waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _StreamFlight:
+    """One in-flight stream: every chunk so far plus a wake-up for subscribers."""
+
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._event = asyncio.Event()
+
+    def notify(self):
+        event, self._event = self._event, asyncio.Event()
+        event.set()
+
+    async def wait(self):
+        await self._event.wait()
+
+
+class SingleFlight:
+    """Share one upstream call between concurrent requests with the same key.
+
+    The call runs in its own task, so the request that started it can go
+    away without failing the others; it is only cancelled once nobody is
+    waiting on it any more.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self._leaders = 0
+        self._coalesced = 0
+        self._stream_leaders = 0
+        self._stream_coalesced = 0
+
+    def _forget(self, registry: Dict[str, Any], key: str, flight: Any):
+        if registry.get(key) is flight:
+            del registry[key]
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the call for `key`, starting it with `factory` if none is in flight."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._flights, key, flight))
+            self._leaders += 1
+        else:
+            self._coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(self._flights, key, flight)
+                flight.task.cancel()
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """Yield the stream for `key`; late joiners replay what was already produced."""
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            flight.task = asyncio.ensure_future(self._pump(key, flight, factory))
+            self._stream_leaders += 1
+        else:
+            self._stream_coalesced += 1
+
+        flight.subscribers += 1
+        position = 0
+        try:
+            while True:
+                if position < len(flight.chunks):
+                    chunk = flight.chunks[position]
+                    position += 1
+                    yield chunk
+                    continue
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                # Everyone disconnected: stop generating tokens nobody will read
+                self._forget(self._streams, key, flight)
+                flight.task.cancel()
+
+    async def _pump(self, key: str, flight: _StreamFlight, factory: Callable[[], AsyncIterator[Any]]):
+        try:
+            async for chunk in factory():
+                flight.chunks.append(chunk)
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(self._streams, key, flight)
+            flight.notify()
+
+    def stats(self) -> Dict[str, int]:
+        """Return in-flight counts and how many requests shared a call."""
+        return {
+            "in_flight": len(self._flights),
+            "streams_in_flight": len(self._streams),
+            "leaders": self._leaders,
+            "coalesced": self._coalesced,
+            "stream_leaders": self._stream_leaders,
+            "stream_coalesced": self._stream_coalesced
+        }
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+# Event types sent to clients
+TOKEN = "token"
+STAGE = "stage"
+DONE = "done"
+ERROR = "error"
+
+# SSE comment line: ignored by EventSource but keeps proxies from timing out
+HEARTBEAT = ": keep-alive\n\n"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    # Stop nginx-style proxies from buffering the stream
+    "X-Accel-Buffering": "no",
+    # Marks the body as already encoded so GZipMiddleware doesn't buffer it
+    "Content-Encoding": "identity"
+}
+
+
+def format_event(event: str, data: Any) -> str:
+    """Frame one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def event_stream(request: Request, events: AsyncIterator[Tuple[str, Any]],
+                       heartbeat_interval: float = 15.0) -> AsyncIterator[str]:
+    """Frame (event, data) pairs as SSE with heartbeats.
+
+    Ends with a `done` event, or an `error` event if the source raises. When
+    the client disconnects the source is cancelled and closed, which aborts
+    the upstream LLM call instead of generating tokens nobody will read.
+    """
+    started = time.perf_counter()
+    iterator = events.__aiter__()
+    pending = None
+    count = 0
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=heartbeat_interval)
+            if await request.is_disconnected():
+                print("Client disconnected, cancelling stream")
+                return
+            if not done:
+                yield HEARTBEAT
+                continue
+
+            task, pending = pending, None
+            try:
+                event, data = task.result()
+            except StopAsyncIteration:
+                break
+            except Exception as e:
+                print(f"Error in event stream: {str(e)}")
+                error = {"message": getattr(e, "detail", None) or str(e)}
+                # Overload (503) after the stream began: pass on when to retry
+                retry_after = (getattr(e, "headers", None) or {}).get("Retry-After")
+                if retry_after:
+                    error["retry_after"] = int(retry_after)
+                yield format_event(ERROR, error)
+                return
+            count += 1
+            yield format_event(event, data)
+
+        yield format_event(DONE, {
+            "events": count,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+    finally:
+        if pending is not None:
+            pending.cancel()
+            await asyncio.wait({pending})
+        aclose = getattr(iterator, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def sse_response(request: Request, events: AsyncIterator[Tuple[str, Any]],
+                 heartbeat_interval: float = 15.0, headers: Dict[str, str] = None) -> StreamingResponse:
+    """Build a text/event-stream response for a source of (event, data) pairs."""
+    return StreamingResponse(
+        event_stream(request, events, heartbeat_interval),
+        media_type="text/event-stream",
+        headers={**SSE_HEADERS, **(headers or {})}
+    )
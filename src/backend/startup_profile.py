@@ -0,0 +1,92 @@
+import importlib
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Reference point for time-to-ready; this module is imported first by main.py
+PROCESS_START = time.perf_counter()
+
+
+class StartupProfiler:
+    """Records how long each import and global construction takes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases: List[Dict[str, Any]] = []
+        self.ready_at: Optional[float] = None
+
+    def record(self, name: str, category: str, started: float, duration: float):
+        with self._lock:
+            self.phases.append({
+                "name": name,
+                "category": category,
+                "started_ms": round((started - PROCESS_START) * 1000, 2),
+                "duration_ms": round(duration * 1000, 2)
+            })
+
+    @contextmanager
+    def phase(self, name: str, category: str = "import"):
+        """Time a block of startup work."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, category, started, time.perf_counter() - started)
+
+    def mark_ready(self):
+        """Record the moment the server can accept its first request."""
+        if self.ready_at is None:
+            self.ready_at = time.perf_counter()
+
+    def report(self) -> Dict[str, Any]:
+        """Return the startup breakdown, slowest phases first."""
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p["duration_ms"], reverse=True)
+        totals: Dict[str, float] = {}
+        for p in phases:
+            totals[p["category"]] = round(totals.get(p["category"], 0) + p["duration_ms"], 2)
+        return {
+            "time_to_ready_ms": round((self.ready_at - PROCESS_START) * 1000, 2) if self.ready_at else None,
+            "totals_ms": totals,
+            "phases": phases
+        }
+
+    def format_report(self) -> str:
+        """Render the report as a plain-text table for the CLI."""
+        report = self.report()
+        lines = [f"Time to ready: {report['time_to_ready_ms']} ms"]
+        for category, total in report["totals_ms"].items():
+            lines.append(f"  {category:<12} {total:>10.2f} ms")
+        lines.append("")
+        for p in report["phases"]:
+            lines.append(f"  {p['duration_ms']:>10.2f} ms  [{p['category']}] {p['name']}")
+        return "\n".join(lines)
+
+
+startup_profiler = StartupProfiler()
+
+
+class LazyModule:
+    """Module proxy that defers the import until an attribute is first used."""
+
+    def __init__(self, name: str, profiler: StartupProfiler = startup_profiler):
+        self._name = name
+        self._profiler = profiler
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    with self._profiler.phase(self._name, "lazy_import"):
+                        self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<LazyModule {self._name} ({state})>"
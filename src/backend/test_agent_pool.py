@@ -0,0 +1,129 @@
+import pytest
+
+from agent_pool import AgentPool, hash_api_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeAgent:
+    def __init__(self, name):
+        self.name = name
+        self.chat_history = []
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("agent_pool.time.monotonic", clock)
+    return clock
+
+
+def borrow(pool, key, built):
+    """Check out and return one instance, recording any instance the factory had to build."""
+    def factory():
+        built.append(FakeAgent(f"agent{len(built)}"))
+        return built[-1]
+    with pool.checkout(key, factory) as agent:
+        return agent
+
+
+def test_returned_instance_is_reused_with_a_clean_history():
+    pool, built = AgentPool(), []
+    key = AgentPool.make_key("analyst", "k1", model="m")
+    agent = borrow(pool, key, built)
+    agent.chat_history.append({"role": "user", "content": "secret"})
+    with pool.checkout(key, lambda: FakeAgent("unused")) as again:
+        pass
+
+    assert again is agent
+    assert agent.chat_history == []
+    assert len(built) == 1
+    assert (pool.stats()["hits"], pool.stats()["misses"]) == (1, 1)
+
+
+def test_keys_never_share_instances():
+    """Instances are isolated per agent, API key and model params."""
+    pool, built = AgentPool(), []
+    keys = [
+        AgentPool.make_key("analyst", "k1", model="m"),
+        AgentPool.make_key("analyst", "k2", model="m"),
+        AgentPool.make_key("analyst", "k1", model="other"),
+        AgentPool.make_key("architect", "k1", model="m")
+    ]
+    agents = [borrow(pool, key, built) for key in keys]
+    assert len({id(agent) for agent in agents}) == 4
+    assert pool.stats()["keys"] == 4
+    # The raw API key never appears in a pool key
+    assert "k1" not in keys[0] and hash_api_key("k1") in keys[0]
+
+
+def test_concurrent_checkouts_get_separate_instances():
+    pool = AgentPool()
+    key = AgentPool.make_key("analyst", "k1")
+    with pool.checkout(key, lambda: FakeAgent("a")) as first:
+        with pool.checkout(key, lambda: FakeAgent("b")) as second:
+            assert first is not second
+            assert pool.stats()["in_use"] == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_idle_instances_expire_after_the_ttl(clock):
+    pool, built = AgentPool(ttl=60), []
+    key = AgentPool.make_key("analyst", "k1")
+    first = borrow(pool, key, built)
+
+    clock.now += 61
+    assert borrow(pool, key, built) is not first
+    assert pool.stats()["expirations"] == 1
+
+    clock.now += 61
+    assert pool.prune() == 1
+    assert pool.stats()["idle"] == 0
+
+
+def test_least_recently_returned_key_is_evicted_first():
+    pool, built = AgentPool(max_size=2), []
+    keys = [AgentPool.make_key(name, "k1") for name in ("a", "b", "c")]
+    first = borrow(pool, keys[0], built)
+    borrow(pool, keys[1], built)
+    # Reusing "a" makes it the most recently returned
+    assert borrow(pool, keys[0], built) is first
+    borrow(pool, keys[2], built)
+
+    stats = pool.stats()
+    assert (stats["idle"], stats["evictions"]) == (2, 1)
+    assert borrow(pool, keys[0], built) is first
+    assert len(built) == 3
+    borrow(pool, keys[1], built)
+    assert len(built) == 4
+
+
+def test_instance_is_discarded_after_a_failed_call():
+    pool, built = AgentPool(), []
+    key = AgentPool.make_key("analyst", "k1")
+    with pytest.raises(RuntimeError):
+        with pool.checkout(key, lambda: FakeAgent("broken")):
+            raise RuntimeError("call failed")
+
+    stats = pool.stats()
+    assert (stats["idle"], stats["in_use"]) == (0, 0)
+    assert borrow(pool, key, built).name == "agent0"
+
+
+def test_factory_failure_releases_the_slot():
+    pool = AgentPool()
+    key = AgentPool.make_key("analyst", "k1")
+
+    def factory():
+        raise ValueError("bad config")
+
+    with pytest.raises(ValueError):
+        with pool.checkout(key, factory):
+            pass
+    assert pool.stats()["in_use"] == 0
@@ -0,0 +1,94 @@
+import pytest
+
+from budget import TRIM_MARKER, allocate, fit_artifacts, trim
+from tokens import count_tokens
+
+
+def paragraphs(count, words=30):
+    return "\n\n".join(" ".join(f"p{i}w{j}" for j in range(words)) for i in range(count))
+
+
+def test_allocate_keeps_everything_that_fits():
+    assert allocate({"a": 10, "b": 20}, 100) == {"a": 10, "b": 20}
+
+
+def test_allocate_shrinks_the_largest_first():
+    """Small artifacts keep their size; the rest share what is left evenly."""
+    allocation = allocate({"small": 10, "big": 500, "bigger": 900}, 210)
+    assert allocation == {"small": 10, "big": 100, "bigger": 100}
+
+
+def test_allocate_frees_share_from_artifacts_that_become_small():
+    """Once one artifact fits the even share, its leftover is shared by the others."""
+    allocation = allocate({"a": 40, "b": 70, "c": 1000}, 150)
+    assert allocation == {"a": 40, "b": 55, "c": 55}
+    assert sum(allocation.values()) <= 150
+
+
+@pytest.mark.parametrize("available", [0, -50])
+def test_allocate_with_no_room(available):
+    assert allocate({"a": 10, "b": 20}, available) == {"a": 0, "b": 0}
+
+
+def test_allocate_nothing_to_allocate():
+    assert allocate({}, 100) == {}
+
+
+def test_trim_leaves_short_text_alone():
+    text = paragraphs(2)
+    assert trim(text, count_tokens(text)) == text
+
+
+def test_trim_keeps_leading_paragraphs_within_budget():
+    text = paragraphs(10)
+    budget = count_tokens(text) // 3
+    trimmed = trim(text, budget)
+
+    assert count_tokens(trimmed) <= budget
+    assert trimmed.startswith(text.split("\n\n")[0])
+    assert "p9w0" not in trimmed
+    assert "tokens trimmed to fit the prompt budget" in trimmed
+
+
+def test_trim_cuts_a_single_oversized_paragraph():
+    """When not even the first paragraph fits, it is cut down rather than dropped."""
+    text = paragraphs(1, words=400)
+    budget = 60
+    trimmed = trim(text, budget)
+
+    assert count_tokens(trimmed) <= budget
+    assert trimmed.startswith("p0w0 p0w1")
+
+
+def test_trim_with_no_room_leaves_only_the_marker():
+    # The marker is kept even though it exceeds a zero budget, so the model knows text was dropped
+    trimmed = trim(paragraphs(3), 0)
+    assert trimmed == TRIM_MARKER.format(omitted=count_tokens(paragraphs(3)))
+
+
+@pytest.mark.asyncio
+async def test_fit_artifacts_is_a_no_op_under_budget():
+    artifacts = {"a": paragraphs(1), "b": paragraphs(1)}
+    assert await fit_artifacts(artifacts, 10, 10_000, "test.under") is artifacts
+
+
+@pytest.mark.asyncio
+async def test_fit_artifacts_trims_to_the_budget():
+    artifacts = {"short": "brief note", "long": paragraphs(40)}
+    fitted = await fit_artifacts(artifacts, fixed_tokens=100, budget=500, stage="test.trim")
+
+    assert fitted["short"] == "brief note"
+    assert 100 + sum(count_tokens(text) for text in fitted.values()) <= 500
+
+
+@pytest.mark.asyncio
+async def test_fit_artifacts_falls_back_to_trimming_when_summarizing_fails():
+    calls = []
+
+    async def summarize(text, limit):
+        calls.append(limit)
+        raise RuntimeError("summarizer down")
+
+    fitted = await fit_artifacts({"long": paragraphs(40)}, 0, 200, "test.fallback", summarize=summarize)
+    assert calls == [200]
+    assert count_tokens(fitted["long"]) <= 200
@@ -0,0 +1,137 @@
+import asyncio
+
+import pytest
+
+from chat_history import SUMMARY_PREFIX, ChatSessions
+from memory_store import MemoryStore
+from tokens import count_tokens
+
+# Roughly ten tokens per message
+MESSAGE_TOKENS = count_tokens("turn 0 " + "word " * 8)
+
+
+def message(n):
+    return f"turn {n} " + "word " * 8
+
+
+def sessions(window_turns=3, fold_turns=2):
+    """Sessions whose window holds `window_turns` messages and folds `fold_turns` messages beyond it."""
+    return ChatSessions(MemoryStore(lambda: None), window_tokens=window_turns * MESSAGE_TOKENS,
+                        fold_tokens=fold_turns * MESSAGE_TOKENS)
+
+
+def exchange(chat, state, n, summarize, tenant="t1", session_id="s1"):
+    chat.append("agent", tenant, session_id, state, message(n), message(n + 1), summarize)
+
+
+async def never_called(summary, turns):
+    raise AssertionError("summarize should not run")
+
+
+@pytest.mark.asyncio
+async def test_new_session_starts_empty():
+    chat = sessions()
+    state = await chat.load("agent", "t1", "s1")
+    assert state == {"summary": "", "turns": [], "next_turn": 0}
+    assert chat.window(state) == []
+
+
+@pytest.mark.asyncio
+async def test_window_keeps_the_newest_turns_that_fit_in_order():
+    chat = sessions(window_turns=3, fold_turns=10)
+    state = await chat.load("agent", "t1", "s1")
+    for n in range(0, 6, 2):
+        exchange(chat, state, n, never_called)
+    state["summary"] = "earlier"
+
+    messages = chat.window(state)
+    assert messages[0] == {"role": "system", "content": SUMMARY_PREFIX + "earlier"}
+    assert [m["content"] for m in messages[1:]] == [message(3), message(4), message(5)]
+    assert [m["role"] for m in messages[1:]] == ["assistant", "user", "assistant"]
+
+
+@pytest.mark.asyncio
+async def test_sessions_are_scoped_to_the_tenant():
+    chat = sessions(window_turns=10)
+    state = await chat.load("agent", "t1", "shared-id")
+    exchange(chat, state, 0, never_called, tenant="t1", session_id="shared-id")
+
+    assert len((await chat.load("agent", "t1", "shared-id"))["turns"]) == 2
+    assert (await chat.load("agent", "t2", "shared-id"))["turns"] == []
+
+
+@pytest.mark.asyncio
+async def test_overflow_is_folded_into_the_summary():
+    chat, folded = sessions(window_turns=3, fold_turns=2), []
+
+    async def summarize(summary, turns):
+        folded.append([turn["content"] for turn in turns])
+        return summary + f"[{len(turns)} turns]"
+
+    state = await chat.load("agent", "t1", "s1")
+    for n in range(0, 4, 2):
+        exchange(chat, state, n, summarize)
+    await asyncio.sleep(0)
+    assert folded == []
+
+    # Six messages outgrow the window plus the fold margin of five
+    exchange(chat, state, 4, summarize)
+    await chat.close()
+
+    assert folded == [[message(n) for n in range(3)]]
+    state = await chat.load("agent", "t1", "s1")
+    assert state["summary"] == "[3 turns]"
+    assert [turn["n"] for turn in state["turns"]] == [3, 4, 5]
+    assert chat.stats()["folds"] == 1
+    assert chat.stats()["turns_folded"] == 3
+
+
+@pytest.mark.asyncio
+async def test_turns_added_while_folding_are_kept():
+    chat, release = sessions(window_turns=3, fold_turns=2), asyncio.Event()
+
+    async def summarize(summary, turns):
+        await release.wait()
+        return "summary"
+
+    state = await chat.load("agent", "t1", "s1")
+    for n in range(0, 8, 2):
+        exchange(chat, state, n, summarize)
+    await asyncio.sleep(0)
+    # Arrives mid-fold: must survive the folded state being written back
+    exchange(chat, state, 8, summarize)
+    assert chat.stats()["folding"] == 1
+    release.set()
+    await chat.close()
+
+    state = await chat.load("agent", "t1", "s1")
+    assert state["summary"] == "summary"
+    assert [turn["n"] for turn in state["turns"]] == [5, 6, 7, 8, 9]
+
+
+@pytest.mark.asyncio
+async def test_failed_fold_keeps_the_turns_and_retries():
+    chat, attempts = sessions(window_turns=3, fold_turns=2), []
+
+    async def summarize(summary, turns):
+        attempts.append(len(turns))
+        if len(attempts) == 1:
+            raise RuntimeError("summarizer down")
+        return "summary"
+
+    state = await chat.load("agent", "t1", "s1")
+    for n in range(0, 8, 2):
+        exchange(chat, state, n, summarize)
+    await chat.close()
+
+    state = await chat.load("agent", "t1", "s1")
+    assert state["summary"] == "" and len(state["turns"]) == 8
+    assert chat.stats()["fold_errors"] == 1
+    # The window still bounds the prompt while the summary is behind
+    assert len(chat.window(state)) == 3
+
+    exchange(chat, state, 8, summarize)
+    await chat.close()
+    state = await chat.load("agent", "t1", "s1")
+    assert state["summary"] == "summary"
+    assert len(attempts) == 2
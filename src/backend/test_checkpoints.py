@@ -0,0 +1,117 @@
+import json
+
+import pytest
+import pytest_asyncio
+
+from checkpoints import CheckpointStore, RunInProgress
+
+STAGES = ("analyst", "architect", "designer")
+
+
+@pytest_asyncio.fixture
+async def store(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    yield store
+    await store.close()
+
+
+async def run_stages(store, checkpoint, calls, fail_at=None):
+    """Run the stages not completed yet, the way a team run does, failing at `fail_at`."""
+    with store.claim(checkpoint, resumed=bool(checkpoint["stages"])):
+        for stage in STAGES:
+            if stage in checkpoint["stages"]:
+                store.reuse_stage()
+                continue
+            calls.append(stage)
+            if stage == fail_at:
+                store.fail(checkpoint, stage, "llm down")
+                raise RuntimeError("llm down")
+            store.complete_stage(checkpoint, stage, f"{stage} output", 1.0)
+        store.finish(checkpoint)
+
+
+@pytest.mark.asyncio
+async def test_checkpoint_reads_back_as_last_saved(store):
+    checkpoint = store.create({"name": "Acme"}, {"reflection": "off"}, owner="tenant-a")
+    store.complete_stage(checkpoint, "analyst", "analysis", 12.5, agent_version="v1")
+
+    loaded = await store.load(checkpoint["run_id"], owner="tenant-a")
+    assert loaded["input"] == {"name": "Acme"}
+    assert loaded["options"] == {"reflection": "off"}
+    assert loaded["stages"]["analyst"]["output"] == "analysis"
+    assert loaded["stages"]["analyst"]["agent_version"] == "v1"
+
+
+@pytest.mark.asyncio
+async def test_other_owners_and_unknown_runs_look_the_same(store):
+    checkpoint = store.create({}, owner="tenant-a")
+    with pytest.raises(KeyError):
+        await store.load(checkpoint["run_id"], owner="tenant-b")
+    with pytest.raises(KeyError):
+        await store.load(checkpoint["run_id"])
+    with pytest.raises(KeyError):
+        await store.load(CheckpointStore.new_run_id(), owner="tenant-a")
+
+
+@pytest.mark.asyncio
+async def test_run_ids_are_never_used_as_paths(store):
+    with pytest.raises(KeyError):
+        await store.load("../../etc/passwd", owner="tenant-a")
+
+
+@pytest.mark.asyncio
+async def test_resume_runs_only_the_stages_that_did_not_finish(store):
+    checkpoint = store.create({}, owner="tenant-a")
+    calls = []
+    with pytest.raises(RuntimeError):
+        await run_stages(store, checkpoint, calls, fail_at="architect")
+
+    failed = await store.load(checkpoint["run_id"], owner="tenant-a")
+    assert failed["status"] == "failed"
+    assert failed["error"] == {"stage": "architect", "message": "llm down"}
+    assert list(failed["stages"]) == ["analyst"]
+
+    await run_stages(store, failed, calls)
+    assert calls == ["analyst", "architect", "architect", "designer"]
+
+    finished = await store.load(checkpoint["run_id"], owner="tenant-a")
+    assert finished["status"] == "completed"
+    assert finished["error"] is None
+    assert list(finished["stages"]) == list(STAGES)
+    stats = store.stats()
+    assert (stats["resumed"], stats["stages_run"], stats["stages_reused"]) == (1, 3, 1)
+
+
+@pytest.mark.asyncio
+async def test_abandoned_run_is_marked_interrupted(store):
+    checkpoint = store.create({}, owner="tenant-a")
+    with store.claim(checkpoint):
+        store.complete_stage(checkpoint, "analyst", "analysis", 1.0)
+        # The client disconnects here: the block exits with the run still "running"
+
+    loaded = await store.load(checkpoint["run_id"], owner="tenant-a")
+    assert loaded["status"] == "interrupted"
+    assert list(loaded["stages"]) == ["analyst"]
+
+
+@pytest.mark.asyncio
+async def test_a_run_executes_once_at_a_time(store):
+    checkpoint = store.create({}, owner="tenant-a")
+    with store.claim(checkpoint):
+        assert store.is_running(checkpoint["run_id"])
+        with pytest.raises(RunInProgress):
+            with store.claim(checkpoint):
+                pass
+    assert not store.is_running(checkpoint["run_id"])
+
+
+@pytest.mark.asyncio
+async def test_saves_are_written_in_order(store, tmp_path):
+    checkpoint = store.create({}, owner="tenant-a")
+    for i in range(20):
+        store.complete_stage(checkpoint, f"stage{i}", "output", 1.0)
+    await store.close()
+
+    with open(tmp_path / f"{checkpoint['run_id']}.json") as f:
+        assert len(json.load(f)["stages"]) == 20
+    assert store.stats()["write_failures"] == 0
@@ -0,0 +1,167 @@
+import json
+import os
+
+import pytest
+
+from conversation_log import DUPLICATE_KEY, ConversationLog
+
+
+class BulkWriteError(Exception):
+    """Shaped like pymongo's: per-document failures in details["writeErrors"]."""
+
+    def __init__(self, write_errors):
+        super().__init__(f"{len(write_errors)} write errors")
+        self.details = {"writeErrors": write_errors}
+
+
+class FakeCollection:
+    """Unordered insert_many keyed by _id, with scripted failures.
+
+    `outages` fails that many calls outright; `fail_at` maps a call number
+    to the batch indexes that fail in it, after the others were written.
+    """
+
+    def __init__(self, outages=0, fail_at=None):
+        self.documents = {}
+        self.calls = 0
+        self.outages = outages
+        self.fail_at = fail_at or {}
+
+    async def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.outages:
+            self.outages -= 1
+            raise ConnectionError("MongoDB unavailable")
+        errors = []
+        for index, document in enumerate(documents):
+            if index in self.fail_at.get(self.calls, ()):
+                errors.append({"index": index, "code": 91, "errmsg": "shutdown in progress"})
+            elif document["_id"] in self.documents:
+                errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": "duplicate key"})
+            else:
+                self.documents[document["_id"]] = dict(document)
+        if errors:
+            raise BulkWriteError(errors)
+
+
+def texts(collection):
+    return sorted(document["text"] for document in collection.documents.values())
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_in_batches():
+    collection = FakeCollection()
+    log = ConversationLog(lambda: collection, batch_size=2)
+    for i in range(5):
+        log.record("chat", text=f"t{i}")
+
+    assert await log.flush() == 5
+    assert texts(collection) == [f"t{i}" for i in range(5)]
+    stats = log.stats()
+    assert (stats["batches"], stats["max_batch_size"], stats["buffered"]) == (3, 2, 0)
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_requeued_in_order():
+    collection = FakeCollection(outages=1)
+    log = ConversationLog(lambda: collection, batch_size=10)
+    for i in range(3):
+        log.record("chat", text=f"t{i}")
+
+    assert await log.flush() == 0
+    assert log.stats()["buffered"] == 3
+    assert log.stats()["write_errors"] == 1
+
+    assert await log.flush() == 3
+    assert texts(collection) == ["t0", "t1", "t2"]
+
+
+@pytest.mark.asyncio
+async def test_partial_write_retries_only_the_failed_records():
+    collection = FakeCollection(fail_at={1: {1}})
+    log = ConversationLog(lambda: collection, batch_size=10)
+    for i in range(3):
+        log.record("chat", text=f"t{i}")
+
+    await log.flush()
+    assert texts(collection) == ["t0", "t2"]
+    assert log.stats()["buffered"] == 1
+
+    await log.flush()
+    assert texts(collection) == ["t0", "t1", "t2"]
+
+
+@pytest.mark.asyncio
+async def test_overflow_is_spilled_and_replayed(tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    collection = None
+    log = ConversationLog(lambda: collection, batch_size=10, max_buffer=2, spill_path=spill_path)
+    for i in range(5):
+        log.record("chat", text=f"t{i}")
+
+    # MongoDB is down: the overflow goes to disk
+    assert await log.flush() == 0
+    with open(spill_path) as f:
+        spilled = [json.loads(line) for line in f]
+    assert [document["text"] for document in spilled] == ["t2", "t3", "t4"]
+    assert all(document["_id"] for document in spilled)
+
+    collection = FakeCollection()
+    assert await log.flush() == 2
+    assert texts(collection) == [f"t{i}" for i in range(5)]
+    assert not os.path.exists(spill_path) and not os.path.exists(spill_path + ".replay")
+    assert log.stats()["replayed"] == 3
+
+
+@pytest.mark.asyncio
+async def test_replay_that_fails_partway_never_duplicates(tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    log = ConversationLog(lambda: None, batch_size=2, max_buffer=0, spill_path=spill_path)
+    for i in range(6):
+        log.record("chat", text=f"t{i}")
+    await log.flush()
+
+    # First replay batch lands, the second fails on one record, the rest never start
+    collection = FakeCollection(fail_at={2: {0}})
+    log.get_collection = lambda: collection
+    await log.flush()
+    assert texts(collection) == ["t0", "t1", "t3"]
+    with open(spill_path + ".replay") as f:
+        assert [json.loads(line)["text"] for line in f] == ["t2", "t4", "t5"]
+
+    await log.flush()
+    assert texts(collection) == [f"t{i}" for i in range(6)]
+    assert collection.calls == 4
+    assert not os.path.exists(spill_path + ".replay")
+
+
+@pytest.mark.asyncio
+async def test_replay_skips_records_already_written(tmp_path):
+    """A crash after a batch landed but before the file was truncated is harmless."""
+    spill_path = str(tmp_path / "spill.jsonl")
+    log = ConversationLog(lambda: None, batch_size=10, max_buffer=0, spill_path=spill_path)
+    for i in range(3):
+        log.record("chat", text=f"t{i}")
+    await log.flush()
+
+    collection = FakeCollection()
+    with open(spill_path) as f:
+        first = json.loads(f.readline())
+    collection.documents[first["_id"]] = first
+    log.get_collection = lambda: collection
+    await log.flush()
+
+    assert texts(collection) == ["t0", "t1", "t2"]
+    assert not os.path.exists(spill_path + ".replay")
+
+
+@pytest.mark.asyncio
+async def test_close_spills_what_mongodb_never_took(tmp_path):
+    spill_path = str(tmp_path / "spill.jsonl")
+    log = ConversationLog(lambda: FakeCollection(outages=1), batch_size=10, spill_path=spill_path)
+    log.record("chat", text="t0")
+    await log.close()
+
+    with open(spill_path) as f:
+        assert [json.loads(line)["text"] for line in f] == ["t0"]
+    assert log.stats()["spilled"] == 1
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from executor import AdmissionGate, ExecutorSaturated
+
+
+async def hold(gate, entered, release):
+    """Occupy one slot until `release` is set."""
+    async with gate.slot():
+        entered.append(True)
+        await release.wait()
+
+
+@pytest.mark.asyncio
+async def test_calls_beyond_max_active_wait_for_a_slot():
+    gate, entered, release = AdmissionGate(max_active=2, max_queue=5), [], asyncio.Event()
+    holders = [asyncio.ensure_future(hold(gate, entered, release)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+
+    assert len(entered) == 2
+    assert (gate.stats()["active"], gate.stats()["queued"]) == (2, 1)
+
+    release.set()
+    await asyncio.gather(*holders)
+    stats = gate.stats()
+    assert (stats["active"], stats["queued"], stats["completed"]) == (0, 0, 3)
+    assert stats["wait_max_ms"] is not None
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_immediately():
+    gate, entered, release = AdmissionGate(max_active=1, max_queue=1, retry_after=7), [], asyncio.Event()
+    holders = [asyncio.ensure_future(hold(gate, entered, release)) for _ in range(2)]
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(ExecutorSaturated) as rejected:
+        async with gate.slot():
+            pass
+    assert rejected.value.status_code == 503
+    assert rejected.value.headers["Retry-After"] == "7"
+    assert gate.stats()["rejected"] == 1
+
+    release.set()
+    await asyncio.gather(*holders)
+
+
+@pytest.mark.asyncio
+async def test_queue_timeout_raises_executor_saturated():
+    gate, entered, release = AdmissionGate(max_active=1, max_queue=5, queue_timeout=0.05), [], asyncio.Event()
+    holder = asyncio.ensure_future(hold(gate, entered, release))
+    await asyncio.sleep(0.01)
+
+    with pytest.raises(ExecutorSaturated):
+        async with gate.slot():
+            pass
+    stats = gate.stats()
+    assert (stats["timed_out"], stats["queued"], stats["active"]) == (1, 0, 1)
+
+    release.set()
+    await holder
+
+
+@pytest.mark.asyncio
+async def test_slot_is_released_when_the_call_fails():
+    gate = AdmissionGate(max_active=1, max_queue=0, queue_timeout=0.05)
+    with pytest.raises(RuntimeError):
+        async with gate.slot():
+            raise RuntimeError("upstream error")
+
+    # The only slot is free again
+    async with gate.slot():
+        pass
+    stats = gate.stats()
+    assert (stats["failed"], stats["completed"], stats["active"]) == (1, 2, 0)
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_leaves_the_queue():
+    gate, entered, release = AdmissionGate(max_active=1, max_queue=1), [], asyncio.Event()
+    holder = asyncio.ensure_future(hold(gate, entered, release))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.ensure_future(hold(gate, entered, release))
+    await asyncio.sleep(0.01)
+
+    waiter.cancel()
+    await asyncio.gather(waiter, return_exceptions=True)
+    assert gate.stats()["queued"] == 0
+
+    release.set()
+    await holder
+    assert gate.stats()["active"] == 0
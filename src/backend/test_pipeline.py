@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+
+from pipeline import Pipeline, Step, missing_marker
+
+
+def make_call(delays=None, failures=None, log=None):
+    """Fake step runner: echoes the prompt after an optional delay, or raises."""
+    delays, failures = delays or {}, failures or {}
+
+    async def call(step, prompt):
+        if log is not None:
+            log.append(("start", step.name))
+        try:
+            await asyncio.sleep(delays.get(step.name, 0))
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(("cancelled", step.name))
+            raise
+        if step.name in failures:
+            raise failures[step.name]
+        if log is not None:
+            log.append(("end", step.name))
+        return f"{step.name}({prompt})"
+    return call
+
+
+def test_topological_order():
+    """Steps come after everything they depend on, whatever order they were declared in."""
+    pipeline = Pipeline("p", [
+        Step("report", "a", "{summary}", inputs=("summary",)),
+        Step("summary", "a", "{left} {right}", inputs=("left", "right")),
+        Step("left", "a", "L"),
+        Step("right", "a", "R")
+    ])
+    order = pipeline.order
+    assert set(order[:2]) == {"left", "right"}
+    assert order[2:] == ["summary", "report"]
+
+
+def test_invalid_graphs_are_rejected():
+    """Duplicate names, unknown inputs and cycles fail at construction."""
+    with pytest.raises(ValueError, match="duplicate"):
+        Pipeline("p", [Step("a", "x", ""), Step("a", "x", "")])
+    with pytest.raises(ValueError, match="unknown"):
+        Pipeline("p", [Step("a", "x", "", inputs=("missing",))])
+    with pytest.raises(ValueError, match="cycle"):
+        Pipeline("p", [Step("a", "x", "", inputs=("b",)), Step("b", "x", "", inputs=("a",))])
+
+
+@pytest.mark.asyncio
+async def test_independent_steps_run_concurrently_and_feed_dependents():
+    """Ready steps run in parallel; a dependent sees its inputs' outputs in its prompt."""
+    pipeline = Pipeline("p", [
+        Step("left", "a", "L {topic}"),
+        Step("right", "a", "R {topic}"),
+        Step("join", "a", "{left} + {right}", inputs=("left", "right"))
+    ])
+    started = time.perf_counter()
+    run = await pipeline.run(make_call(delays={"left": 0.2, "right": 0.2}), {"topic": "t"})
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 0.35
+    assert run.outputs["join"] == "join(left(L t) + right(R t))"
+    assert run.missing == {}
+    assert run.critical_path[-1] == "join"
+    assert run.critical_path[0] in ("left", "right")
+
+
+@pytest.mark.asyncio
+async def test_on_step_reports_each_step_as_it_finishes():
+    pipeline = Pipeline("p", [
+        Step("slow", "a", "S"),
+        Step("fast", "a", "F")
+    ])
+    finished = []
+    await pipeline.run(make_call(delays={"slow": 0.1}), {}, on_step=finished.append)
+    assert [name for name, _, _ in finished] == ["fast", "slow"]
+    assert finished[0][2]["status"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_optional_step_timeout_is_marked_missing():
+    """A late optional step is replaced by a marker and its dependents still run."""
+    pipeline = Pipeline("p", [
+        Step("quick", "a", "Q"),
+        Step("late", "a", "L", timeout=0.05, required=False),
+        Step("join", "a", "{quick} {late}", inputs=("quick", "late"))
+    ])
+    run = await pipeline.run(make_call(delays={"late": 1.0}), {})
+
+    reason = "timed out after 0.05s"
+    assert run.missing == {"late": reason}
+    assert run.outputs["late"] == missing_marker("late", reason)
+    assert missing_marker("late", reason) in run.outputs["join"]
+    assert set(run.completed()) == {"quick", "join"}
+    assert run.timings["late"]["status"] == "timeout"
+
+
+@pytest.mark.asyncio
+async def test_optional_step_failure_is_marked_missing():
+    pipeline = Pipeline("p", [
+        Step("ok", "a", "O"),
+        Step("broken", "a", "B", required=False)
+    ])
+    run = await pipeline.run(make_call(failures={"broken": RuntimeError("boom")}), {})
+    assert run.missing == {"broken": "failed (RuntimeError)"}
+    assert run.completed() == {"ok": "ok(O)"}
+
+
+@pytest.mark.asyncio
+async def test_required_step_timeout_fails_the_run():
+    pipeline = Pipeline("p", [Step("late", "a", "L", timeout=0.05)])
+    with pytest.raises(TimeoutError, match="late"):
+        await pipeline.run(make_call(delays={"late": 1.0}), {})
+
+
+@pytest.mark.asyncio
+async def test_required_failure_cancels_running_steps():
+    """The first required failure cancels its siblings and never starts dependents."""
+    log = []
+    pipeline = Pipeline("p", [
+        Step("broken", "a", "B"),
+        Step("sibling", "a", "S"),
+        Step("after", "a", "{broken}", inputs=("broken",))
+    ])
+    call = make_call(delays={"broken": 0.05, "sibling": 1.0},
+                     failures={"broken": RuntimeError("boom")}, log=log)
+    with pytest.raises(RuntimeError, match="boom"):
+        await pipeline.run(call, {})
+
+    assert ("cancelled", "sibling") in log
+    assert ("end", "sibling") not in log
+    assert ("start", "after") not in log
+
+
+@pytest.mark.asyncio
+async def test_prepare_rewrites_inputs_before_the_prompt_is_built():
+    pipeline = Pipeline("p", [
+        Step("source", "a", "S"),
+        Step("use", "a", "{source}", inputs=("source",))
+    ])
+
+    async def prepare(step, context, inputs):
+        return {name: text.upper() for name, text in inputs.items()}
+
+    run = await pipeline.run(make_call(), {}, prepare=prepare)
+    assert run.outputs["use"] == "use(SOURCE(S))"
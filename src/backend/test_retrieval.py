@@ -0,0 +1,144 @@
+import pytest
+
+from response_cache import ResponseCache, cache_key
+from retrieval import GROUNDING_NOTE, BM25Index, GroundingStats, grounded_prompt, grounding_source, tokenize
+from tokens import count_tokens
+
+RETAIL = "Retail chain with paper inventory tracking wants to automate stock reordering across stores"
+CLINIC = "Dental clinic books appointments by phone and wants online scheduling with reminders"
+
+
+@pytest.fixture
+def index():
+    index = BM25Index()
+    index.add("t1:retail", RETAIL, {"tenant": "t1", "step": "solution", "output": "retail plan"})
+    index.add("t1:clinic", CLINIC, {"tenant": "t1", "step": "solution", "output": "clinic plan"})
+    index.add("t2:retail", RETAIL, {"tenant": "t2", "step": "solution", "output": "other tenant's plan"})
+    return index
+
+
+def test_tokenize_drops_stopwords_short_tokens_and_case():
+    assert tokenize("The CRM is on-premise, and it's OLD") == ["crm", "premise", "it's", "old"]
+
+
+def test_identical_text_is_fully_similar(index):
+    hit = index.search(RETAIL, k=1, where={"tenant": "t1"})[0]
+    assert hit["id"] == "t1:retail"
+    assert hit["similarity"] == 1.0
+
+
+def test_ranking_prefers_the_related_document(index):
+    hits = index.search("stock reordering for retail stores", k=2, where={"tenant": "t1"})
+    assert [hit["id"] for hit in hits][0] == "t1:retail"
+    assert all(0.0 <= hit["similarity"] <= 1.0 for hit in hits)
+
+
+def test_where_never_crosses_tenants(index):
+    hits = index.search(RETAIL, k=5, where={"tenant": "t2"})
+    assert [hit["id"] for hit in hits] == ["t2:retail"]
+    assert index.search(RETAIL, k=5, where={"tenant": "t3"}) == []
+
+
+def test_a_long_document_containing_the_query_is_not_identical(index):
+    index.add("t1:long", RETAIL + " " + CLINIC * 3, {"tenant": "t1", "step": "solution"})
+    hits = {hit["id"]: hit["similarity"] for hit in index.search(RETAIL, k=5, where={"tenant": "t1"})}
+    assert hits["t1:long"] < 0.5 < hits["t1:retail"]
+
+
+def test_closest_applies_the_threshold(index):
+    assert index.closest(RETAIL, 0.6, where={"tenant": "t1"})["id"] == "t1:retail"
+    assert index.closest("online scheduling for a salon", 0.6, where={"tenant": "t1"}) is None
+    # A threshold above 1 disables grounding entirely
+    assert index.closest(RETAIL, 1.01, where={"tenant": "t1"}) is None
+
+
+def test_negations_look_alike_so_outputs_are_only_grounding():
+    """BM25 scores opposite requests as closely related, which is why outputs are never reused verbatim."""
+    index = BM25Index()
+    index.add("a", "We currently do not use a CRM", {"output": "Adopt a CRM first."})
+    # Clears the grounding threshold despite meaning the opposite
+    hit = index.closest("We currently do use a CRM", 0.6)
+    assert hit is not None
+
+    prompt = "We currently do use a CRM"
+    grounded = grounded_prompt(prompt, hit["metadata"]["output"], 300)
+    assert grounded.startswith(prompt)
+    assert GROUNDING_NOTE in grounded
+    assert grounded.endswith("Adopt a CRM first.")
+
+
+def test_grounding_source_skips_the_prompts_own_earlier_run(index):
+    assert grounding_source(index, RETAIL, 0.6, where={"tenant": "t1"}, own_id="t1:retail") is None
+    # Same text under another id is still the same request
+    index.add("t1:retail-copy", RETAIL, {"tenant": "t1", "step": "solution", "output": "retail plan"})
+    assert grounding_source(index, RETAIL, 0.6, where={"tenant": "t1"}, own_id="t1:retail") is None
+
+
+def test_grounding_source_falls_through_to_a_different_request(index):
+    similar = "Retail chain with paper inventory tracking wants to automate stock reordering"
+    hit = grounding_source(index, similar, 0.6, where={"tenant": "t1"}, own_id="t1:similar")
+    assert hit["id"] == "t1:retail"
+
+
+@pytest.mark.asyncio
+async def test_a_repeated_step_call_hits_the_response_cache():
+    """A repeat is sent exactly as the first call was, so its completion comes from the cache."""
+    index, cache, upstream = BM25Index(), ResponseCache(), []
+
+    async def call_step(prompt):
+        hit = grounding_source(index, prompt, 0.6, where={"tenant": "t1"}, own_id=f"t1:{prompt}")
+        sent = grounded_prompt(prompt, hit["metadata"]["output"], 100) if hit else prompt
+        key = cache_key("t1", "model", 0, None, [{"role": "user", "content": sent}])
+        output = await cache.get(key)
+        if output is None:
+            upstream.append(sent)
+            output = f"answer {len(upstream)}"
+            cache.set(key, output)
+        index.add(f"t1:{prompt}", prompt, {"tenant": "t1", "output": output})
+        return output
+
+    assert await call_step(RETAIL) == "answer 1"
+    assert await call_step(RETAIL) == "answer 1"
+    assert len(upstream) == 1
+    assert cache.stats()["memory_hits"] == 1
+
+
+def test_grounded_prompt_trims_the_excerpt():
+    earlier = "\n\n".join(f"paragraph {i} " + "detail " * 40 for i in range(20))
+    grounded = grounded_prompt("prompt", earlier, 50)
+    excerpt = grounded.split(GROUNDING_NOTE + "\n", 1)[1]
+    assert count_tokens(excerpt) <= 50
+
+
+def test_oldest_documents_are_evicted():
+    index = BM25Index(max_documents=2)
+    for name in ("one", "two", "three"):
+        index.add(name, f"document {name}")
+    assert index.stats()["documents"] == 2
+    assert "one" not in {hit["id"] for hit in index.search("document one")}
+    assert {hit["id"] for hit in index.search("document")} == {"two", "three"}
+
+
+def test_re_adding_replaces_the_document():
+    index = BM25Index()
+    index.add("doc", "retail inventory")
+    index.add("doc", "clinic scheduling")
+    assert index.search("retail") == []
+    assert index.stats()["documents"] == 1
+
+
+def test_snapshot_round_trip(index, tmp_path):
+    path = tmp_path / "index.json"
+    index.save(str(path))
+    restored = BM25Index()
+    assert restored.load(str(path)) == 3
+    assert restored.search(CLINIC, k=1, where={"tenant": "t1"})[0]["metadata"]["output"] == "clinic plan"
+    assert BM25Index().load(str(tmp_path / "missing.json")) == 0
+
+
+def test_grounding_stats_count_per_step():
+    stats = GroundingStats()
+    stats.record("architect.solution", True)
+    stats.record("architect.solution", False)
+    stats.record("architect.solution", False)
+    assert stats.stats() == {"architect.solution": {"generated": 2, "grounded": 1}}
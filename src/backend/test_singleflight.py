@@ -0,0 +1,151 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+class Upstream:
+    """Fake upstream call that counts invocations and can be released or cancelled."""
+
+    def __init__(self, result="answer"):
+        self.result = result
+        self.calls = 0
+        self.cancelled = 0
+        self.release = asyncio.Event()
+
+    async def call(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+    async def stream(self, chunks):
+        self.calls += 1
+        try:
+            for chunk in chunks:
+                await self.release.wait()
+                self.release.clear()
+                yield chunk
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_upstream_call():
+    flights, upstream = SingleFlight(), Upstream()
+    waiters = [asyncio.ensure_future(flights.do("k", upstream.call)) for _ in range(5)]
+    await asyncio.sleep(0)
+    upstream.release.set()
+
+    assert await asyncio.gather(*waiters) == ["answer"] * 5
+    assert upstream.calls == 1
+    stats = flights.stats()
+    assert (stats["leaders"], stats["coalesced"], stats["in_flight"]) == (1, 4, 0)
+
+
+@pytest.mark.asyncio
+async def test_different_keys_do_not_share():
+    flights, upstream = SingleFlight(), Upstream()
+    upstream.release.set()
+    await asyncio.gather(flights.do("a", upstream.call), flights.do("b", upstream.call))
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_fail_followers():
+    """The request that started the call can go away; the others still get the result."""
+    flights, upstream = SingleFlight(), Upstream()
+    leader = asyncio.ensure_future(flights.do("k", upstream.call))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flights.do("k", upstream.call))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    upstream.release.set()
+
+    assert await follower == "answer"
+    assert leader.cancelled()
+    assert (upstream.calls, upstream.cancelled) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_upstream_call_is_cancelled_once_every_waiter_leaves():
+    flights, upstream = SingleFlight(), Upstream()
+    waiters = [asyncio.ensure_future(flights.do("k", upstream.call)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert upstream.cancelled == 1
+    assert flights.stats()["in_flight"] == 0
+
+    # The key is free again: the next request starts a fresh call
+    upstream.release.set()
+    assert await flights.do("k", upstream.call) == "answer"
+    assert upstream.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter_and_are_not_cached():
+    flights, upstream = SingleFlight(), Upstream(result=RuntimeError("down"))
+    waiters = [asyncio.ensure_future(flights.do("k", upstream.call)) for _ in range(3)]
+    await asyncio.sleep(0)
+    upstream.release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert upstream.calls == 1
+
+    upstream.result = "recovered"
+    assert await flights.do("k", upstream.call) == "recovered"
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_stream_fans_out_and_late_joiners_replay():
+    flights, upstream = SingleFlight(), Upstream()
+    factory = lambda: upstream.stream(["a", "b", "c"])
+    first = asyncio.ensure_future(collect(flights.stream("k", factory)))
+    await asyncio.sleep(0)
+    upstream.release.set()
+    await asyncio.sleep(0.01)
+
+    # Joins after "a" was produced: still sees the whole stream
+    late = asyncio.ensure_future(collect(flights.stream("k", factory)))
+    for _ in range(2):
+        await asyncio.sleep(0.01)
+        upstream.release.set()
+
+    assert await first == ["a", "b", "c"]
+    assert await late == ["a", "b", "c"]
+    assert upstream.calls == 1
+    stats = flights.stats()
+    assert (stats["stream_leaders"], stats["stream_coalesced"], stats["streams_in_flight"]) == (1, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_stream_is_cancelled_once_every_subscriber_leaves():
+    flights, upstream = SingleFlight(), Upstream()
+    factory = lambda: upstream.stream(["a", "b", "c"])
+    subscribers = [asyncio.ensure_future(collect(flights.stream("k", factory))) for _ in range(2)]
+    await asyncio.sleep(0)
+    for subscriber in subscribers:
+        subscriber.cancel()
+    await asyncio.gather(*subscribers, return_exceptions=True)
+    await asyncio.sleep(0.01)
+
+    assert upstream.cancelled == 1
+    assert flights.stats()["streams_in_flight"] == 0
@@ -0,0 +1,31 @@
+from functools import lru_cache
+from typing import Optional
+
+# tiktoken is optional; without it we fall back to a ~4 chars/token estimate
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+DEFAULT_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=16)
+def _get_encoding(model: Optional[str]):
+    """Return the tiktoken encoding for a model, defaulting to cl100k_base."""
+    if model:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            pass
+    return tiktoken.get_encoding(DEFAULT_ENCODING)
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count (or estimate) the number of tokens in a piece of text."""
+    if not text:
+        return 0
+    if tiktoken is not None:
+        return len(_get_encoding(model).encode(text))
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
@@ -0,0 +1,118 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from registry import AgentRegistry
+
+# watchdog is optional; it uses inotify on Linux. Without it we poll mtimes.
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+
+class _ChangeHandler(FileSystemEventHandler):
+    """Forward relevant file system events to the watcher."""
+
+    def __init__(self, watcher: "AgentWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        paths = [getattr(event, 'src_path', ''), getattr(event, 'dest_path', '')]
+        if any(str(p).endswith(('.json', '.yaml', '.yml')) for p in paths):
+            self.watcher.notify()
+
+
+class AgentWatcher:
+    """Hot-reloads agent configs and prompts into a live AgentRegistry."""
+
+    def __init__(self, registry: AgentRegistry, poll_interval: float = 2.0, debounce: float = 0.25):
+        self.registry = registry
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.backend = None
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._observer = None
+        self._reload_count = 0
+        self._last_reload: Optional[float] = None
+        self._last_reloaded = []
+
+    def notify(self):
+        """Signal that a watched file may have changed."""
+        self._changed.set()
+
+    def start(self):
+        """Start watching with inotify if available, polling otherwise."""
+        if self._thread is not None:
+            return
+        if Observer is not None and self.registry.agents_dir.is_dir():
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_ChangeHandler(self), str(self.registry.agents_dir), recursive=True)
+                self._observer.start()
+                self.backend = "inotify"
+            except Exception as e:
+                print(f"Warning: File watcher unavailable, falling back to polling - {str(e)}")
+                self._observer = None
+        if self._observer is None:
+            self.backend = "polling"
+
+        # Catch up on edits made before watching began (e.g. specs seeded from a stale
+        # manifest); inotify only reports changes from here on
+        self._reload()
+        self.registry.validate = False
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="agent-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop watching and go back to validating mtimes on every lookup."""
+        self._stopped.set()
+        self._changed.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join(timeout=5)
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self.registry.validate = True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            # With inotify we sleep until an event; polling wakes up on a timer
+            timeout = None if self._observer is not None else self.poll_interval
+            self._changed.wait(timeout)
+            if self._stopped.is_set():
+                break
+            # Let editors finish their write/rename sequence before reparsing
+            time.sleep(self.debounce)
+            self._changed.clear()
+            self._reload()
+
+    def _reload(self):
+        try:
+            reloaded = self.registry.refresh()
+        except Exception as e:
+            print(f"Warning: Agent reload failed - {str(e)}")
+            return
+        if reloaded:
+            self._reload_count += len(reloaded)
+            self._last_reload = time.time()
+            self._last_reloaded = reloaded
+            print(f"Reloaded agents: {', '.join(reloaded)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return watcher state and reload counters."""
+        return {
+            "backend": self.backend,
+            "running": self._thread is not None,
+            "reloads": self._reload_count,
+            "last_reload": self._last_reload,
+            "last_reloaded": list(self._last_reloaded)
+        }